@@ -33,7 +33,7 @@ def create_calib_input_data(calib_file: str,
 
     from mmdeploy.core import patch_model
     from mmdeploy.utils import (IR, cfg_apply_marks, get_backend,
-                                get_ir_config, load_config)
+                                get_calib_config, get_ir_config, load_config)
     from .utils import create_calib_input_data as create_calib_input_data_impl
     with no_mp():
         if dataset_cfg is None:
@@ -47,14 +47,16 @@ def create_calib_input_data(calib_file: str,
 
         # load dataset_cfg if necessary
         dataset_cfg = load_config(dataset_cfg)[0]
+        calib_config = get_calib_config(deploy_cfg) or dict()
+        apply_marks = cfg_apply_marks(deploy_cfg)
         calib_dataloader = deepcopy(dataset_cfg[f'{dataset_type}_dataloader'])
-        calib_dataloader['batch_size'] = 1
+        # the partitions are saved per inference, which requires batch size 1
+        calib_dataloader['batch_size'] = 1 if apply_marks else \
+            calib_config.get('batch_size', 1)
 
         from mmdeploy.apis.utils import build_task_processor
         task_processor = build_task_processor(model_cfg, deploy_cfg, device)
 
-        apply_marks = cfg_apply_marks(deploy_cfg)
-
         model = task_processor.build_pytorch_model(model_checkpoint)
         dataset = task_processor.build_dataset(calib_dataloader['dataset'])
         calib_dataloader['dataset'] = dataset
@@ -78,4 +80,7 @@ def create_calib_input_data(calib_file: str,
             inference_func=model.forward,
             model_partition=apply_marks,
             context_info=dict(cfg=deploy_cfg),
-            device=device)
+            device=device,
+            compression=calib_config.get('compression', 'gzip'),
+            compression_opts=calib_config.get('compression_opts', 4),
+            max_queue_size=calib_config.get('max_queue_size', 16))
@@ -1,4 +1,5 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import os.path as osp
 from copy import deepcopy
 from functools import partial
 from typing import Any, Dict, Optional, Sequence, Tuple, Union
@@ -6,7 +7,7 @@ from typing import Any, Dict, Optional, Sequence, Tuple, Union
 import torch
 
 from mmdeploy.apis.core import PIPELINE_MANAGER
-from mmdeploy.core import RewriterContext, patch_model
+from mmdeploy.core import RewriterContext, RewriterProfiler, patch_model
 from mmdeploy.utils import IR, Backend, get_ir_config, get_root_logger
 from .optimizer import *  # noqa
 from .passes import optimize_onnx
@@ -81,6 +82,14 @@ def export(model: torch.nn.Module,
 
     context_info = deepcopy(context_info)
     deploy_cfg = context_info.pop('deploy_cfg', dict())
+    # profile the rewriters if `rewriter_report` is given in ir config
+    rewriter_report = get_ir_config(deploy_cfg).get('rewriter_report', None)
+    profiler = None
+    if rewriter_report is not None:
+        profiler = RewriterProfiler()
+        if not osp.isabs(rewriter_report):
+            rewriter_report = osp.join(
+                osp.dirname(output_path), rewriter_report)
     ir_config = dict(
         type='onnx',
         input_names=input_names,
@@ -104,12 +113,13 @@ def export(model: torch.nn.Module,
         context_info['opset'] = opset_version
 
     # patch model
-    patched_model = patch_model(model, cfg=deploy_cfg, backend=backend, ir=ir)
+    patched_model = patch_model(
+        model, cfg=deploy_cfg, backend=backend, ir=ir, profiler=profiler)
 
     if 'onnx_custom_passes' not in context_info:
         onnx_custom_passes = optimize_onnx if optimize else None
         context_info['onnx_custom_passes'] = onnx_custom_passes
-    with RewriterContext(**context_info), torch.no_grad():
+    with RewriterContext(**context_info, profiler=profiler), torch.no_grad():
         # patch input_metas
         if input_metas is not None:
             assert isinstance(
@@ -149,3 +159,7 @@ def export(model: torch.nn.Module,
 
         if input_metas is not None:
             patched_model.forward = model_forward
+
+    if profiler is not None:
+        profiler.dump(rewriter_report)
+        logger.info(f'Rewriter report saved to {rewriter_report}.')
@@ -1,9 +1,11 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 from .calibration import create_calib_input_data
+from .conversion_cache import ConversionCache, get_companion_files, hash_file
 from .utils import (build_task_processor, get_predefined_partition_cfg,
                     to_backend)
 
 __all__ = [
     'create_calib_input_data', 'build_task_processor',
-    'get_predefined_partition_cfg', 'to_backend'
+    'get_predefined_partition_cfg', 'to_backend', 'ConversionCache',
+    'hash_file', 'get_companion_files'
 ]
@@ -1,13 +1,116 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import queue
+import threading
 from copy import deepcopy
-from typing import Callable, Dict, Optional
+from typing import Any, Callable, Dict, Optional, Union
 
+import numpy as np
 import torch
 from torch.utils.data import DataLoader
 
+from mmdeploy.utils import get_root_logger
 from ..core import PIPELINE_MANAGER
 
 
+class CalibDataWriter:
+    """Write calibration data to a HDF5 file in a background thread.
+
+    The samples are queued by `write` and saved by a worker thread, so the
+    compression and the IO overlap with the inference. The file is flushed
+    once when the writer is closed.
+
+    Args:
+        file (h5py.File): The opened calibration file.
+        compression (str | None): The compression filter of the datasets,
+            e.g. `'gzip'`, `'lzf'`, or `None` to store them uncompressed.
+            Defaults to `'gzip'`.
+        compression_opts (Any): The options of the compression filter, e.g.
+            the level of gzip. Defaults to `4`.
+        max_queue_size (int): Max number of samples waiting to be written.
+            `write` blocks when the queue is full. Defaults to `16`.
+
+    Examples:
+        >>> with h5py.File(calib_file, mode='w') as file, \
+        >>>         CalibDataWriter(file, compression='lzf') as writer:
+        >>>     for data_id, data in enumerate(samples):
+        >>>         writer.write('calib_data/end2end/input', str(data_id),
+        >>>                      data)
+    """
+
+    def __init__(self,
+                 file: Any,
+                 compression: Optional[str] = 'gzip',
+                 compression_opts: Any = 4,
+                 max_queue_size: int = 16):
+        self.file = file
+        self.compression = compression
+        self.compression_opts = compression_opts if compression == 'gzip' \
+            else None
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._error = None
+        self._worker = threading.Thread(
+            target=self.__run_worker, name='CalibDataWriter', daemon=True)
+        self._worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, group: str, name: str, data: Union[np.ndarray,
+                                                       torch.Tensor]):
+        """Queue a sample to be written.
+
+        Args:
+            group (str): The path of the group, e.g. `calib_data/end2end/
+                input`. Missing groups are created.
+            name (str): The name of the dataset in the group, i.e. the id of
+                the sample.
+            data (np.ndarray | torch.Tensor): The sample.
+        """
+        self.__check_error()
+        # copy the data, since it might be modified in place before written
+        if isinstance(data, torch.Tensor):
+            data = data.detach().cpu().numpy().copy()
+        else:
+            data = np.array(data, copy=True)
+        self._queue.put((group, name, data))
+
+    def close(self):
+        """Wait for the queued samples and flush the file."""
+        if self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join()
+        self.__check_error()
+        self.file.flush()
+
+    def __check_error(self):
+        """Raise the error of the worker thread if any."""
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def __run_worker(self):
+        """Write the queued samples."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._error is not None:
+                # drain the queue so the producer is never blocked
+                continue
+            group, name, data = item
+            try:
+                self.file.require_group(group).create_dataset(
+                    name,
+                    data=data,
+                    compression=self.compression,
+                    compression_opts=self.compression_opts)
+            except Exception as e:
+                self._error = e
+
+
 @PIPELINE_MANAGER.register_pipeline()
 def create_calib_input_data(calib_file: str,
                             model: torch.nn.Module,
@@ -16,7 +119,10 @@ def create_calib_input_data(calib_file: str,
                             inference_func: Optional[Callable] = None,
                             model_partition: bool = False,
                             context_info: Dict = dict(),
-                            device: str = 'cpu') -> None:
+                            device: str = 'cpu',
+                            compression: Optional[str] = 'gzip',
+                            compression_opts: Any = 4,
+                            max_queue_size: int = 16) -> None:
     """Create calibration table.
 
     Examples:
@@ -42,6 +148,11 @@ def create_calib_input_data(calib_file: str,
         dataset_type (str): A string specifying dataset type, e.g.: 'test',
             'val', defaults to 'val'.
         device (str): Specifying the device to run on, defaults to 'cpu'.
+        compression (str | None): The compression filter of the saved
+            samples, `'gzip'`, `'lzf'` or `None`. Defaults to `'gzip'`.
+        compression_opts (Any): The level of gzip. Defaults to `4`.
+        max_queue_size (int): Max number of samples waiting to be written by
+            the writer thread. Defaults to `16`.
     """
     import h5py
     import tqdm
@@ -50,41 +161,47 @@ def create_calib_input_data(calib_file: str,
     backend = 'default'
 
     with h5py.File(calib_file, mode='w') as file:
-        calib_data_group = file.create_group('calib_data')
-
-        if not model_partition:
-            # create end2end group
-            input_data_group = calib_data_group.create_group('end2end')
-            input_group = input_data_group.create_group('input')
-        for data_id, input_data in enumerate(tqdm.tqdm(dataloader)):
-
-            if not model_partition:
-                # save end2end data
-                if get_tensor_func is not None:
-                    input_tensor = get_tensor_func(input_data)
-                else:
-                    input_tensor = input_data
-                input_ndarray = input_tensor.detach().cpu().numpy()
-                input_group.create_dataset(
-                    str(data_id),
-                    shape=input_ndarray.shape,
-                    compression='gzip',
-                    compression_opts=4,
-                    data=input_ndarray)
-            else:
-                context_info_ = deepcopy(context_info)
-                if 'cfg' not in context_info:
-                    context_info_['cfg'] = dict()
-                context_info_['backend'] = backend
-                context_info_['create_calib'] = True
-                context_info_['calib_file'] = file
-                context_info_['data_id'] = data_id
-
-                with torch.no_grad(), RewriterContext(**context_info_):
-                    reset_mark_function_count()
-                    if inference_func is not None:
-                        inference_func(model, input_data)
+        file.create_group('calib_data')
+        writer = CalibDataWriter(
+            file,
+            compression=compression,
+            compression_opts=compression_opts,
+            max_queue_size=max_queue_size)
+
+        data_id = 0
+        try:
+            for input_data in tqdm.tqdm(dataloader):
+
+                if not model_partition:
+                    # save end2end data
+                    if get_tensor_func is not None:
+                        input_tensor = get_tensor_func(input_data)
                     else:
-                        model(input_data)
+                        input_tensor = input_data
+                    # a batch is saved as samples of batch size 1
+                    input_tensor = input_tensor.detach().cpu()
+                    for sample in input_tensor.split(1):
+                        writer.write('calib_data/end2end/input', str(data_id),
+                                     sample)
+                        data_id += 1
+                else:
+                    context_info_ = deepcopy(context_info)
+                    if 'cfg' not in context_info:
+                        context_info_['cfg'] = dict()
+                    context_info_['backend'] = backend
+                    context_info_['create_calib'] = True
+                    context_info_['calib_writer'] = writer
+                    context_info_['data_id'] = data_id
+
+                    with torch.no_grad(), RewriterContext(**context_info_):
+                        reset_mark_function_count()
+                        if inference_func is not None:
+                            inference_func(model, input_data)
+                        else:
+                            model(input_data)
+                    data_id += 1
+        finally:
+            writer.close()
 
-            file.flush()
+    get_root_logger().info(
+        f'Saved {data_id} calibration samples to {calib_file}.')
@@ -0,0 +1,263 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import hashlib
+import json
+import os
+import os.path as osp
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from mmdeploy.utils import get_root_logger
+
+_FILE_HASHES: Dict[Tuple[str, int, int], str] = dict()
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """Get the sha256 of the content of a file.
+
+    The hash is memoized in the process by the path, size and modification
+    time of the file.
+
+    Args:
+        path (str): The path of the file.
+        chunk_size (int): The bytes to read at a time. Defaults to 1MB.
+
+    Returns:
+        str: The hex digest.
+    """
+    path = osp.abspath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if key not in _FILE_HASHES:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                sha.update(chunk)
+        _FILE_HASHES[key] = sha.hexdigest()
+    return _FILE_HASHES[key]
+
+
+def _get_onnx_external_data(path: str) -> List[str]:
+    """Get the external data locations of an onnx model."""
+    import onnx
+    from onnx.external_data_helper import uses_external_data
+    try:
+        model = onnx.load(path, load_external_data=False)
+    except Exception:
+        return []
+    tensors = list(model.graph.initializer)
+    for node in model.graph.node:
+        for attr in node.attribute:
+            if attr.HasField('t'):
+                tensors.append(attr.t)
+            tensors.extend(attr.tensors)
+    locations = []
+    for tensor in tensors:
+        if not uses_external_data(tensor):
+            continue
+        for entry in tensor.external_data:
+            if entry.key == 'location' and entry.value not in locations:
+                locations.append(entry.value)
+    return locations
+
+
+def get_companion_files(file: str) -> List[str]:
+    """Get the files written along with a model file and loaded implicitly,
+    e.g. the `.bin` weights of an OpenVINO `.xml` model or the external
+    data of an onnx model.
+
+    Args:
+        file (str): The model file.
+
+    Returns:
+        List[str]: The existing companion files.
+    """
+    stem, ext = osp.splitext(file)
+    if ext == '.xml':
+        candidates = [stem + '.bin', stem + '.mapping']
+    elif ext == '.onnx' and osp.isfile(file):
+        candidates = [
+            osp.join(osp.dirname(file), location)
+            for location in _get_onnx_external_data(file)
+        ]
+    else:
+        candidates = []
+    return [
+        candidate for candidate in candidates if osp.exists(candidate)
+        and osp.abspath(candidate) != osp.abspath(file)
+    ]
+
+
+class ConversionCache:
+    """A content-addressed cache of converted models.
+
+    An entry is a directory named after its key, which holds the files of a
+    conversion step (e.g. the onnx model or the TensorRT engine) and a
+    `meta.json` with their order. The companion files of the model files,
+    e.g. the weights of an OpenVINO model, are stored and restored with them.
+    The last access time of the entries is updated on hits, and the least
+    recently used entries are evicted when the total size exceeds
+    `max_size`.
+
+    Args:
+        cache_dir (str): The directory of the cache.
+        max_size (int | None): Max bytes of the cache. Defaults to `None`,
+            which means no limit.
+
+    Examples:
+        >>> cache = ConversionCache('~/.cache/mmdeploy', 20 * 1024**3)
+        >>> key = ConversionCache.make_key('onnx', hash_file(checkpoint),
+        >>>                                dict(deploy_cfg))
+        >>> files = cache.get(key, work_dir)
+        >>> if files is None:
+        >>>     files = convert(work_dir)
+        >>>     cache.put(key, files)
+    """
+
+    META_FILE = 'meta.json'
+
+    def __init__(self, cache_dir: str, max_size: Optional[int] = None):
+        self.cache_dir = osp.abspath(osp.expanduser(cache_dir))
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(*items: Any) -> str:
+        """Make the key of an entry from json serializable items.
+
+        Args:
+            items (Any): The items that determine the conversion, e.g. the
+                hash of the checkpoint, the configs and the versions.
+
+        Returns:
+            str: The sha256 hex digest of the items.
+        """
+        content = json.dumps(items, sort_keys=True, default=str)
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        """Get the directory of an entry."""
+        return osp.join(self.cache_dir, key)
+
+    def get(self, key: str, work_dir: str) -> Optional[List[str]]:
+        """Restore the files of an entry to the work directory.
+
+        Args:
+            key (str): The key of the entry.
+            work_dir (str): The directory to restore the files to.
+
+        Returns:
+            List[str] | None: The restored files, or `None` on a miss.
+        """
+        entry_dir = self._entry_dir(key)
+        meta_file = osp.join(entry_dir, self.META_FILE)
+        try:
+            with open(meta_file) as f:
+                meta = json.load(f)
+            os.makedirs(work_dir, exist_ok=True)
+            files = []
+            for name in meta['files']:
+                dst = osp.join(work_dir, name)
+                _copy_file(osp.join(entry_dir, name), dst)
+                files.append(dst)
+            for name in meta.get('companion_files', []):
+                dst = osp.join(work_dir, name)
+                os.makedirs(osp.dirname(dst), exist_ok=True)
+                _copy_file(osp.join(entry_dir, name), dst)
+            # mark as recently used
+            os.utime(meta_file)
+        except (OSError, ValueError, KeyError):
+            return None
+        get_root_logger().info(f'Conversion cache hit: {key}.')
+        return files
+
+    def put(self, key: str, files: Sequence[str]):
+        """Store the files of a conversion step.
+
+        Args:
+            key (str): The key of the entry.
+            files (Sequence[str]): The files to store. The files are
+                restored with the same base names. Their companion files are
+                stored as well, with the paths relative to the model files.
+        """
+        entry_dir = self._entry_dir(key)
+        if osp.exists(entry_dir):
+            return
+        names = [osp.basename(file) for file in files]
+        companion_files, companion_names = [], []
+        for file in files:
+            for companion in get_companion_files(file):
+                name = osp.normpath(osp.relpath(companion, osp.dirname(file)))
+                if name.startswith('..') or name in companion_names:
+                    continue
+                companion_files.append(companion)
+                companion_names.append(name)
+        all_names = names + companion_names
+        assert len(set(all_names)) == len(all_names), \
+            f'The names of files should be unique, but got {all_names}.'
+        # write to a temp directory first so readers never see a partial
+        # entry, even if several processes share the cache
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp_', dir=self.cache_dir)
+        try:
+            for file, name in zip(files + companion_files, all_names):
+                dst = osp.join(tmp_dir, name)
+                os.makedirs(osp.dirname(dst), exist_ok=True)
+                _copy_file(file, dst)
+            with open(osp.join(tmp_dir, self.META_FILE), 'w') as f:
+                json.dump(
+                    dict(
+                        files=names,
+                        companion_files=companion_names,
+                        created=time.time()), f)
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self.evict()
+
+    def evict(self):
+        """Evict the least recently used entries until the cache fits in
+        `max_size`."""
+        if self.max_size is None:
+            return
+        entries = []
+        total_size = 0
+        for key in os.listdir(self.cache_dir):
+            entry_dir = self._entry_dir(key)
+            meta_file = osp.join(entry_dir, self.META_FILE)
+            if key.startswith('.') or not osp.exists(meta_file):
+                continue
+            size = _get_size(entry_dir) - osp.getsize(meta_file)
+            entries.append((osp.getmtime(meta_file), size, key))
+            total_size += size
+        for _, size, key in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total_size -= size
+            get_root_logger().info(f'Conversion cache evicted: {key}.')
+
+
+def _copy_file(src: str, dst: str):
+    """Copy a file or a directory, e.g. a CoreML `.mlpackage`.
+
+    The files are not hard linked, since the files in the work directory
+    might be overwritten in place by the later conversions.
+    """
+    if osp.abspath(src) == osp.abspath(dst):
+        return
+    if osp.isdir(src):
+        shutil.rmtree(dst, ignore_errors=True)
+        shutil.copytree(src, dst)
+    else:
+        shutil.copyfile(src, dst)
+
+
+def _get_size(path: str) -> int:
+    """Get the bytes of a file or all files in a directory."""
+    if not osp.isdir(path):
+        return osp.getsize(path)
+    return sum(
+        osp.getsize(osp.join(root, name)) for root, _, names in os.walk(path)
+        for name in names)
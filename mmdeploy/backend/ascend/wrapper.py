@@ -380,8 +380,13 @@ class AscendWrapper(BaseWrapper):
             outputs = {}
             for binding in self._model_desc.outputs:
                 shape = output_shapes[binding.index]
-                tensor = torch.empty(
-                    shape, dtype=binding.data_type, device=torch_device)
+                # write to the output buffer directly if possible
+                tensor = self._get_output_buffer(binding.name, shape,
+                                                 binding.data_type,
+                                                 torch_device)
+                if tensor is None:
+                    tensor = torch.empty(
+                        shape, dtype=binding.data_type, device=torch_device)
                 if torch_device.type == 'npu':
                     ret = acl.update_data_buffer(
                         self._output.buffers[binding.index].handle,
@@ -396,7 +401,7 @@ class AscendWrapper(BaseWrapper):
                 self._copy_buffer_to_tensor(
                     self._output.buffers[binding.index], outputs[binding.name])
 
-            return outputs
+            return self._wrap_outputs(outputs)
 
     def _copy_tensor_to_buffer(self, tensor: torch.Tensor, buffer: DataBuffer):
         if tensor.device.type == 'cpu':
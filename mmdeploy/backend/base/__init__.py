@@ -4,9 +4,10 @@ from .backend_manager import (BACKEND_MANAGERS, BaseBackendManager,
 from .backend_wrapper_registry import (BACKEND_WRAPPER, get_backend_file_count,
                                        get_backend_wrapper_class)
 from .base_wrapper import BaseWrapper
+from .batching_wrapper import BatchingWrapper
 
 __all__ = [
     'BACKEND_MANAGERS', 'BaseBackendManager', 'get_backend_manager',
     'BaseWrapper', 'BACKEND_WRAPPER', 'get_backend_wrapper_class',
-    'get_backend_file_count'
+    'get_backend_file_count', 'BatchingWrapper'
 ]
@@ -1,22 +1,82 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 from abc import ABCMeta, abstractmethod
-from typing import Dict, List, Sequence
+from typing import Any, Dict, List, Optional, Sequence
 
+import numpy as np
 import torch
 
 
+def _as_tensor(output: Any) -> torch.Tensor:
+    """Wrap an output of a backend as a tensor without copy if possible.
+
+    Args:
+        output (Any): A tensor, a numpy array, an object supporting DLPack
+            (`__dlpack__` or `to_dlpack`), or an object exposing its memory
+            by `__cuda_array_interface__` or `__array_interface__`.
+
+    Returns:
+        torch.Tensor: The tensor sharing memory with `output` if possible.
+    """
+    if isinstance(output, torch.Tensor):
+        return output
+    if isinstance(output, np.ndarray):
+        if not output.flags.writeable or any(stride < 0
+                                             for stride in output.strides):
+            output = output.copy()
+        return torch.from_numpy(output)
+    if hasattr(output, '__dlpack__'):
+        return torch.from_dlpack(output)
+    if hasattr(output, 'to_dlpack'):
+        return torch.utils.dlpack.from_dlpack(output.to_dlpack())
+    if hasattr(output, '__cuda_array_interface__'):
+        return torch.as_tensor(output, device='cuda')
+    return torch.from_numpy(np.asarray(output))
+
+
+def _resolve_device(device: Any) -> torch.device:
+    """Resolve a cuda device without index to the current cuda device, so
+    that `cuda` and `cuda:0` are compared as the same device."""
+    device = torch.device(device)
+    if device.type == 'cuda' and device.index is None:
+        device = torch.device('cuda', torch.cuda.current_device())
+    return device
+
+
 class BaseWrapper(torch.nn.Module, metaclass=ABCMeta):
     """Abstract base class for backend wrappers.
 
+    The outputs of the wrappers are placed by the same rules:
+
+    - The outputs stay on the device where the backend computes them, e.g.
+      cuda for TensorRT, unless `keep_on_device` is `False`, in which case
+      they are moved to host memory.
+    - The outputs with a buffer set by `set_output_buffers` are written to
+      the buffer, and the buffer itself is returned. The backend writes to
+      the buffer directly if it is able to, otherwise the output is copied
+      once.
+    - The other outputs are wrapped without copy where possible, e.g. by
+      `torch.from_numpy` or DLPack.
+
+    The wrappers pass their outputs through `_wrap_outputs` to follow them.
+
     Args:
         output_names (Sequence[str]): Names to model outputs in order, which is
         useful when converting the output dict to a ordered list or converting
         the output ordered list to a key-value dict.
+        keep_on_device (bool): Whether to return the outputs on the device
+            of the backend instead of host memory. Defaults to `True`.
     """
 
-    def __init__(self, output_names: Sequence[str]):
+    # whether `forward` can be called from several threads at the same time
+    thread_safe = False
+
+    def __init__(self,
+                 output_names: Sequence[str],
+                 keep_on_device: bool = True):
         super().__init__()
         self._output_names = output_names
+        self.keep_on_device = keep_on_device
+        self._output_buffers = dict()
 
     @staticmethod
     def get_backend_file_count() -> int:
@@ -69,3 +129,97 @@ class BaseWrapper(torch.nn.Module, metaclass=ABCMeta):
         """
         outputs = [output_dict[name] for name in self._output_names]
         return outputs
+
+    @property
+    def output_buffers(self) -> Dict[str, torch.Tensor]:
+        """Return the buffers of the outputs."""
+        return self._output_buffers
+
+    def set_output_buffers(self,
+                           buffers: Optional[Dict[str, torch.Tensor]] = None):
+        """Set the tensors that the outputs are written to.
+
+        The buffers are reused by every forward, so the outputs of a call
+        are overwritten by the next one.
+
+        Args:
+            buffers (Dict[str, torch.Tensor] | None): The output name and
+                buffer pairs. The shape of a buffer should be the same as the
+                output, while the dtype and the device might differ. Defaults
+                to `None`, which removes all buffers.
+        """
+        self._output_buffers = dict(buffers or {})
+
+    def _get_output_buffer(self, name: str, shape: Sequence[int],
+                           dtype: torch.dtype,
+                           device: torch.device) -> Optional[torch.Tensor]:
+        """Get the buffer of an output if the backend can write to it
+        directly.
+
+        Args:
+            name (str): The name of the output.
+            shape (Sequence[int]): The shape of the output.
+            dtype (torch.dtype): The dtype of the output.
+            device (torch.device): The device the backend writes to.
+
+        Returns:
+            torch.Tensor | None: The contiguous buffer with the same shape,
+                dtype and device, or `None` if there is no such buffer.
+        """
+        buffer = self._output_buffers.get(name, None)
+        if buffer is None or tuple(buffer.shape) != tuple(shape) or \
+                buffer.dtype != dtype or \
+                buffer.device != _resolve_device(device) or \
+                not buffer.is_contiguous():
+            return None
+        return buffer
+
+    def _wrap_output(self,
+                     name: str,
+                     output: Any,
+                     copy: bool = False) -> Optional[torch.Tensor]:
+        """Place an output of the backend by the rules of the wrappers.
+
+        Args:
+            name (str): The name of the output.
+            output (Any): The output, see `_as_tensor` for the supported
+                types. `None` is returned as is.
+            copy (bool): Whether `output` is memory reused by the backend,
+                which should be copied if it is neither written to a buffer
+                nor moved to host. Defaults to `False`.
+
+        Returns:
+            torch.Tensor | None: The placed output.
+        """
+        if output is None:
+            return None
+        tensor = _as_tensor(output)
+        buffer = self._output_buffers.get(name, None)
+        if buffer is not None:
+            if tensor is not buffer:
+                if buffer.shape != tensor.shape:
+                    raise ValueError(
+                        f'The shape of the buffer of output {name} should be '
+                        f'{tuple(tensor.shape)}, but got '
+                        f'{tuple(buffer.shape)}.')
+                buffer.copy_(tensor)
+            return buffer
+        if not self.keep_on_device and tensor.device.type != 'cpu':
+            return tensor.cpu()
+        return tensor.clone() if copy else tensor
+
+    def _wrap_outputs(self,
+                      outputs: Dict[str, Any],
+                      copy: bool = False) -> Dict[str, torch.Tensor]:
+        """Place the outputs of the backend by the rules of the wrappers.
+
+        Args:
+            outputs (Dict[str, Any]): The output name and value pairs.
+            copy (bool): Whether the outputs are memory reused by the
+                backend. Defaults to `False`.
+
+        Returns:
+            Dict[str, torch.Tensor]: The output name and tensor pairs.
+        """
+        return dict((name, self._wrap_output(name, output, copy))
+                    for name, output in outputs.items())
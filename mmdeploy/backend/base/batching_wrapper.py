@@ -0,0 +1,195 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List
+
+import torch
+
+from .base_wrapper import BaseWrapper
+
+
+class _Request:
+    """A pending call of `BatchingWrapper.forward`."""
+
+    def __init__(self, inputs: Dict[str, torch.Tensor]):
+        self.inputs = inputs
+        self.batch_size = next(iter(inputs.values())).size(0)
+        self.future = Future()
+
+
+class BatchingWrapper(BaseWrapper):
+    """Aggregate concurrent calls of a backend wrapper into batches.
+
+    The calls of `forward` are queued and a worker thread collects them until
+    `max_batch_size` samples are pending or `timeout` seconds passed since the
+    first one. The requests are grouped by the names, dtypes and non-batch
+    dims of their inputs, each group is concatenated along the batch dim and
+    run with one call of the wrapped wrapper, then the outputs are split back
+    to the callers. All outputs of the wrapped wrapper should be batched on
+    the first dim.
+
+    Args:
+        wrapper (BaseWrapper): The backend wrapper to run batches with.
+        max_batch_size (int): Max number of samples in a batch. Defaults to 8.
+        timeout (float): Max seconds to wait for more requests after the
+            first one of a batch. Defaults to 0.005.
+
+    Examples:
+        >>> from concurrent.futures import ThreadPoolExecutor
+        >>> from mmdeploy.backend.base import BatchingWrapper
+        >>> wrapper = BatchingWrapper(ort_wrapper, max_batch_size=4)
+        >>> inputs = dict(input=torch.randn(1, 3, 224, 224))
+        >>> with ThreadPoolExecutor(4) as executor:
+        >>>     outputs = list(executor.map(wrapper, [inputs] * 16))
+    """
+
+    thread_safe = True
+
+    def __init__(self,
+                 wrapper: BaseWrapper,
+                 max_batch_size: int = 8,
+                 timeout: float = 0.005):
+        assert max_batch_size >= 1, \
+            f'max_batch_size should be positive, but given {max_batch_size}.'
+        super().__init__(wrapper.output_names)
+        self.wrapper = wrapper
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+        self._requests = queue.Queue()
+        self._worker = threading.Thread(
+            target=self.__run_worker, name='BatchingWrapper', daemon=True)
+        self._worker.start()
+
+    @property
+    def output_names(self):
+        """Return the output names."""
+        return self.wrapper.output_names
+
+    @output_names.setter
+    def output_names(self, value):
+        """Set the output names."""
+        self.wrapper.output_names = value
+
+    def output_to_list(self, output_dict: Dict[str, torch.Tensor]) -> \
+            List[torch.Tensor]:
+        """Convert the output dict of forward() to a tensor list."""
+        return self.wrapper.output_to_list(output_dict)
+
+    def forward(self, inputs: Dict[str,
+                                   torch.Tensor]) -> Dict[str, torch.Tensor]:
+        """Run forward inference in the next batch.
+
+        Args:
+            inputs (Dict[str, torch.Tensor]): Key-value pairs of model inputs.
+
+        Returns:
+            Dict[str, torch.Tensor]: Key-value pairs of model outputs.
+        """
+        assert self._worker.is_alive(), 'BatchingWrapper has been destroyed.'
+        request = _Request(inputs)
+        self._requests.put(request)
+        return request.future.result()
+
+    def destroy(self):
+        """Stop the worker thread and destroy the wrapped wrapper."""
+        self._requests.put(None)
+        self._worker.join()
+        if hasattr(self.wrapper, 'destroy'):
+            self.wrapper.destroy()
+
+    def __run_worker(self):
+        """Collect the pending requests and run them in batches."""
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            requests = [request]
+            num_samples = request.batch_size
+            deadline = time.perf_counter() + self.timeout
+            stop = False
+            while num_samples < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        request = self._requests.get(timeout=remaining)
+                    else:
+                        request = self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                requests.append(request)
+                num_samples += request.batch_size
+            for batch in self.__group_requests(requests):
+                self.__run_batch(batch)
+            if stop:
+                return
+
+    def __group_requests(self,
+                         requests: List[_Request]) -> List[List[_Request]]:
+        """Group the requests with the same input signature into batches.
+
+        Args:
+            requests (List[_Request]): The pending requests.
+
+        Returns:
+            List[List[_Request]]: The batches of requests.
+        """
+        groups = OrderedDict()
+        for request in requests:
+            key = tuple(
+                (name, tensor.dtype, tensor.device, tuple(tensor.shape[1:]))
+                for name, tensor in request.inputs.items())
+            groups.setdefault(key, []).append(request)
+
+        batches = []
+        for group in groups.values():
+            batch, num_samples = [], 0
+            for request in group:
+                if batch and \
+                        num_samples + request.batch_size > self.max_batch_size:
+                    batches.append(batch)
+                    batch, num_samples = [], 0
+                batch.append(request)
+                num_samples += request.batch_size
+            batches.append(batch)
+        return batches
+
+    def __run_batch(self, requests: List[_Request]):
+        """Run one batch and scatter the outputs to the requests.
+
+        Args:
+            requests (List[_Request]): The requests with the same input
+                signature.
+        """
+        try:
+            if len(requests) == 1:
+                outputs = self.wrapper(requests[0].inputs)
+                requests[0].future.set_result(outputs)
+                return
+            inputs = dict(
+                (name,
+                 torch.cat([request.inputs[name] for request in requests]))
+                for name in requests[0].inputs)
+            outputs = self.wrapper(inputs)
+            num_samples = sum(request.batch_size for request in requests)
+            for name, output in outputs.items():
+                assert output.size(0) == num_samples, \
+                    f'Output {name} of shape {tuple(output.shape)} is not ' \
+                    f'batched on the first dim with {num_samples} samples.'
+        except Exception as e:
+            for request in requests:
+                request.future.set_exception(e)
+            return
+
+        start = 0
+        for request in requests:
+            end = start + request.batch_size
+            request.future.set_result(
+                dict((name, output[start:end])
+                     for name, output in outputs.items()))
+            start = end
@@ -114,16 +114,19 @@ class NCNNWrapper(BaseWrapper):
                     logger.warning(
                         f'The "{name}" output of ncnn model is empty.')
                     continue
-                outputs[name][batch_id] = torch.from_numpy(np.array(mat))
+                # the array shares the memory of the mat and keeps it alive
+                outputs[name][batch_id] = torch.from_numpy(np.asarray(mat))
 
         # stack outputs together
         for name, output_tensor in outputs.items():
             if None in output_tensor:
                 outputs[name] = None
+            elif batch_size == 1:
+                outputs[name] = output_tensor[0].unsqueeze(0)
             else:
                 outputs[name] = torch.stack(output_tensor)
 
-        return outputs
+        return self._wrap_outputs(outputs)
 
     @TimeCounter.count_time(Backend.NCNN.value)
     def __ncnn_execute(self, extractor: ncnn.Extractor,
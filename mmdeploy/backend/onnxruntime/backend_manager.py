@@ -32,10 +32,33 @@ class ONNXRuntimeManager(BaseBackendManager):
         """
 
         from .wrapper import ORTWrapper
+
+        # For unittest deploy_config will not pass into _build_wrapper
+        # function.
+        if deploy_cfg:
+            backend_config = get_backend_config(deploy_cfg)
+            use_io_binding_cache = backend_config.get('use_io_binding_cache',
+                                                      False)
+            use_cuda_graph = backend_config.get('use_cuda_graph', False)
+            session_options = backend_config.get('session_options', None)
+            providers = backend_config.get('providers', None)
+            optimized_model_cache = backend_config.get('optimized_model_cache',
+                                                       False)
+        else:
+            use_io_binding_cache = False
+            use_cuda_graph = False
+            session_options = None
+            providers = None
+            optimized_model_cache = False
         return ORTWrapper(
             onnx_file=backend_files[0],
             device=device,
-            output_names=output_names)
+            output_names=output_names,
+            use_io_binding_cache=use_io_binding_cache,
+            use_cuda_graph=use_cuda_graph,
+            session_options=session_options,
+            providers=providers,
+            optimized_model_cache=optimized_model_cache)
 
     @classmethod
     def is_available(cls, with_custom_ops: bool = False) -> bool:
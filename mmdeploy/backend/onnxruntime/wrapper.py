@@ -1,7 +1,11 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import ctypes
+import hashlib
+import os
 import os.path as osp
-from typing import Dict, Optional, Sequence
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence
 
 import numpy as np
 import onnxruntime as ort
@@ -12,6 +16,66 @@ from mmdeploy.utils.timer import TimeCounter
 from ..base import BACKEND_WRAPPER, BaseWrapper
 from .init_plugins import get_lib_path, get_ops_path
 
+ORT_TYPE_TO_TORCH = {
+    'tensor(float)': torch.float32,
+    'tensor(float16)': torch.float16,
+    'tensor(double)': torch.float64,
+    'tensor(int64)': torch.int64,
+    'tensor(int32)': torch.int32,
+    'tensor(int8)': torch.int8,
+    'tensor(uint8)': torch.uint8,
+    'tensor(bool)': torch.bool
+}
+
+EXECUTION_MODES = {
+    'sequential': ort.ExecutionMode.ORT_SEQUENTIAL,
+    'parallel': ort.ExecutionMode.ORT_PARALLEL
+}
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    'basic': ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    'extended': ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    'all': ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+}
+
+# providers that run on the cuda device given to the wrapper
+CUDA_PROVIDERS = ('CUDAExecutionProvider', 'TensorrtExecutionProvider')
+
+
+class _OrtValueMemory:
+    """Expose the memory of an `OrtValue` by the array interface, so that it
+    is wrapped as a tensor without copy.
+
+    The tensor keeps a reference of this object, which keeps the `OrtValue`
+    alive.
+
+    Args:
+        ort_value (ort.OrtValue): A tensor of a type in `ORT_TYPE_TO_TORCH`.
+    """
+
+    def __init__(self, ort_value: ort.OrtValue):
+        self.ort_value = ort_value
+        dtype = torch.empty(
+            0, dtype=ORT_TYPE_TO_TORCH[ort_value.data_type()]).numpy().dtype
+        self.is_cuda = ort_value.device_name().lower() == 'cuda'
+        self._interface = dict(
+            shape=tuple(ort_value.shape()),
+            typestr=dtype.str,
+            data=(ort_value.data_ptr(), False))
+
+    @property
+    def __array_interface__(self) -> Dict:
+        if self.is_cuda:
+            raise AttributeError('The memory is on cuda device.')
+        return dict(self._interface, version=3)
+
+    @property
+    def __cuda_array_interface__(self) -> Dict:
+        if not self.is_cuda:
+            raise AttributeError('The memory is on cpu device.')
+        return dict(self._interface, strides=None, version=2)
+
 
 @BACKEND_WRAPPER.register_module(Backend.ONNXRUNTIME.value)
 class ORTWrapper(BaseWrapper):
@@ -23,6 +87,40 @@ class ORTWrapper(BaseWrapper):
          output_names (Sequence[str] | None): Names of model outputs in order.
             Defaults to `None` and the wrapper will load the output names from
             model.
+         use_io_binding_cache (bool): Whether to cache the io binding of each
+            input signature (names, shapes and dtypes) and bind the outputs to
+            persistent tensors on the target device. The outputs are returned
+            without the round trip to host memory and are overwritten by the
+            next call with the same signature. Defaults to `False`.
+         io_binding_cache_size (int): Max number of cached input signatures.
+            The least recently used one is evicted first. Defaults to 8.
+         use_cuda_graph (bool): Whether to run the model with the cuda graph
+            of the CUDA execution provider. The graph is captured on the first
+            call with persistent input/output buffers and replayed afterwards.
+            Only models with static input/output shapes on cuda device are
+            supported. Defaults to `False`.
+         session_options (Dict | None): The attributes of
+            `ort.SessionOptions`, e.g. `intra_op_num_threads`,
+            `inter_op_num_threads`, `execution_mode` (`'sequential'` or
+            `'parallel'`) and `graph_optimization_level` (`'disable'`,
+            `'basic'`, `'extended'` or `'all'`). The session config entries
+            can be given by `config_entries`. Defaults to `None`.
+         providers (Sequence[str | tuple] | None): The execution providers in
+            the order of priority, each of them is a name or a pair of name
+            and options, e.g. `['TensorrtExecutionProvider',
+            'CUDAExecutionProvider']`. The `device_id` of the cuda providers
+            is set by `device`, and unavailable providers are skipped.
+            Defaults to `None`, which uses the cpu or cuda provider according
+            to `device`.
+         optimized_model_cache (bool): Whether to save the model optimized by
+            onnxruntime next to `onnx_file` and load it without optimizations
+            on the later starts. The cache is specific to the version of
+            onnxruntime, the providers and the session options. Defaults to
+            `False`.
+         keep_on_device (bool): Whether to return the outputs on the cuda
+            device without a copy to host memory. The outputs are allocated by
+            onnxruntime on the device and wrapped without copy. Defaults to
+            `True`.
 
      Examples:
          >>> from mmdeploy.backend.onnxruntime import ORTWrapper
@@ -38,83 +136,508 @@ class ORTWrapper(BaseWrapper):
     def __init__(self,
                  onnx_file: str,
                  device: str,
-                 output_names: Optional[Sequence[str]] = None):
+                 output_names: Optional[Sequence[str]] = None,
+                 use_io_binding_cache: bool = False,
+                 io_binding_cache_size: int = 8,
+                 use_cuda_graph: bool = False,
+                 session_options: Optional[Dict[str, Any]] = None,
+                 providers: Optional[Sequence[Any]] = None,
+                 optimized_model_cache: bool = False,
+                 keep_on_device: bool = True):
         # get the custom op path
         ort_custom_op_path = get_ops_path()
-        session_options = ort.SessionOptions()
-        # register custom op for onnxruntime
+        session_options_cfg = session_options or dict()
+        session_options = self._create_session_options(session_options_cfg)
         logger = get_root_logger()
         if osp.exists(ort_custom_op_path):
-            # load ort lib before custom ops lib
-            lib_path = get_lib_path()
-            if osp.exists(lib_path):
-                ctypes.CDLL(lib_path)
-
-            session_options.register_custom_ops_library(ort_custom_op_path)
             logger.info('Successfully loaded onnxruntime custom ops from '
                         f'{ort_custom_op_path}')
         else:
             logger.warning('The library of onnxruntime custom ops does'
                            f'not exist: {ort_custom_op_path}')
         device_id = parse_device_id(device)
-        providers = ['CPUExecutionProvider'] \
-            if device == 'cpu' else \
-            [('CUDAExecutionProvider', {'device_id': device_id})]
-        sess = ort.InferenceSession(
-            onnx_file, session_options, providers=providers)
+        if use_cuda_graph and device == 'cpu':
+            logger.warning('CUDA graph is not available on cpu device.')
+            use_cuda_graph = False
+        providers = self._build_providers(providers, device, device_id)
+        if use_cuda_graph:
+            if providers[0][0] == 'CUDAExecutionProvider':
+                providers[0][1]['enable_cuda_graph'] = '1'
+            else:
+                logger.warning('CUDA graph requires the CUDA execution '
+                               f'provider, but got {providers[0][0]}.')
+                use_cuda_graph = False
+        self._optimized_model_cache = optimized_model_cache
+        self._session_options_cfg = session_options_cfg
+        sess = self._create_session(onnx_file, session_options, providers)
+        if use_cuda_graph and not all(
+                _.type in ORT_TYPE_TO_TORCH and all(
+                    isinstance(dim, int) for dim in _.shape)
+                for _ in sess.get_inputs() + sess.get_outputs()):
+            logger.warning('CUDA graph requires a model with static '
+                           'input/output shapes, fall back to normal '
+                           'inference.')
+            use_cuda_graph = False
+            providers[0][1].pop('enable_cuda_graph')
+            sess = self._create_session(onnx_file, session_options, providers)
         if output_names is None:
             output_names = [_.name for _ in sess.get_outputs()]
         self.sess = sess
         self._input_metas = {_.name: _ for _ in sess.get_inputs()}
-        self.io_binding = sess.io_binding()
         self.device_id = device_id
         self.device_type = 'cpu' if device == 'cpu' else 'cuda'
-        super().__init__(output_names)
+        self.device = torch.device('cpu') if device == 'cpu' else \
+            torch.device('cuda', device_id)
+        self._output_metas = {_.name: _ for _ in sess.get_outputs()}
+        self._use_io_binding_cache = use_io_binding_cache
+        self._io_binding_cache_size = io_binding_cache_size
+        self._io_binding_cache = OrderedDict()
+        self._use_cuda_graph = use_cuda_graph
+        self._cuda_graph_binding = None
+        # the cached io bindings and the cuda graph are shared by the calls,
+        # and their outputs are overwritten by the next call
+        self._lock = threading.Lock()
+        self.thread_safe = not (use_io_binding_cache or use_cuda_graph)
+        super().__init__(output_names, keep_on_device=keep_on_device)
 
-    def forward(self, inputs: Dict[str,
-                                   torch.Tensor]) -> Dict[str, torch.Tensor]:
-        """Run forward inference.
+    @staticmethod
+    def _build_session_options(cfg: Dict[str, Any]) -> ort.SessionOptions:
+        """Build the session options from a dict.
+
+        Args:
+            cfg (Dict[str, Any]): The attributes of `ort.SessionOptions`, and
+                the session config entries in `config_entries`.
+
+        Returns:
+            ort.SessionOptions: The session options.
+        """
+        session_options = ort.SessionOptions()
+        for key, value in cfg.items():
+            if key == 'config_entries':
+                for entry_key, entry_value in value.items():
+                    session_options.add_session_config_entry(
+                        entry_key, str(entry_value))
+                continue
+            if key == 'execution_mode' and isinstance(value, str):
+                value = EXECUTION_MODES[value.lower()]
+            elif key == 'graph_optimization_level' and isinstance(value, str):
+                value = GRAPH_OPTIMIZATION_LEVELS[value.lower()]
+            if not hasattr(session_options, key):
+                raise KeyError(f'Unknown session option of onnxruntime: {key}')
+            setattr(session_options, key, value)
+        return session_options
+
+    @classmethod
+    def _create_session_options(cls, cfg: Dict) -> ort.SessionOptions:
+        """Build the session options and register the custom ops of mmdeploy
+        to them.
+
+        Args:
+            cfg (Dict[str, Any]): The attributes of `ort.SessionOptions`, and
+                the session config entries in `config_entries`.
+
+        Returns:
+            ort.SessionOptions: The session options.
+        """
+        session_options = cls._build_session_options(cfg)
+        ort_custom_op_path = get_ops_path()
+        if osp.exists(ort_custom_op_path):
+            # load ort lib before custom ops lib
+            lib_path = get_lib_path()
+            if osp.exists(lib_path):
+                ctypes.CDLL(lib_path)
+            session_options.register_custom_ops_library(ort_custom_op_path)
+        return session_options
+
+    @staticmethod
+    def _build_providers(providers: Optional[Sequence[Any]], device: str,
+                         device_id: int) -> list:
+        """Build the execution providers with their options.
+
+        Args:
+            providers (Sequence[str | tuple] | None): The provider names or
+                name and options pairs.
+            device (str): The device to run on.
+            device_id (int): The id of the cuda device.
+
+        Returns:
+            list: The available providers as name and options pairs.
+        """
+        if providers is None:
+            providers = ['CPUExecutionProvider'] if device == 'cpu' else \
+                ['CUDAExecutionProvider']
+        available_providers = ort.get_available_providers()
+        results = []
+        for provider in providers:
+            if isinstance(provider, str):
+                name, options = provider, dict()
+            else:
+                name, options = provider[0], dict(provider[1])
+            if name not in available_providers:
+                get_root_logger().warning(
+                    f'{name} is not available in onnxruntime, '
+                    f'available providers: {available_providers}.')
+                continue
+            if name in CUDA_PROVIDERS:
+                options.setdefault('device_id', device_id)
+            results.append((name, options))
+        if len(results) == 0:
+            results.append(('CPUExecutionProvider', dict()))
+        return results
+
+    def _create_session(self, onnx_file: str,
+                        session_options: ort.SessionOptions,
+                        providers: list) -> ort.InferenceSession:
+        """Create the inference session, with the optimized model cache if
+        it is enabled.
+
+        Args:
+            onnx_file (str): The onnx model file.
+            session_options (ort.SessionOptions): The session options.
+            providers (list): The providers and their options.
+
+        Returns:
+            ort.InferenceSession: The inference session.
+        """
+        if not self._optimized_model_cache:
+            return ort.InferenceSession(
+                onnx_file, session_options, providers=providers)
+
+        logger = get_root_logger()
+        stat = os.stat(onnx_file)
+        key = repr((ort.__version__, stat.st_size, stat.st_mtime_ns, providers,
+                    sorted(self._session_options_cfg.items())))
+        key = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+        cache_file = f'{osp.splitext(onnx_file)[0]}.ort-{key}.onnx'
+        if osp.exists(cache_file):
+            # the cached model has been optimized
+            cached_options = self._create_session_options(
+                self._session_options_cfg)
+            cached_options.graph_optimization_level = \
+                ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+            try:
+                sess = ort.InferenceSession(
+                    cache_file, cached_options, providers=providers)
+                logger.info(f'Load optimized onnx model from {cache_file}.')
+                return sess
+            except Exception as e:
+                logger.warning(
+                    f'Failed to load optimized onnx model {cache_file}: {e}')
+
+        if not os.access(osp.dirname(osp.abspath(cache_file)), os.W_OK):
+            logger.warning('Can not save the optimized onnx model next to '
+                           f'{onnx_file}, the directory is not writable.')
+            return ort.InferenceSession(
+                onnx_file, session_options, providers=providers)
+        # save to a temp file first, since other workers might load the
+        # cache at the same time
+        tmp_file = f'{cache_file}.{os.getpid()}.tmp'
+        session_options.optimized_model_filepath = tmp_file
+        try:
+            sess = ort.InferenceSession(
+                onnx_file, session_options, providers=providers)
+            os.replace(tmp_file, cache_file)
+            logger.info(f'Save optimized onnx model to {cache_file}.')
+        except Exception as e:
+            logger.warning(f'Failed to save optimized onnx model: {e}')
+            sess = None
+        finally:
+            session_options.optimized_model_filepath = ''
+            if osp.exists(tmp_file):
+                os.remove(tmp_file)
+        if sess is None:
+            sess = ort.InferenceSession(
+                onnx_file, session_options, providers=providers)
+        return sess
+
+    @staticmethod
+    def _get_element_type(tensor: torch.Tensor) -> np.dtype:
+        """Get the numpy element type of a tensor."""
+        # Avoid unnecessary data transfer between host and device
+        return tensor.new_zeros(1, device='cpu').numpy().dtype
+
+    def _prepare_inputs(
+            self, inputs: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+        """Cast the inputs to the types and device required by the session.
 
         Args:
             inputs (Dict[str, torch.Tensor]): The input name and tensor pairs.
 
         Returns:
-            Dict[str, torch.Tensor]: The output name and tensor pairs.
+            Dict[str, torch.Tensor]: The contiguous input tensors.
         """
+        prepared = {}
         for name, input_tensor in inputs.items():
-            # set io binding for inputs/outputs
             input_type = self._input_metas[name].type
             if 'float16' in input_type:
                 input_tensor = input_tensor.to(torch.float16)
             input_tensor = input_tensor.contiguous()
             if self.device_type == 'cpu':
                 input_tensor = input_tensor.cpu()
-            # Avoid unnecessary data transfer between host and device
-            element_type = input_tensor.new_zeros(
-                1, device='cpu').numpy().dtype
-            self.io_binding.bind_input(
+            prepared[name] = input_tensor
+        return prepared
+
+    def _bind_inputs(self, io_binding: ort.IOBinding,
+                     inputs: Dict[str, torch.Tensor]):
+        """Bind the prepared inputs to the io binding.
+
+        Args:
+            io_binding (ort.IOBinding): The io binding to update.
+            inputs (Dict[str, torch.Tensor]): The prepared input tensors.
+        """
+        for name, input_tensor in inputs.items():
+            io_binding.bind_input(
                 name=name,
                 device_type=self.device_type,
                 device_id=self.device_id,
-                element_type=element_type,
+                element_type=self._get_element_type(input_tensor),
                 shape=input_tensor.shape,
                 buffer_ptr=input_tensor.data_ptr())
 
+    def forward(self, inputs: Dict[str,
+                                   torch.Tensor]) -> Dict[str, torch.Tensor]:
+        """Run forward inference.
+
+        Args:
+            inputs (Dict[str, torch.Tensor]): The input name and tensor pairs.
+
+        Returns:
+            Dict[str, torch.Tensor]: The output name and tensor pairs.
+        """
+        inputs = self._prepare_inputs(inputs)
+        if self._use_cuda_graph:
+            with self._lock:
+                return self._forward_with_cuda_graph(inputs)
+        if self._use_io_binding_cache:
+            with self._lock:
+                outputs = self._forward_with_cache(inputs)
+            if outputs is not None:
+                return outputs
+
+        # set io binding for inputs/outputs, the outputs are written to the
+        # output buffers directly or allocated on the device of the session.
+        # A binding per call, so the session can be called concurrently.
+        io_binding = self.sess.io_binding()
+        self._bind_inputs(io_binding, inputs)
+        buffers = {}
         for name in self._output_names:
-            self.io_binding.bind_output(name)
+            buffer = self._get_static_output_buffer(name)
+            if buffer is not None:
+                buffers[name] = buffer
+                self._bind_outputs(io_binding, {name: buffer})
+            else:
+                io_binding.bind_output(
+                    name,
+                    device_type=self.device_type,
+                    device_id=self.device_id)
         # run session to get outputs
         if self.device_type == 'cuda':
             torch.cuda.synchronize()
-        self.__ort_execute(self.io_binding)
-        output_list = self.io_binding.copy_outputs_to_cpu()
+        self.__ort_execute(io_binding)
         outputs = {}
-        for output_name, numpy_tensor in zip(self._output_names, output_list):
-            if numpy_tensor.dtype == np.float16:
-                numpy_tensor = numpy_tensor.astype(np.float32)
-            outputs[output_name] = torch.from_numpy(numpy_tensor)
+        for name, ort_value in zip(self._output_names,
+                                   io_binding.get_outputs()):
+            output = buffers.get(name, None)
+            if output is None:
+                output = self._ort_value_to_tensor(ort_value)
+                if output.dtype == torch.float16:
+                    output = output.float()
+            outputs[name] = output
+
+        return self._wrap_outputs(outputs)
 
+    def _get_static_output_buffer(self, name: str) -> Optional[torch.Tensor]:
+        """Get the output buffer that the session can write to directly.
+
+        Args:
+            name (str): The name of the output.
+
+        Returns:
+            torch.Tensor | None: The buffer of the output, or `None` if the
+                output shape is not static or the buffer does not match it.
+        """
+        meta = self._output_metas[name]
+        dtype = ORT_TYPE_TO_TORCH.get(meta.type, None)
+        if dtype is None or not all(
+                isinstance(dim, int) for dim in meta.shape):
+            return None
+        return self._get_output_buffer(name, meta.shape, dtype, self.device)
+
+    def _ort_value_to_tensor(self, ort_value: ort.OrtValue) -> torch.Tensor:
+        """Wrap an output of the session as a tensor without copy.
+
+        Args:
+            ort_value (ort.OrtValue): The output.
+
+        Returns:
+            torch.Tensor: The tensor on the device of the session.
+        """
+        if ort_value.data_type() not in ORT_TYPE_TO_TORCH or \
+                0 in ort_value.shape():
+            return torch.from_numpy(ort_value.numpy()).to(self.device)
+        memory = _OrtValueMemory(ort_value)
+        if memory.is_cuda:
+            return torch.as_tensor(memory)
+        return torch.from_numpy(np.asarray(memory))
+
+    def _forward_with_cache(
+            self,
+            inputs: Dict[str,
+                         torch.Tensor]) -> Optional[Dict[str, torch.Tensor]]:
+        """Run forward inference with the io binding cached for the input
+        signature.
+
+        The outputs of a cached signature are bound to persistent tensors on
+        the target device, so the session writes the results in place and no
+        copy to host memory is made. The output shapes come from the session
+        metadata if they are static, otherwise from the first run.
+
+        Args:
+            inputs (Dict[str, torch.Tensor]): The prepared input tensors.
+
+        Returns:
+            Dict[str, torch.Tensor] | None: The output name and tensor pairs,
+                or `None` if the output shapes of this signature are data
+                dependent and can not be bound to persistent buffers.
+        """
+        key = tuple((name, tuple(tensor.shape), tensor.dtype)
+                    for name, tensor in inputs.items())
+        if key in self._io_binding_cache:
+            self._io_binding_cache.move_to_end(key)
+            entry = self._io_binding_cache[key]
+            if entry is None:
+                return None
+            io_binding, buffers = entry
+            self._bind_inputs(io_binding, inputs)
+            if self.device_type == 'cuda':
+                torch.cuda.synchronize()
+            try:
+                self.__ort_execute(io_binding)
+            except Exception as e:
+                # output shape changed with the content of the inputs
+                get_root_logger().warning(
+                    'Disable io binding cache for input signature '
+                    f'{key}: {e}')
+                self._io_binding_cache[key] = None
+                return None
+        else:
+            io_binding = self.sess.io_binding()
+            self._bind_inputs(io_binding, inputs)
+            buffers = self._allocate_outputs()
+            if buffers is None:
+                # run once to get the output shapes
+                for name in self._output_names:
+                    io_binding.bind_output(name)
+                if self.device_type == 'cuda':
+                    torch.cuda.synchronize()
+                self.__ort_execute(io_binding)
+                buffers = {}
+                for name, numpy_tensor in zip(
+                        self._output_names, io_binding.copy_outputs_to_cpu()):
+                    buffers[name] = torch.from_numpy(numpy_tensor).to(
+                        self.device)
+                io_binding.clear_binding_outputs()
+                self._bind_outputs(io_binding, buffers)
+            else:
+                self._bind_outputs(io_binding, buffers)
+                if self.device_type == 'cuda':
+                    torch.cuda.synchronize()
+                self.__ort_execute(io_binding)
+            self._io_binding_cache[key] = (io_binding, buffers)
+            if len(self._io_binding_cache) > self._io_binding_cache_size:
+                self._io_binding_cache.popitem(last=False)
+
+        outputs = {}
+        for name in self._output_names:
+            output = buffers[name]
+            if output.dtype == torch.float16:
+                output = output.float()
+            outputs[name] = output
+        return self._wrap_outputs(outputs)
+
+    def _forward_with_cuda_graph(
+            self, inputs: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+        """Run forward inference with the cuda graph of the session.
+
+        The io binding of the graph is created on the first call, the inputs
+        are copied into its persistent buffers before every run.
+
+        Args:
+            inputs (Dict[str, torch.Tensor]): The prepared input tensors.
+
+        Returns:
+            Dict[str, torch.Tensor]: The output name and tensor pairs.
+        """
+        if self._cuda_graph_binding is None:
+            io_binding = self.sess.io_binding()
+            static_inputs = dict()
+            for name, meta in self._input_metas.items():
+                static_inputs[name] = torch.empty(
+                    meta.shape,
+                    dtype=ORT_TYPE_TO_TORCH[meta.type],
+                    device=self.device)
+            self._bind_inputs(io_binding, static_inputs)
+            static_outputs = self._allocate_outputs()
+            self._bind_outputs(io_binding, static_outputs)
+            self._cuda_graph_binding = (io_binding, static_inputs,
+                                        static_outputs)
+        io_binding, static_inputs, static_outputs = self._cuda_graph_binding
+
+        for name, input_tensor in inputs.items():
+            static_input = static_inputs[name]
+            assert input_tensor.shape == static_input.shape, \
+                f'Input shape of {name} should be ' \
+                f'{tuple(static_input.shape)} in cuda graph mode ' \
+                f'but get {tuple(input_tensor.shape)}.'
+            static_input.copy_(input_tensor)
+        torch.cuda.synchronize()
+        self.__ort_execute(io_binding)
+
+        # the persistent outputs are overwritten by the next run
+        outputs = {}
+        for name in self._output_names:
+            output = static_outputs[name]
+            if output.dtype == torch.float16:
+                outputs[name] = self._wrap_output(name, output.float())
+            else:
+                outputs[name] = self._wrap_output(name, output, copy=True)
         return outputs
 
+    def _allocate_outputs(self) -> Optional[Dict[str, torch.Tensor]]:
+        """Allocate the output tensors from the static output shapes.
+
+        Returns:
+            Dict[str, torch.Tensor] | None: The output name and tensor pairs,
+                or `None` if any output shape or type is unknown before run.
+        """
+        buffers = {}
+        for name in self._output_names:
+            meta = self._output_metas[name]
+            dtype = ORT_TYPE_TO_TORCH.get(meta.type, None)
+            if dtype is None or not all(
+                    isinstance(dim, int) for dim in meta.shape):
+                return None
+            buffers[name] = torch.empty(
+                meta.shape, dtype=dtype, device=self.device)
+        return buffers
+
+    def _bind_outputs(self, io_binding: ort.IOBinding,
+                      buffers: Dict[str, torch.Tensor]):
+        """Bind persistent tensors to the outputs of the io binding.
+
+        Args:
+            io_binding (ort.IOBinding): The io binding to update.
+            buffers (Dict[str, torch.Tensor]): The output tensors.
+        """
+        for name, buffer in buffers.items():
+            io_binding.bind_output(
+                name=name,
+                device_type=self.device_type,
+                device_id=self.device_id,
+                element_type=self._get_element_type(buffer),
+                shape=tuple(buffer.shape),
+                buffer_ptr=buffer.data_ptr())
+
     @TimeCounter.count_time(Backend.ONNXRUNTIME.value)
     def __ort_execute(self, io_binding: ort.IOBinding):
         """Run inference with ONNXRuntime session.
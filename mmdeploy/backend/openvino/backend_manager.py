@@ -28,9 +28,26 @@ class OpenVINOManager(BaseBackendManager):
             deploy_cfg (Optional[Any], optional): The deploy config. Defaults
                 to None.
         """
+        from mmdeploy.utils import get_backend_config
         from .wrapper import OpenVINOWrapper
+
+        # For unittest deploy_config will not pass into _build_wrapper
+        # function.
+        if deploy_cfg:
+            backend_config = get_backend_config(deploy_cfg)
+            num_requests = backend_config.get('num_requests', 1)
+            performance_hint = backend_config.get('performance_hint', None)
+            max_cached_networks = backend_config.get('max_cached_networks', 4)
+        else:
+            num_requests = 1
+            performance_hint = None
+            max_cached_networks = 4
         return OpenVINOWrapper(
-            ir_model_file=backend_files[0], output_names=output_names)
+            ir_model_file=backend_files[0],
+            output_names=output_names,
+            num_requests=num_requests,
+            performance_hint=performance_hint,
+            max_cached_networks=max_cached_networks)
 
     @classmethod
     def is_available(cls, with_custom_ops: bool = False) -> bool:
@@ -1,8 +1,11 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import os.path as osp
-from typing import Dict, Optional, Sequence
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Dict, Optional, Sequence, Tuple
 
-import numpy as np
 import torch
 
 from mmdeploy.utils import Backend
@@ -19,6 +22,16 @@ class OpenVINOWrapper(BaseWrapper):
         output_names (Sequence[str] | None): Names of model outputs in order.
             Defaults to `None` and the wrapper will load the output names from
             model.
+        num_requests (int): Number of infer requests created on each
+            executable network. `forward` and `forward_async` run on the
+            idle requests, so concurrent calls run at the same time. `0`
+            creates the optimal number of requests of the device. Defaults to
+            1.
+        performance_hint (str | None): The performance hint of the device,
+            `'THROUGHPUT'` or `'LATENCY'`. Defaults to `None`.
+        max_cached_networks (int): Max number of executable networks cached
+            by the input shapes, the least recently used idle one is released
+            when it is exceeded. Defaults to 4.
 
     Examples:
         >>> from mmdeploy.backend.openvino import OpenVINOWrapper
@@ -29,27 +42,39 @@ class OpenVINOWrapper(BaseWrapper):
         >>> inputs = dict(input=torch.randn(1, 3, 224, 224, device='cpu'))
         >>> outputs = model(inputs)
         >>> print(outputs)
+        >>>
+        >>> model = OpenVINOWrapper(ir_model_file, num_requests=4,
+        >>>                         performance_hint='THROUGHPUT')
+        >>> futures = [model.forward_async(inputs) for _ in range(8)]
+        >>> outputs = [future.result() for future in futures]
     """
 
+    thread_safe = True
+
     def __init__(self,
                  ir_model_file: str,
                  output_names: Optional[Sequence[str]] = None,
+                 num_requests: int = 1,
+                 performance_hint: Optional[str] = None,
+                 max_cached_networks: int = 4,
                  **kwargs):
 
         from openvino.inference_engine import IECore
         self.ie = IECore()
         bin_path = osp.splitext(ir_model_file)[0] + '.bin'
         self.net = self.ie.read_network(ir_model_file, bin_path)
-        for input in self.net.input_info.values():
-            batch_size = input.input_data.shape[0]
-            dims = len(input.input_data.shape)
-            # if input is a image, it has (B,C,H,W) channels,
-            # need batch_size==1
-            assert not dims == 4 or batch_size == 1, \
-                'Only batch 1 is supported.'
         self.device = 'cpu'
-        self.sess = self.ie.load_network(
-            network=self.net, device_name=self.device.upper(), num_requests=1)
+        self.num_requests = num_requests
+        self.max_cached_networks = max(max_cached_networks, 1)
+        self._config = dict()
+        if performance_hint is not None:
+            self._config['PERFORMANCE_HINT'] = performance_hint.upper()
+        # executable networks and their idle requests by input shapes
+        self._exec_nets = OrderedDict()
+        self._lock = threading.Lock()
+        input_shapes = tuple((name, tuple(info.input_data.shape))
+                             for name, info in self.net.input_info.items())
+        self.sess = self.__get_exec_net(input_shapes)[0]
 
         # TODO: Check if output_names can be read
         if output_names is None:
@@ -75,42 +100,65 @@ class OpenVINOWrapper(BaseWrapper):
         }
         return updated_inputs
 
-    def __reshape(self, inputs: Dict[str, torch.Tensor]):
-        """Reshape the model for the shape of the input data.
+    def __get_exec_net(
+        self, input_shapes: Tuple[Tuple[str, Tuple],
+                                  ...]) -> Tuple[Any, queue.Queue]:
+        """Get the executable network for the input shapes.
+
+        The network is reshaped and loaded on the first call of the shapes.
 
         Args:
-            inputs (Dict[str, torch.Tensor]): The input name and tensor pairs.
+            input_shapes (Tuple[Tuple[str, Tuple], ...]): The input name and
+                shape pairs.
+
+        Returns:
+            Tuple[Any, queue.Queue]: The executable network and the queue of
+                the ids of its idle requests.
         """
-        input_shapes = {name: data.shape for name, data in inputs.items()}
-        reshape_needed = False
-        for input_name, input_shape in input_shapes.items():
-            blob_shape = self.net.input_info[input_name].input_data.shape
-            if not np.array_equal(input_shape, blob_shape):
-                reshape_needed = True
-                break
-        if reshape_needed:
-            self.net.reshape(input_shapes)
-            self.sess = self.ie.load_network(
+        with self._lock:
+            exec_net = self._exec_nets.get(input_shapes)
+            if exec_net is not None:
+                self._exec_nets.move_to_end(input_shapes)
+                return exec_net
+            if any(
+                    tuple(self.net.input_info[name].input_data.shape) != shape
+                    for name, shape in input_shapes):
+                self.net.reshape(dict(input_shapes))
+            sess = self.ie.load_network(
                 network=self.net,
                 device_name=self.device.upper(),
-                num_requests=1)
+                config=self._config,
+                num_requests=self.num_requests)
+            idle_requests = queue.Queue()
+            for request_id in range(len(sess.requests)):
+                idle_requests.put(request_id)
+            exec_net = (sess, idle_requests)
+            self._exec_nets[input_shapes] = exec_net
+            # release the least recently used networks without running
+            # requests
+            for key, (old_sess, old_idle) in list(self._exec_nets.items()):
+                if len(self._exec_nets) <= self.max_cached_networks:
+                    break
+                if key != input_shapes and \
+                        old_idle.qsize() == len(old_sess.requests):
+                    self._exec_nets.pop(key)
+            return exec_net
 
-    def __process_outputs(
-            self, outputs: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
-        """Converts tensors from 'torch' to 'numpy' and fixes the names of the
+    def __process_outputs(self, outputs: Dict[str,
+                                              Any]) -> Dict[str, torch.Tensor]:
+        """Converts the output blobs to tensors and fixes the names of the
         outputs.
 
+        The blobs are copied to the output buffers if given, otherwise to new
+        tensors, so this should be called before the request is released.
+
         Args:
-            outputs Dict[str, torch.Tensor]: The output name and tensor pairs.
+            outputs Dict[str, numpy.ndarray]: The output name and blob pairs.
 
         Returns:
             Dict[str, torch.Tensor]: The output name and tensor pairs
                 after processing.
         """
-        outputs = {
-            name: torch.from_numpy(tensor)
-            for name, tensor in outputs.items()
-        }
         cleaned_outputs = {}
         for name, value in outputs.items():
             if '.' in name:
@@ -118,7 +166,8 @@ class OpenVINOWrapper(BaseWrapper):
                 cleaned_outputs[new_output_name] = value
             else:
                 cleaned_outputs[name] = value
-        return cleaned_outputs
+        # the output blobs are reused by the next inference of the request
+        return self._wrap_outputs(cleaned_outputs, copy=True)
 
     def forward(self, inputs: Dict[str,
                                    torch.Tensor]) -> Dict[str, torch.Tensor]:
@@ -131,21 +180,89 @@ class OpenVINOWrapper(BaseWrapper):
             Dict[str, torch.Tensor]: The output name and tensor pairs.
         """
         inputs = self.__update_device(inputs)
-        self.__reshape(inputs)
-        outputs = self.__openvino_execute(inputs)
-        outputs = self.__process_outputs(outputs)
+        input_shapes = tuple(
+            (name, tuple(data.shape)) for name, data in inputs.items())
+        sess, idle_requests = self.__get_exec_net(input_shapes)
+        self.sess = sess
+        request_id = idle_requests.get()
+        try:
+            outputs = self.__openvino_execute(sess.requests[request_id],
+                                              inputs)
+            outputs = self.__process_outputs(outputs)
+        finally:
+            idle_requests.put(request_id)
         return outputs
 
+    def forward_async(self, inputs: Dict[str, torch.Tensor]) -> Future:
+        """Submit an inference to an idle infer request.
+
+        The call blocks only if all requests of the executable network are
+        running. The future is done once the outputs are ready.
+
+        Args:
+            inputs (Dict[str, torch.Tensor]): The input name and tensor pairs.
+
+        Returns:
+            Future: A future of the output name and tensor pairs.
+        """
+        inputs = self.__update_device(inputs)
+        input_shapes = tuple(
+            (name, tuple(data.shape)) for name, data in inputs.items())
+        sess, idle_requests = self.__get_exec_net(input_shapes)
+        request_id = idle_requests.get()
+        request = sess.requests[request_id]
+        future = Future()
+
+        def _callback(status, _):
+            try:
+                if status != 0:
+                    raise RuntimeError(
+                        f'OpenVINO infer request failed with status {status}.')
+                future.set_result(
+                    self.__process_outputs(self.__get_outputs(request)))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                idle_requests.put(request_id)
+
+        request.set_completion_callback(_callback)
+        try:
+            request.async_infer(
+                dict((name, data.numpy()) for name, data in inputs.items()))
+        except Exception:
+            idle_requests.put(request_id)
+            raise
+        return future
+
+    @staticmethod
+    def __get_outputs(request: Any) -> Dict[str, Any]:
+        """Get the outputs of a finished request.
+
+        Args:
+            request (InferRequest): The finished infer request.
+
+        Returns:
+            Dict[str, numpy.ndarray]: The output name and array pairs, which
+                share the memory of the output blobs and are only valid until
+                the next inference of the request.
+        """
+        return dict(
+            (name, blob.buffer) for name, blob in request.output_blobs.items())
+
     @TimeCounter.count_time(Backend.OPENVINO.value)
     def __openvino_execute(
-            self, inputs: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+            self, request: Any,
+            inputs: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
         """Run inference with OpenVINO IE.
 
         Args:
+            request (InferRequest): The idle infer request to run.
             inputs (Dict[str, torch.Tensor]): The input name and tensor pairs.
 
         Returns:
-            Dict[str, numpy.ndarray]: The output name and tensor pairs.
+            Dict[str, numpy.ndarray]: The output name and array pairs, which
+                share the memory of the output blobs.
         """
-        outputs = self.sess.infer(inputs)
-        return outputs
+        request.infer(
+            dict((name, data.numpy()) for name, data in inputs.items()))
+        return self.__get_outputs(request)
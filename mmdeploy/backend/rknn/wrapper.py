@@ -70,10 +70,11 @@ class RKNNWrapper(BaseWrapper):
             i.permute(0, 2, 3, 1).cpu().numpy() for i in rknn_inputs
         ]
         rknn_out = self.__rknnnn_execute(rknn_inputs)
-        rknn_out = [torch.from_numpy(out) for out in rknn_out]
         if self.output_names is not None:
-            return dict(zip(self.output_names, rknn_out))
-        return {'#' + str(i): x for i, x in enumerate(rknn_out)}
+            names = self.output_names
+        else:
+            names = ['#' + str(i) for i in range(len(rknn_out))]
+        return self._wrap_outputs(dict(zip(names, rknn_out)))
 
     @TimeCounter.count_time(Backend.RKNN.value)
     def __rknnnn_execute(self, inputs: Sequence[np.array]):
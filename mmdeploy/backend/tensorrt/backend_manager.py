@@ -3,6 +3,7 @@ import logging
 import os.path as osp
 from typing import Any, Callable, Optional, Sequence
 
+from mmdeploy.utils import get_backend_config
 from ..base import BACKEND_MANAGERS, BaseBackendManager
 
 
@@ -31,7 +32,24 @@ class TensorRTManager(BaseBackendManager):
         """
 
         from .wrapper import TRTWrapper
-        return TRTWrapper(engine=backend_files[0], output_names=output_names)
+
+        # For unittest deploy_config will not pass into _build_wrapper
+        # function.
+        if deploy_cfg:
+            backend_config = get_backend_config(deploy_cfg)
+            num_contexts = backend_config.get('num_contexts', 1)
+            use_cuda_graph = backend_config.get('use_cuda_graph', False)
+            shape_cache_size = backend_config.get('shape_cache_size', 64)
+        else:
+            num_contexts = 1
+            use_cuda_graph = False
+            shape_cache_size = 64
+        return TRTWrapper(
+            engine=backend_files[0],
+            output_names=output_names,
+            num_contexts=num_contexts,
+            use_cuda_graph=use_cuda_graph,
+            shape_cache_size=shape_cache_size)
 
     @classmethod
     def is_available(cls, with_custom_ops: bool = False) -> bool:
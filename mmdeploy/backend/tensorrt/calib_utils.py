@@ -1,4 +1,6 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import queue
+import threading
 from typing import Any, Dict, Sequence, Union
 
 import numpy as np
@@ -12,6 +14,14 @@ DEFAULT_CALIBRATION_ALGORITHM = trt.CalibrationAlgoType.ENTROPY_CALIBRATION_2
 class HDF5Calibrator(trt.IInt8Calibrator):
     """HDF5 calibrator.
 
+    The batches are assembled from distinct samples in a background thread,
+    which fills `num_prefetch` page-locked host buffers ahead of TensorRT.
+    Each input of a batch has the opt shape of the input. The samples are
+    stacked along the first dim until it is full, and the other dims of a
+    sample are tiled or cropped to the opt shape. The last batch wraps around
+    to the first samples. The device buffers are allocated once and reused
+    by all batches.
+
     Args:
         calib_file (str | h5py.File):  Input calibration file.
         input_shapes (Dict[str, Sequence[int]]): The min/opt/max shape of
@@ -20,6 +30,7 @@ class HDF5Calibrator(trt.IInt8Calibrator):
         device_id (int): Cuda device id, defaults to 0.
         algorithm (trt.CalibrationAlgoType): Calibration algo type, defaults
             to `trt.CalibrationAlgoType.ENTROPY_CALIBRATION_2`.
+        num_prefetch (int): Number of batches prepared ahead, defaults to 2.
     """
 
     def __init__(
@@ -29,6 +40,7 @@ class HDF5Calibrator(trt.IInt8Calibrator):
             model_type: str = 'end2end',
             device_id: int = 0,
             algorithm: trt.CalibrationAlgoType = DEFAULT_CALIBRATION_ALGORITHM,
+            num_prefetch: int = 2,
             **kwargs):
         super().__init__()
         import h5py
@@ -40,6 +52,8 @@ class HDF5Calibrator(trt.IInt8Calibrator):
         calib_data = calib_file['calib_data']
         assert model_type in calib_data
         calib_data = calib_data[model_type]
+        assert num_prefetch >= 1, \
+            f'num_prefetch should be positive, but given {num_prefetch}.'
 
         self.calib_file = calib_file
         self.calib_data = calib_data
@@ -48,52 +62,121 @@ class HDF5Calibrator(trt.IInt8Calibrator):
         self.input_shapes = input_shapes
         self.kwargs = kwargs
 
-        # create buffers that will hold data batches
-        self.buffers = dict()
-
-        self.count = 0
         first_input_group = calib_data[list(calib_data.keys())[0]]
         self.dataset_length = len(first_input_group)
         self.batch_size = first_input_group['0'].shape[0]
 
+        # page-locked host buffers of the prefetched batches and the device
+        # buffers they are copied to
+        self.opt_shapes = dict((name, tuple(shapes['opt_shape']))
+                               for name, shapes in input_shapes.items()
+                               if name in calib_data)
+        self.host_buffers = [
+            dict((name, cuda.pagelocked_empty(shape, np.float32))
+                 for name, shape in self.opt_shapes.items())
+            for _ in range(num_prefetch)
+        ]
+        self.buffers = dict(
+            (name, cuda.mem_alloc(self.host_buffers[0][name].nbytes))
+            for name in self.opt_shapes)
+
+        self._free_slots = queue.Queue()
+        for slot in range(num_prefetch):
+            self._free_slots.put(slot)
+        self._ready_slots = queue.Queue()
+        self._stopped = False
+        self._worker = threading.Thread(
+            target=self.__run_worker, name='HDF5Calibrator', daemon=True)
+        self._worker.start()
+
     def __del__(self):
-        """Close h5py file if necessary."""
+        """Stop the prefetching thread and close h5py file if necessary."""
+        if hasattr(self, '_worker'):
+            self._stopped = True
+            self._free_slots.put(None)
+            self._worker.join()
         if hasattr(self, 'calib_file'):
             self.calib_file.close()
 
-    def get_batch(self, names: Sequence[str], **kwargs) -> list:
-        """Get batch data."""
-        if self.count < self.dataset_length:
-
-            ret = []
-            for name in names:
-                input_group = self.calib_data[name]
-                data_np = input_group[str(self.count)][...].astype(np.float32)
+    def __fill_batch(self, start: int, host_buffers: Dict[str,
+                                                          np.ndarray]) -> int:
+        """Fill the host buffers with the samples from an index.
 
-                # tile the tensor so we can keep the same distribute
-                opt_shape = self.input_shapes[name]['opt_shape']
-                data_shape = data_np.shape
+        Args:
+            start (int): The index of the first sample.
+            host_buffers (Dict[str, np.ndarray]): The buffers of the inputs.
 
-                reps = [
+        Returns:
+            int: Number of samples used.
+        """
+        offsets = dict((name, 0) for name in host_buffers)
+        num_samples = 0
+        while num_samples < self.dataset_length and any(
+                offsets[name] < buffer.shape[0]
+                for name, buffer in host_buffers.items()):
+            data_id = str((start + num_samples) % self.dataset_length)
+            num_samples += 1
+            for name, buffer in host_buffers.items():
+                offset = offsets[name]
+                if offset >= buffer.shape[0]:
+                    continue
+                data_np = self.calib_data[name][data_id][...]
+                if data_np.shape[0] == 0:
+                    continue
+                # tile the other dims so we can keep the same distribute
+                opt_shape = buffer.shape
+                reps = [1] + [
                     int(np.ceil(opt_s / data_s))
-                    for opt_s, data_s in zip(opt_shape, data_shape)
+                    for opt_s, data_s in zip(opt_shape[1:], data_np.shape[1:])
                 ]
-
                 data_np = np.tile(data_np, reps)
+                num_rows = min(data_np.shape[0], opt_shape[0] - offset)
+                slice_list = (slice(0, num_rows), ) + tuple(
+                    slice(0, end) for end in opt_shape[1:])
+                buffer[offset:offset + num_rows] = data_np[slice_list]
+                offsets[name] = offset + num_rows
+        # tile the samples if the dataset does not fill the batch
+        for name, buffer in host_buffers.items():
+            offset = offsets[name]
+            if offset == 0:
+                buffer[...] = 0
+            elif offset < buffer.shape[0]:
+                reps = [int(np.ceil(buffer.shape[0] / offset))] + \
+                    [1] * (buffer.ndim - 1)
+                buffer[...] = np.tile(buffer[:offset], reps)[:buffer.shape[0]]
+        return num_samples
+
+    def __run_worker(self):
+        """Prefetch the batches into the free host buffers."""
+        start = 0
+        try:
+            while start < self.dataset_length:
+                slot = self._free_slots.get()
+                if slot is None or self._stopped:
+                    return
+                start += self.__fill_batch(start, self.host_buffers[slot])
+                self._ready_slots.put(slot)
+        except Exception as e:
+            self._ready_slots.put(e)
+            return
+        self._ready_slots.put(None)
 
-                slice_list = tuple(slice(0, end) for end in opt_shape)
-                data_np = data_np[slice_list]
-
-                data_np_cuda_ptr = cuda.mem_alloc(data_np.nbytes)
-                cuda.memcpy_htod(data_np_cuda_ptr,
-                                 np.ascontiguousarray(data_np))
-                self.buffers[name] = data_np_cuda_ptr
-
-                ret.append(self.buffers[name])
-            self.count += 1
-            return ret
-        else:
+    def get_batch(self, names: Sequence[str], **kwargs) -> list:
+        """Get batch data."""
+        slot = self._ready_slots.get()
+        if slot is None:
+            # put back the end mark for the next calls
+            self._ready_slots.put(None)
             return None
+        if isinstance(slot, Exception):
+            raise slot
+
+        ret = []
+        for name in names:
+            cuda.memcpy_htod(self.buffers[name], self.host_buffers[slot][name])
+            ret.append(self.buffers[name])
+        self._free_slots.put(slot)
+        return ret
 
     def get_algorithm(self) -> trt.CalibrationAlgoType:
         """Get Calibration algo type.
@@ -1,12 +1,13 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import os.path as osp
-from typing import Dict, Union
+from typing import Union
 
 import mmengine
 import onnx
 
 from mmdeploy.utils import (get_calib_filename, get_common_config,
-                            get_model_inputs, load_config, parse_device_id)
+                            get_input_shape_profiles, get_model_inputs,
+                            load_config, parse_device_id)
 from mmdeploy.utils.config_utils import get_ir_config
 from .utils import from_onnx, get_trt_log_level
 
@@ -63,10 +64,8 @@ def onnx2tensorrt(work_dir: str,
 
     ir_config = get_ir_config(deploy_cfg)
     input_names = ir_config.get('input_names', [])
-    input_shapes = final_params['input_shapes']
-
-    if not isinstance(input_shapes, Dict):
-        input_shapes = dict(zip(input_names, input_shapes))
+    input_shapes = get_input_shape_profiles(final_params['input_shapes'],
+                                            input_names)
 
     assert device.startswith('cuda'), f'TensorRT requires cuda device, \
         but given: {device}'
@@ -85,4 +84,5 @@ def onnx2tensorrt(work_dir: str,
         int8_mode=final_params.get('int8_mode', False),
         int8_param=int8_param,
         max_workspace_size=final_params.get('max_workspace_size', 0),
-        device_id=device_id)
+        device_id=device_id,
+        timing_cache=final_params.get('timing_cache', None))
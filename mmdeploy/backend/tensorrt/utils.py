@@ -1,8 +1,10 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import logging
 import os
+import os.path as osp
 import re
 import sys
+import tempfile
 from typing import Any, Dict, Optional, Sequence, Union
 
 import onnx
@@ -95,23 +97,124 @@ def search_cuda_version() -> str:
     return version
 
 
+def get_timing_cache_file(timing_cache: str, device_id: int = 0) -> str:
+    """Get the timing cache file of the device.
+
+    Args:
+        timing_cache (str): The timing cache file, or a directory to keep the
+            timing cache files of different devices and TensorRT versions.
+        device_id (int): The device to build the engine on. Defaults to `0`.
+
+    Returns:
+        str: The path of the timing cache file. If `timing_cache` is a
+            directory, the file is named after the GPU, the compute
+            capability and the TensorRT version, e.g.
+            `NVIDIA_A100-SXM4-80GB_sm80_trt8.6.1.cache`.
+    """
+    timing_cache = osp.expanduser(timing_cache)
+    is_dir = osp.isdir(timing_cache) or timing_cache.endswith(('/', os.sep))
+    if not is_dir:
+        return timing_cache
+    import torch
+    device_name = re.sub(r'[^\w.-]+', '_',
+                         torch.cuda.get_device_name(device_id))
+    major, minor = torch.cuda.get_device_capability(device_id)
+    return osp.join(
+        timing_cache,
+        f'{device_name}_sm{major}{minor}_trt{trt.__version__}.cache')
+
+
+def load_timing_cache(config: trt.IBuilderConfig,
+                      cache_file: str) -> trt.ITimingCache:
+    """Create a timing cache from file and attach it to the builder config.
+
+    An empty timing cache is created if the file does not exist or was
+    created on another device or TensorRT version.
+
+    Args:
+        config (trt.IBuilderConfig): The builder config.
+        cache_file (str): The timing cache file.
+
+    Returns:
+        trt.ITimingCache: The timing cache.
+    """
+    logger = get_root_logger()
+    cache = None
+    if osp.exists(cache_file):
+        with open(cache_file, mode='rb') as f:
+            cache_bytes = f.read()
+        try:
+            cache = config.create_timing_cache(cache_bytes)
+        except Exception as e:
+            logger.warning(f'Failed to load timing cache {cache_file}: {e}')
+    if cache is None:
+        cache = config.create_timing_cache(b'')
+    if not config.set_timing_cache(cache, ignore_mismatch=False):
+        logger.warning(f'Timing cache {cache_file} does not match the '
+                       'device or TensorRT version, use an empty one.')
+        cache = config.create_timing_cache(b'')
+        config.set_timing_cache(cache, ignore_mismatch=False)
+    elif osp.exists(cache_file):
+        logger.info(f'Load timing cache from {cache_file}.')
+    return cache
+
+
+def save_timing_cache(config: trt.IBuilderConfig, cache_file: str) -> None:
+    """Save the timing cache of the builder config to file.
+
+    The entries saved by the other builds since the cache was loaded are
+    merged in, and the file is replaced atomically, so the cache can be
+    shared by the builds running in parallel.
+
+    Args:
+        config (trt.IBuilderConfig): The builder config.
+        cache_file (str): The timing cache file.
+    """
+    cache = config.get_timing_cache()
+    if cache is None:
+        return
+    if osp.exists(cache_file):
+        with open(cache_file, mode='rb') as f:
+            try:
+                saved_cache = config.create_timing_cache(f.read())
+                if saved_cache is not None:
+                    cache.combine(saved_cache, ignore_mismatch=False)
+            except Exception:
+                pass
+    cache_dir = osp.dirname(osp.abspath(cache_file))
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_file = tempfile.mkstemp(prefix='.tmp_', dir=cache_dir)
+    try:
+        with os.fdopen(fd, mode='wb') as f:
+            f.write(memoryview(cache.serialize()))
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        if osp.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    get_root_logger().info(f'Save timing cache to {cache_file}.')
+
+
 def from_onnx(onnx_model: Union[str, onnx.ModelProto],
               output_file_prefix: str,
-              input_shapes: Dict[str, Sequence[int]],
+              input_shapes: Union[Dict[str, Dict], Sequence[Dict[str, Dict]]],
               max_workspace_size: int = 0,
               fp16_mode: bool = False,
               int8_mode: bool = False,
               int8_param: Optional[dict] = None,
               device_id: int = 0,
               log_level: trt.Logger.Severity = trt.Logger.ERROR,
+              timing_cache: Optional[str] = None,
               **kwargs) -> trt.ICudaEngine:
     """Create a tensorrt engine from ONNX.
 
     Args:
         onnx_model (str or onnx.ModelProto): Input onnx model to convert from.
         output_file_prefix (str): The path to save the output ncnn file.
-        input_shapes (Dict[str, Sequence[int]]): The min/opt/max shape of
-            each input.
+        input_shapes (Dict[str, Dict] | Sequence[Dict[str, Dict]]): The
+            min/opt/max shape of each input. A list of them builds one
+            optimization profile for each, and the first one is used to
+            calibrate in int8 mode.
         max_workspace_size (int): To set max workspace size of TensorRT engine.
             some tactics and layers need large workspace. Defaults to `0`.
         fp16_mode (bool): Specifying whether to enable fp16 mode.
@@ -122,6 +225,12 @@ def from_onnx(onnx_model: Union[str, onnx.ModelProto],
         device_id (int): Choice the device to create engine. Defaults to `0`.
         log_level (trt.Logger.Severity): The log level of TensorRT. Defaults to
             `trt.Logger.ERROR`.
+        timing_cache (str): The timing cache file to load before and save
+            after the build, so the tactic timings are reused by the builds
+            of layers with the same configuration. If a directory is given,
+            one file per device and TensorRT version is kept in it, which
+            makes it safe to share. Defaults to `None`, which disables the
+            persistent timing cache.
 
     Returns:
         tensorrt.ICudaEngine: The TensorRT engine created from onnx_model.
@@ -205,15 +314,19 @@ def from_onnx(onnx_model: Union[str, onnx.ModelProto],
                 1 << int(trt.TacticSource.CUBLAS_LT))
             config.set_tactic_sources(tactic_source)
 
-    profile = builder.create_optimization_profile()
-
-    for input_name, param in input_shapes.items():
-        min_shape = param['min_shape']
-        opt_shape = param['opt_shape']
-        max_shape = param['max_shape']
-        profile.set_shape(input_name, min_shape, opt_shape, max_shape)
-    if config.add_optimization_profile(profile) < 0:
-        logger.warning(f'Invalid optimization profile {profile}.')
+    if isinstance(input_shapes, Dict):
+        input_shapes = [input_shapes]
+    profiles = []
+    for profile_shapes in input_shapes:
+        profile = builder.create_optimization_profile()
+        for input_name, param in profile_shapes.items():
+            min_shape = param['min_shape']
+            opt_shape = param['opt_shape']
+            max_shape = param['max_shape']
+            profile.set_shape(input_name, min_shape, opt_shape, max_shape)
+        if config.add_optimization_profile(profile) < 0:
+            logger.warning(f'Invalid optimization profile {profile}.')
+        profiles.append(profile)
 
     if fp16_mode:
         if not getattr(builder, 'platform_has_fast_fp16', True):
@@ -230,15 +343,27 @@ def from_onnx(onnx_model: Union[str, onnx.ModelProto],
         assert int8_param is not None
         config.int8_calibrator = HDF5Calibrator(
             int8_param['calib_file'],
-            input_shapes,
+            input_shapes[0],
             model_type=int8_param['model_type'],
             device_id=device_id,
             algorithm=int8_param.get(
-                'algorithm', trt.CalibrationAlgoType.ENTROPY_CALIBRATION_2))
+                'algorithm', trt.CalibrationAlgoType.ENTROPY_CALIBRATION_2),
+            num_prefetch=int8_param.get('num_prefetch', 2))
+        if len(profiles) > 1 and hasattr(config, 'set_calibration_profile'):
+            config.set_calibration_profile(profiles[0])
         if version.parse(trt.__version__) < version.parse('8'):
             builder.int8_mode = int8_mode
             builder.int8_calibrator = config.int8_calibrator
 
+    timing_cache_file = None
+    if timing_cache is not None:
+        if hasattr(config, 'create_timing_cache'):
+            timing_cache_file = get_timing_cache_file(timing_cache, device_id)
+            load_timing_cache(config, timing_cache_file)
+        else:
+            logger.warning('Timing cache requires TensorRT>=8, '
+                           f'but got {trt.__version__}.')
+
     # create engine
     if hasattr(builder, 'build_serialized_network'):
         engine = builder.build_serialized_network(network, config)
@@ -247,6 +372,9 @@ def from_onnx(onnx_model: Union[str, onnx.ModelProto],
 
     assert engine is not None, 'Failed to create TensorRT engine'
 
+    if timing_cache_file is not None:
+        save_timing_cache(config, timing_cache_file)
+
     save(engine, output_file_prefix + '.engine')
     return engine
 
@@ -1,10 +1,14 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-from typing import Any, Dict, Optional, Sequence, Union
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import reduce
+from operator import mul
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import tensorrt as trt
 import torch
 
-from mmdeploy.utils import Backend
+from mmdeploy.utils import Backend, LRUCache, get_root_logger
 from mmdeploy.utils.timer import TimeCounter
 from ..base import BACKEND_WRAPPER, BaseWrapper
 from .init_plugins import load_tensorrt_plugin
@@ -32,6 +36,8 @@ def torch_dtype_from_trt(dtype: trt.DataType) -> torch.dtype:
         return torch.float16
     elif dtype == trt.float32:
         return torch.float32
+    elif hasattr(trt, 'uint8') and dtype == trt.uint8:
+        return torch.uint8
     else:
         raise TypeError(f'{dtype} is not supported by torch')
 
@@ -61,6 +67,24 @@ class TRTWrapper(BaseWrapper):
         output_names (Sequence[str] | None): Names of model outputs  in order.
             Defaults to `None` and the wrapper will load the output names from
             model.
+        device_id (int): The id of the cuda device. Defaults to 0.
+        num_contexts (int): Number of execution contexts created on the
+            engine. With more than one context, each context owns a cuda
+            stream and an optimization profile (the profiles are shared
+            round-robin if the engine has fewer profiles than contexts,
+            which requires TensorRT>=8), and concurrent callers of
+            `forward` or `forward_async` run on different contexts at the
+            same time. At least one context is created for each
+            optimization profile, and each call runs on a context of the
+            tightest profile that fits its input shapes. Defaults to 1.
+        use_cuda_graph (bool): Whether to capture the inference of each
+            execution context into a cuda graph with persistent input/output
+            buffers on the first call, and replay the graph afterwards. Only
+            engines with static input shapes are supported. Defaults to
+            `False`.
+        shape_cache_size (int): Max number of input shapes whose matching
+            optimization profiles and output shapes are cached. Defaults to
+            64.
 
     Note:
         If the engine is converted from onnx model. The input_names and
@@ -73,15 +97,25 @@ class TRTWrapper(BaseWrapper):
         >>> inputs = dict(input=torch.randn(1, 3, 224, 224))
         >>> outputs = model(inputs)
         >>> print(outputs)
+        >>>
+        >>> model = TRTWrapper(engine_file, num_contexts=2)
+        >>> futures = [model.forward_async(inputs) for _ in range(4)]
+        >>> outputs = [future.result() for future in futures]
     """
 
+    thread_safe = True
+
     def __init__(self,
                  engine: Union[str, trt.ICudaEngine],
                  output_names: Optional[Sequence[str]] = None,
-                 device_id: int = 0):
+                 device_id: int = 0,
+                 num_contexts: int = 1,
+                 use_cuda_graph: bool = False,
+                 shape_cache_size: int = 64):
         super().__init__(output_names)
         load_tensorrt_plugin()
         self.engine = engine
+        self.device_id = device_id
         self.allocator = TorchAllocator(device_id)
         if isinstance(self.engine, str):
             self.engine = load(engine)
@@ -97,10 +131,205 @@ class TRTWrapper(BaseWrapper):
             self.context.temporary_allocator = self.allocator
 
         self.__load_io_names()
+        # output shapes memoized by optimization profile and input shapes
+        self._output_shapes = LRUCache(shape_cache_size)
+        # matching profiles memoized by input shapes, the tightest first
+        self._matched_profiles = LRUCache(shape_cache_size)
+        self.__load_binding_metas()
+        self.__create_context_pool(num_contexts)
+
+        if use_cuda_graph and not all(
+                tuple(shape[0]) == tuple(shape[2])
+                for profile_shapes in self._profile_shapes
+                for shape in profile_shapes.values()):
+            get_root_logger().warning(
+                'CUDA graph requires an engine with static input shapes, '
+                'fall back to normal inference.')
+            use_cuda_graph = False
+        self._use_cuda_graph = use_cuda_graph
+        self._graphs = [None] * len(self._contexts)
+        self._graph_lock = threading.Lock()
+
+    def __create_context_pool(self, num_contexts: int):
+        """Create the execution contexts and the streams they run on.
+
+        Args:
+            num_contexts (int): Number of execution contexts.
+        """
+        assert num_contexts >= 1, \
+            f'num_contexts should be positive, but given {num_contexts}.'
+        num_profiles = self.engine.num_optimization_profiles
+        self._num_bindings_per_profile = self.engine.num_bindings // \
+            num_profiles
+        # A single context keeps running on the current stream of the caller
+        use_streams = num_contexts > 1
+        num_contexts = max(num_contexts, num_profiles)
+        self._contexts = [self.context]
+        self._profile_ids = [0]
+        self._streams = [None] * num_contexts
+        if use_streams:
+            self._streams = [
+                torch.cuda.Stream(self.device_id) for _ in range(num_contexts)
+            ]
+        for i in range(1, num_contexts):
+            context = self.engine.create_execution_context()
+            if hasattr(context, 'temporary_allocator'):
+                context.temporary_allocator = self.allocator
+            self._contexts.append(context)
+            self._profile_ids.append(i % num_profiles)
+        for context, profile_id, stream in zip(self._contexts,
+                                               self._profile_ids,
+                                               self._streams):
+            if profile_id == context.active_optimization_profile:
+                continue
+            if hasattr(context, 'set_optimization_profile_async'):
+                if stream is None:
+                    stream = torch.cuda.current_stream(self.device_id)
+                context.set_optimization_profile_async(profile_id,
+                                                       stream.cuda_stream)
+            else:
+                context.active_optimization_profile = profile_id
+
+        # input shapes last set on each context
+        self._context_input_shapes = [None] * num_contexts
+
+        # free contexts of each optimization profile
+        self._free_slots = [[] for _ in range(num_profiles)]
+        for slot in reversed(range(num_contexts)):
+            self._free_slots[self._profile_ids[slot]].append(slot)
+        self._slot_condition = threading.Condition()
+        self._executor = None
+
+    def __load_binding_metas(self):
+        """Resolve the binding index, dtype and device of each input/output
+        and the shape range of each input in every optimization profile."""
+        self._binding_metas = dict()
+        num_bindings_per_profile = self.engine.num_bindings // \
+            self.engine.num_optimization_profiles
+        for name in [_ for _ in self.engine][:num_bindings_per_profile]:
+            idx = self.engine.get_binding_index(name)
+            device = torch_device_from_trt(self.engine.get_location(idx))
+            if device.type == 'cuda':
+                device = torch.device('cuda', self.device_id)
+            self._binding_metas[name] = dict(
+                index=idx,
+                dtype=torch_dtype_from_trt(self.engine.get_binding_dtype(idx)),
+                device=device)
+        self._profile_shapes = [{
+            name: self.engine.get_profile_shape(profile_id, name)
+            for name in self._input_names
+        } for profile_id in range(self.engine.num_optimization_profiles)]
+
+    def __match_profiles(
+            self, input_shapes: Tuple[Tuple[str, Tuple], ...]) -> List[int]:
+        """Find the optimization profiles that fit the input shapes.
+
+        Args:
+            input_shapes (Tuple[Tuple[str, Tuple], ...]): The input name and
+                shape pairs.
+
+        Returns:
+            List[int]: The indices of the matching profiles, sorted by the
+                volume of their max shapes, then the distance between their
+                opt shapes and the input shapes.
+        """
+        profile_ids = self._matched_profiles.get(input_shapes)
+        if profile_ids is not None:
+            return profile_ids
+
+        def _fits(profile_shapes):
+            for name, shape in input_shapes:
+                min_shape, _, max_shape = profile_shapes[name]
+                if len(shape) != len(min_shape) or not all(
+                        s_min <= s <= s_max for s_min, s, s_max in zip(
+                            min_shape, shape, max_shape)):
+                    return False
+            return True
+
+        def _tightness(profile_id):
+            profile_shapes = self._profile_shapes[profile_id]
+            volume = 0
+            distance = 0
+            for name, shape in input_shapes:
+                _, opt_shape, max_shape = profile_shapes[name]
+                volume += reduce(mul, max_shape, 1)
+                distance += sum(abs(o - s) for o, s in zip(opt_shape, shape))
+            return volume, distance
+
+        profile_ids = sorted(
+            (profile_id
+             for profile_id, profile_shapes in enumerate(self._profile_shapes)
+             if _fits(profile_shapes)),
+            key=_tightness)
+        if len(profile_ids) == 0:
+            if len(self._profile_shapes) == 1:
+                self.__check_input_shapes(0, input_shapes)
+            ranges = [
+                dict((name, (tuple(shapes[0]), tuple(shapes[2])))
+                     for name, shapes in profile_shapes.items())
+                for profile_shapes in self._profile_shapes
+            ]
+            raise AssertionError(
+                f'Input shapes {dict(input_shapes)} do not fit any '
+                f'optimization profile, the min/max shapes of the profiles '
+                f'are {ranges}.')
+        self._matched_profiles.put(input_shapes, profile_ids)
+        return profile_ids
+
+    def __acquire_slot(self, profile_ids: Sequence[int]) -> int:
+        """Wait for a free execution context of the profiles.
+
+        Args:
+            profile_ids (Sequence[int]): The candidate profiles in the order
+                of preference.
+
+        Returns:
+            int: The index of the execution context.
+        """
+        with self._slot_condition:
+            while True:
+                for profile_id in profile_ids:
+                    free_slots = self._free_slots[profile_id]
+                    if free_slots:
+                        return free_slots.pop()
+                self._slot_condition.wait()
+
+    def __release_slot(self, slot: int):
+        """Return an execution context to the pool.
+
+        Args:
+            slot (int): The index of the execution context.
+        """
+        with self._slot_condition:
+            self._free_slots[self._profile_ids[slot]].append(slot)
+            self._slot_condition.notify_all()
+
+    def __check_input_shapes(self, profile_id: int,
+                             input_shapes: Sequence[Tuple[str, Tuple]]):
+        """Check if the input shapes are in the range of the profile.
+
+        Args:
+            profile_id (int): The index of the optimization profile.
+            input_shapes (Sequence[Tuple[str, Tuple]]): The input name and
+                shape pairs.
+        """
+        for input_name, input_shape in input_shapes:
+            profile = self._profile_shapes[profile_id][input_name]
+            assert len(input_shape) == len(
+                profile[0]), 'Input dim is different from engine profile.'
+            for s_min, s_input, s_max in zip(profile[0], input_shape,
+                                             profile[2]):
+                assert s_min <= s_input <= s_max, \
+                    'Input shape should be between ' \
+                    + f'{profile[0]} and {profile[2]}' \
+                    + f' but get {input_shape}.'
 
     def __load_io_names(self):
         """Load input/output names from engine."""
-        names = [_ for _ in self.engine]
+        # bindings of the other optimization profiles are suffixed copies
+        num_bindings_per_profile = self.engine.num_bindings // \
+            self.engine.num_optimization_profiles
+        names = [_ for _ in self.engine][:num_bindings_per_profile]
         input_names = list(filter(self.engine.binding_is_input, names))
         self._input_names = input_names
 
@@ -124,63 +353,271 @@ class TRTWrapper(BaseWrapper):
                                    torch.Tensor]) -> Dict[str, torch.Tensor]:
         """Run forward inference.
 
+        The inference is enqueued after the work on the current stream, and
+        the current stream waits for the inference, so the outputs can be
+        used on the current stream directly.
+
+        Args:
+            inputs (Dict[str, torch.Tensor]): The input name and tensor pairs.
+
+        Return:
+            Dict[str, torch.Tensor]: The output name and tensor pairs.
+        """
+        current_stream = torch.cuda.current_stream(self.device_id)
+        input_shapes = tuple(
+            (name, tuple(data.shape)) for name, data in inputs.items())
+        slot = self.__acquire_slot(self.__match_profiles(input_shapes))
+        try:
+            stream = self._streams[slot]
+            if stream is None:
+                return self._wrap_outputs(
+                    self.__forward_in_slot(slot, inputs, input_shapes,
+                                           current_stream))
+            stream.wait_stream(current_stream)
+            outputs = self.__forward_in_slot(slot, inputs, input_shapes,
+                                             stream)
+            current_stream.wait_stream(stream)
+        finally:
+            self.__release_slot(slot)
+        return self._wrap_outputs(outputs)
+
+    def forward_async(self, inputs: Dict[str, torch.Tensor]) -> Future:
+        """Submit an inference to the context pool.
+
+        The inference is run by a worker thread on the first free execution
+        context after the work already enqueued on the current stream. The
+        future is done once the outputs are ready.
+
+        Args:
+            inputs (Dict[str, torch.Tensor]): The input name and tensor pairs.
+
+        Return:
+            Future: A future of the output name and tensor pairs.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=len(self._contexts),
+                thread_name_prefix='TRTWrapper')
+        ready = torch.cuda.Event()
+        ready.record(torch.cuda.current_stream(self.device_id))
+        return self._executor.submit(self.__forward_after, ready, inputs)
+
+    def __forward_after(
+            self, ready: torch.cuda.Event,
+            inputs: Dict[str, torch.Tensor]) -> Dict[str, torch.Tensor]:
+        """Run inference after an event and wait for the outputs.
+
+        Args:
+            ready (torch.cuda.Event): The event recorded after the inputs.
+            inputs (Dict[str, torch.Tensor]): The input name and tensor pairs.
+
+        Return:
+            Dict[str, torch.Tensor]: The output name and tensor pairs.
+        """
+        input_shapes = tuple(
+            (name, tuple(data.shape)) for name, data in inputs.items())
+        with torch.cuda.device(self.device_id):
+            slot = self.__acquire_slot(self.__match_profiles(input_shapes))
+            try:
+                stream = self._streams[slot]
+                if stream is None:
+                    stream = torch.cuda.current_stream(self.device_id)
+                stream.wait_event(ready)
+                outputs = self.__forward_in_slot(slot, inputs, input_shapes,
+                                                 stream)
+                stream.synchronize()
+            finally:
+                self.__release_slot(slot)
+            outputs = self._wrap_outputs(outputs)
+        return outputs
+
+    def __forward_in_slot(
+            self, slot: int, inputs: Dict[str, torch.Tensor],
+            input_shapes: Tuple[Tuple[str, Tuple], ...],
+            stream: torch.cuda.Stream) -> Dict[str, torch.Tensor]:
+        """Run inference with one execution context of the pool.
+
         Args:
+            slot (int): The index of the execution context.
             inputs (Dict[str, torch.Tensor]): The input name and tensor pairs.
+            input_shapes (Tuple[Tuple[str, Tuple], ...]): The input name and
+                shape pairs, which fit the profile of the context.
+            stream (torch.cuda.Stream): The stream to run inference on.
 
         Return:
             Dict[str, torch.Tensor]: The output name and tensor pairs.
         """
         assert self._input_names is not None
         assert self._output_names is not None
-        bindings = [None] * (len(self._input_names) + len(self._output_names))
-
-        profile_id = 0
-        inputs = dict((name, data.contiguous().int() if data.dtype ==
-                       torch.long else data.contiguous())
-                      for name, data in inputs.items())
-        for input_name, input_tensor in inputs.items():
-            # check if input shape is valid
-            profile = self.engine.get_profile_shape(profile_id, input_name)
-            assert input_tensor.dim() == len(
-                profile[0]), 'Input dim is different from engine profile.'
-            for s_min, s_input, s_max in zip(profile[0], input_tensor.shape,
-                                             profile[2]):
-                assert s_min <= s_input <= s_max, \
-                    'Input shape should be between ' \
-                    + f'{profile[0]} and {profile[2]}' \
-                    + f' but get {tuple(input_tensor.shape)}.'
-            idx = self.engine.get_binding_index(input_name)
-
-            # All input tensors must be gpu variables
-            assert 'cuda' in input_tensor.device.type
-            input_tensor = input_tensor.contiguous()
-            if input_tensor.dtype == torch.long:
-                input_tensor = input_tensor.int()
-            self.context.set_binding_shape(idx, tuple(input_tensor.shape))
-            bindings[idx] = input_tensor.contiguous().data_ptr()
-
-        # create output tensors
+        context = self._contexts[slot]
+        profile_id = self._profile_ids[slot]
+        binding_offset = profile_id * self._num_bindings_per_profile
+        bindings = [None] * self.engine.num_bindings
+        current_stream = torch.cuda.current_stream(self.device_id)
+
+        inputs = inputs.copy()
+        # convert on the inference stream, which is ordered after the work
+        # producing the inputs
+        with torch.cuda.stream(stream):
+            for name, data in inputs.items():
+                # All input tensors must be gpu variables
+                assert 'cuda' in data.device.type
+                if data.dtype == torch.long:
+                    data = data.int()
+                inputs[name] = data.contiguous()
+
+        output_shapes = self._output_shapes.get((profile_id, input_shapes))
+        if output_shapes is None or \
+                self._context_input_shapes[slot] != input_shapes:
+            for name, shape in input_shapes:
+                idx = self._binding_metas[name]['index'] + binding_offset
+                context.set_binding_shape(idx, shape)
+            self._context_input_shapes[slot] = input_shapes
+        if output_shapes is None:
+            output_shapes = dict()
+            for name, meta in self._binding_metas.items():
+                if name not in self._input_names:
+                    idx = meta['index'] + binding_offset
+                    output_shapes[name] = tuple(context.get_binding_shape(idx))
+            self._output_shapes.put((profile_id, input_shapes), output_shapes)
+
+        if self._use_cuda_graph:
+            return self.__forward_with_graph(slot, inputs, output_shapes,
+                                             stream)
+
+        for name, input_tensor in inputs.items():
+            idx = self._binding_metas[name]['index'] + binding_offset
+            bindings[idx] = input_tensor.data_ptr()
+            if stream != current_stream:
+                input_tensor.record_stream(stream)
+
+        # create output tensors, the output buffers are written directly
         outputs = {}
         for output_name in self._output_names:
-            idx = self.engine.get_binding_index(output_name)
-            dtype = torch_dtype_from_trt(self.engine.get_binding_dtype(idx))
-            shape = tuple(self.context.get_binding_shape(idx))
-
-            device = torch_device_from_trt(self.engine.get_location(idx))
-            output = torch.empty(size=shape, dtype=dtype, device=device)
+            meta = self._binding_metas[output_name]
+            output = self._get_output_buffer(output_name,
+                                             output_shapes[output_name],
+                                             meta['dtype'], meta['device'])
+            if output is None:
+                output = torch.empty(
+                    size=output_shapes[output_name],
+                    dtype=meta['dtype'],
+                    device=meta['device'])
             outputs[output_name] = output
-            bindings[idx] = output.data_ptr()
+            bindings[meta['index'] + binding_offset] = output.data_ptr()
+            if stream != current_stream and output.is_cuda:
+                output.record_stream(stream)
+
+        with torch.cuda.stream(stream):
+            self.__trt_execute(
+                context=context, bindings=bindings, stream=stream)
+
+        return outputs
 
-        self.__trt_execute(bindings=bindings)
+    def __forward_with_graph(
+            self, slot: int, inputs: Dict[str, torch.Tensor],
+            output_shapes: Dict[str, Tuple],
+            stream: torch.cuda.Stream) -> Dict[str, torch.Tensor]:
+        """Run inference by replaying the cuda graph of an execution context.
 
+        Args:
+            slot (int): The index of the execution context.
+            inputs (Dict[str, torch.Tensor]): The input name and tensor pairs.
+            output_shapes (Dict[str, Tuple]): The output name and shape pairs.
+            stream (torch.cuda.Stream): The stream to run inference on.
+
+        Return:
+            Dict[str, torch.Tensor]: The output name and tensor pairs.
+        """
+        graph = self._graphs[slot]
+        if graph is None:
+            with self._graph_lock:
+                graph = self.__capture_graph(slot, inputs, output_shapes)
+            self._graphs[slot] = graph
+
+        current_stream = torch.cuda.current_stream(self.device_id)
+        with torch.cuda.stream(stream):
+            for name, input_tensor in inputs.items():
+                graph['inputs'][name].copy_(input_tensor)
+                if stream != current_stream:
+                    input_tensor.record_stream(stream)
+            self.__trt_execute(
+                context=self._contexts[slot],
+                bindings=graph['bindings'],
+                stream=stream,
+                graph=graph['graph'])
+            # the persistent outputs are overwritten by the next replay
+            outputs = dict(
+                (name,
+                 self._wrap_output(name, graph['outputs'][name], copy=True))
+                for name in self._output_names)
+        if stream != current_stream:
+            for output in outputs.values():
+                if output.is_cuda:
+                    output.record_stream(current_stream)
         return outputs
 
+    def __capture_graph(self, slot: int, inputs: Dict[str, torch.Tensor],
+                        output_shapes: Dict[str, Tuple]) -> Dict[str, Any]:
+        """Capture the inference of an execution context into a cuda graph.
+
+        Args:
+            slot (int): The index of the execution context.
+            inputs (Dict[str, torch.Tensor]): The input name and tensor pairs.
+            output_shapes (Dict[str, Tuple]): The output name and shape pairs.
+
+        Return:
+            Dict[str, Any]: The graph with its persistent input/output
+                buffers and bindings.
+        """
+        context = self._contexts[slot]
+        binding_offset = self._profile_ids[slot] * \
+            self._num_bindings_per_profile
+        bindings = [None] * self.engine.num_bindings
+        static_inputs = dict()
+        for name, input_tensor in inputs.items():
+            static_inputs[name] = torch.empty_like(input_tensor)
+            idx = self._binding_metas[name]['index'] + binding_offset
+            bindings[idx] = static_inputs[name].data_ptr()
+        static_outputs = dict()
+        for name, shape in output_shapes.items():
+            meta = self._binding_metas[name]
+            static_outputs[name] = torch.empty(
+                size=shape, dtype=meta['dtype'], device=meta['device'])
+            bindings[meta['index'] + binding_offset] = \
+                static_outputs[name].data_ptr()
+
+        capture_stream = torch.cuda.Stream(self.device_id)
+        capture_stream.wait_stream(torch.cuda.current_stream(self.device_id))
+        with torch.cuda.stream(capture_stream):
+            # TensorRT finishes the lazy initialization in the first enqueue,
+            # which can not be captured.
+            context.execute_async_v2(bindings, capture_stream.cuda_stream)
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph, stream=capture_stream):
+            context.execute_async_v2(bindings, capture_stream.cuda_stream)
+        return dict(
+            graph=graph,
+            bindings=bindings,
+            inputs=static_inputs,
+            outputs=static_outputs)
+
     @TimeCounter.count_time(Backend.TENSORRT.value)
-    def __trt_execute(self, bindings: Sequence[int]):
+    def __trt_execute(self,
+                      context: trt.IExecutionContext,
+                      bindings: Sequence[int],
+                      stream: torch.cuda.Stream,
+                      graph: Optional[torch.cuda.CUDAGraph] = None):
         """Run inference with TensorRT.
 
         Args:
+            context (trt.IExecutionContext): The execution context to run.
             bindings (list[int]): A list of integer binding the input/output.
+            stream (torch.cuda.Stream): The stream to enqueue inference on.
+            graph (torch.cuda.CUDAGraph | None): The captured cuda graph of
+                the inference to replay. Defaults to `None`.
         """
-        self.context.execute_async_v2(bindings,
-                                      torch.cuda.current_stream().cuda_stream)
+        if graph is not None:
+            graph.replay()
+        else:
+            context.execute_async_v2(bindings, stream.cuda_stream)
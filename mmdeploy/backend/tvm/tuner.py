@@ -1,7 +1,9 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import hashlib
 import os
+import os.path as osp
 from abc import abstractmethod
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Sequence, Union
 
 import tvm
 from mmengine import Registry
@@ -106,6 +108,100 @@ AUTO_SCHEDULER_RUNNER.register_module()(auto_scheduler.LocalRunner)
 AUTO_SCHEDULER_RUNNER.register_module()(auto_scheduler.RPCRunner)
 
 
+class TuningRecordStore:
+    """An append-only store of tuning records shared by the conversions.
+
+    The records of a workload are saved in `<root>/<kind>/<target hash>/
+    <workload hash>.log`, one json record per line. The tuners query the
+    store before tuning and only tune the workloads without valid records,
+    so the models sharing workloads, e.g. the same conv layers of sibling
+    detectors, reuse the trials of each other. The records are appended
+    line by line, so several conversions can share the store.
+
+    Args:
+        root (str): The directory of the store.
+    """
+
+    def __init__(self, root: str):
+        self.root = osp.abspath(osp.expanduser(root))
+
+    @staticmethod
+    def _hash(item: Any) -> str:
+        """Get the sha256 of the string of an item."""
+        return hashlib.sha256(str(item).encode('utf-8')).hexdigest()
+
+    def get_file(self, kind: str, target: Union[str, Target],
+                 workload: Any) -> str:
+        """Get the record file of a workload.
+
+        Args:
+            kind (str): The kind of the records, `autotvm` or `ansor`.
+            target (str | Target): The tuning target.
+            workload (Any): The workload of the task.
+
+        Returns:
+            str: The path of the record file.
+        """
+        return osp.join(self.root, kind,
+                        self._hash(target)[:16],
+                        self._hash(workload) + '.log')
+
+    def append(self, kind: str, target: Union[str, Target], workload: Any,
+               lines: Sequence[str]):
+        """Append records of a workload.
+
+        Args:
+            kind (str): The kind of the records, `autotvm` or `ansor`.
+            target (str | Target): The tuning target.
+            workload (Any): The workload of the task.
+            lines (Sequence[str]): The encoded records.
+        """
+        file = self.get_file(kind, target, workload)
+        os.makedirs(osp.dirname(file), exist_ok=True)
+        fd = os.open(file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            # one write per record, so the records of concurrent conversions
+            # are never interleaved
+            for line in lines:
+                os.write(fd, (line.rstrip('\n') + '\n').encode('utf-8'))
+        finally:
+            os.close(fd)
+
+    def read(self, kind: str, target: Union[str, Target],
+             workload: Any) -> List[str]:
+        """Read the records of a workload.
+
+        Args:
+            kind (str): The kind of the records, `autotvm` or `ansor`.
+            target (str | Target): The tuning target.
+            workload (Any): The workload of the task.
+
+        Returns:
+            List[str]: The encoded records.
+        """
+        file = self.get_file(kind, target, workload)
+        if not osp.exists(file):
+            return []
+        with open(file) as f:
+            return [line for line in f if line.strip()]
+
+
+def _mean_cost(res: Any) -> float:
+    """Get the mean cost of a valid measure result, or inf on errors."""
+    costs = [float(getattr(cost, 'value', cost)) for cost in res.costs]
+    if int(res.error_no) != 0 or len(costs) == 0:
+        return float('inf')
+    return sum(costs) / len(costs)
+
+
+def _set_builder_parallel(builder: Union[Dict, Any]) -> Union[Dict, Any]:
+    """Size the local builder to the cores of the host if not given."""
+    if isinstance(builder, Dict) and builder.get('type') == 'LocalBuilder':
+        builder = dict(builder)
+        builder.setdefault('n_parallel', os.cpu_count() or 1)
+    return builder
+
+
 class TVMTunerBase:
     """The base class of TVM tuner.
 
@@ -204,7 +300,8 @@ class AutoTVMTuner(TVMTunerBase):
                      repeat=3,
                      timeout=4,
                      min_repeat_ms=150),
-                 use_transfer_learning: bool = True) -> None:
+                 use_transfer_learning: bool = True,
+                 tuning_db: Optional[str] = None) -> None:
         """The AutoTVM tuner.
 
         Args:
@@ -221,6 +318,9 @@ class AutoTVMTuner(TVMTunerBase):
             runner (Union[Dict, Any], optional): The runner config.
             use_transfer_learning (bool, optional): Whether to use transfer
                 learning. Defaults to True.
+            tuning_db (Optional[str], optional): The directory of the
+                `TuningRecordStore` shared by the conversions. The tasks with
+                records in the store are not tuned again. Defaults to None.
         """
         super().__init__(target, opt_level, use_vm)
         self._log_file = log_file
@@ -228,7 +328,10 @@ class AutoTVMTuner(TVMTunerBase):
         self._tuner = tuner
         self._early_stopping = early_stopping
         self._use_transfer_learning = use_transfer_learning
+        self._store = None if tuning_db is None else TuningRecordStore(
+            tuning_db)
 
+        builder = _set_builder_parallel(builder)
         if isinstance(builder, Dict):
             builder = build_autotvm_builder(builder)
 
@@ -250,6 +353,18 @@ class AutoTVMTuner(TVMTunerBase):
         logger.info('Create autotvm task.')
         tasks = autotvm.task.extract_from_program(
             mod['main'], target=target, params=params)
+        all_tasks = tasks
+
+        callbacks = []
+        if self._store is not None:
+            tasks = [
+                task for task in tasks
+                if self.__get_best_record(task.workload) is None
+            ]
+            logger.info(f'Found tuning records of '
+                        f'{len(all_tasks) - len(tasks)}/{len(all_tasks)} '
+                        f'tasks in {self._store.root}.')
+            callbacks.append(self.__log_to_store)
 
         # create tmp log file
         if os.path.exists(self._log_file):
@@ -280,14 +395,39 @@ class AutoTVMTuner(TVMTunerBase):
                 callbacks=[
                     autotvm.callback.progress_bar(tsk_trial, prefix=prefix),
                     autotvm.callback.log_to_file(tmp_log_file),
-                ],
+                ] + callbacks,
             )
 
         # pick best records to a cache file
-        autotvm.record.pick_best(tmp_log_file, self._log_file)
+        if self._store is not None:
+            with open(self._log_file, 'w') as f:
+                for task in all_tasks:
+                    record = self.__get_best_record(task.workload)
+                    if record is not None:
+                        f.write(autotvm.record.encode(*record) + '\n')
+        else:
+            autotvm.record.pick_best(tmp_log_file, self._log_file)
         if os.path.exists(tmp_log_file):
             os.remove(tmp_log_file)
 
+    def __log_to_store(self, tuner: Any, inputs: Sequence, results: Sequence):
+        """The autotvm callback appending the records to the store."""
+        for inp, res in zip(inputs, results):
+            self._store.append('autotvm', self._target, inp.task.workload,
+                               [autotvm.record.encode(inp, res)])
+
+    def __get_best_record(self, workload: Any) -> Optional[tuple]:
+        """Get the best valid record of a workload in the store."""
+        best, best_cost = None, float('inf')
+        for line in self._store.read('autotvm', self._target, workload):
+            record = autotvm.record.decode(line)
+            if record is None:
+                continue
+            cost = _mean_cost(record[1])
+            if cost < best_cost:
+                best, best_cost = record, cost
+        return best
+
     def build(self, mod: IRModule, params: Dict):
         """Build tuning library.
 
@@ -313,18 +453,20 @@ class AutoTVMTuner(TVMTunerBase):
 @TVM_TUNER.register_module()
 class AutoScheduleTuner(TVMTunerBase):
 
-    def __init__(
-        self,
-        target: Union[str, Target],
-        log_file: str,
-        num_measure_trials: int,
-        opt_level: int = 3,
-        use_vm: bool = False,
-        early_stopping: Optional[int] = None,
-        builder: Union[Dict, Any] = dict(type='LocalBuilder', timeout=15),
-        runner: Union[Dict, Any] = dict(
-            type='LocalRunner', repeat=10, enable_cpu_cache_flush=True)
-    ) -> None:
+    def __init__(self,
+                 target: Union[str, Target],
+                 log_file: str,
+                 num_measure_trials: int,
+                 opt_level: int = 3,
+                 use_vm: bool = False,
+                 early_stopping: Optional[int] = None,
+                 builder: Union[Dict,
+                                Any] = dict(type='LocalBuilder', timeout=15),
+                 runner: Union[Dict, Any] = dict(
+                     type='LocalRunner',
+                     repeat=10,
+                     enable_cpu_cache_flush=True),
+                 tuning_db: Optional[str] = None) -> None:
         """The Ansor tuner.
 
         Args:
@@ -338,16 +480,23 @@ class AutoScheduleTuner(TVMTunerBase):
                 when not finding better configs in this number of trials.
             builder (Union[Dict, Any], optional): The builder config.
             runner (Union[Dict, Any], optional): The runner config.
+            tuning_db (Optional[str], optional): The directory of the
+                `TuningRecordStore` shared by the conversions. The tasks with
+                records in the store are not tuned again. Defaults to None.
         """
         super().__init__(target, opt_level, use_vm)
         self._log_file = log_file
         self._num_measure_trials = num_measure_trials
         self._early_stopping = early_stopping
+        self._store = None if tuning_db is None else TuningRecordStore(
+            tuning_db)
 
+        builder = _set_builder_parallel(builder)
         if isinstance(builder, Dict):
             builder = build_auto_scheduler_builder(builder)
 
         if isinstance(runner, Dict):
+            runner = dict(runner)
             # CUDA device need a different process for measurement
             if runner['type'] == 'LocalRunner':
                 runner.pop('type')
@@ -360,11 +509,15 @@ class AutoScheduleTuner(TVMTunerBase):
             else:
                 runner = build_auto_scheduler_runner(runner)
 
+        if self._store is None:
+            measure_callback = auto_scheduler.RecordToFile(log_file)
+        else:
+            measure_callback = _RecordToStore(self._store, self._target)
         tune_option = auto_scheduler.TuningOptions(
             num_measure_trials=num_measure_trials,
             runner=runner,
             builder=builder,
-            measure_callbacks=[auto_scheduler.RecordToFile(log_file)],
+            measure_callbacks=[measure_callback],
         )
         self._tune_option = tune_option
 
@@ -384,11 +537,47 @@ class AutoScheduleTuner(TVMTunerBase):
         logger.info('Create auto scheduler task.')
         tasks, task_weights = auto_scheduler.extract_tasks(
             mod['main'], params, target)
-
-        tuner = auto_scheduler.TaskScheduler(tasks, task_weights)
-
-        logger.info('Begin tuning.')
-        tuner.tune(self._tune_option)
+        all_tasks = tasks
+
+        if self._store is not None:
+            new_tasks = [(task, weight)
+                         for task, weight in zip(tasks, task_weights)
+                         if self.__get_best_record(task.workload_key) is None]
+            logger.info(f'Found tuning records of '
+                        f'{len(tasks) - len(new_tasks)}/{len(tasks)} '
+                        f'tasks in {self._store.root}.')
+            tasks = [task for task, _ in new_tasks]
+            task_weights = [weight for _, weight in new_tasks]
+
+        if len(tasks) > 0:
+            tuner = auto_scheduler.TaskScheduler(tasks, task_weights)
+
+            logger.info('Begin tuning.')
+            tuner.tune(self._tune_option)
+
+        if self._store is not None:
+            # save the best records of all tasks for the build
+            inputs, results = [], []
+            for task in all_tasks:
+                record = self.__get_best_record(task.workload_key)
+                if record is not None:
+                    inputs.append(record[0])
+                    results.append(record[1])
+            auto_scheduler.save_records(self._log_file, inputs, results)
+
+    def __get_best_record(self, workload_key: str) -> Optional[tuple]:
+        """Get the best valid record of a workload in the store."""
+        best, best_cost = None, float('inf')
+        for line in self._store.read('ansor', self._target, workload_key):
+            try:
+                record = auto_scheduler.measure_record.load_record_from_string(
+                    line)
+            except Exception:
+                continue
+            cost = _mean_cost(record[1])
+            if cost < best_cost:
+                best, best_cost = record, cost
+        return best
 
     def build(self, mod: IRModule, params: Dict):
         """Build tuning library.
@@ -412,3 +601,24 @@ class AutoScheduleTuner(TVMTunerBase):
                         mod, target=self._target, params=params)
 
         return ret
+
+
+class _RecordToStore(auto_scheduler.measure.PythonBasedMeasureCallback):
+    """The ansor measure callback appending the records to the store.
+
+    Args:
+        store (TuningRecordStore): The record store.
+        target (Target): The tuning target.
+    """
+
+    def __init__(self, store: TuningRecordStore, target: Target):
+        self.store = store
+        self.target = target
+        super().__init__()
+
+    def callback(self, policy: Any, inputs: Sequence, results: Sequence):
+        """Append the measured records to the store."""
+        for inp, res in zip(inputs, results):
+            self.store.append('ansor', self.target, inp.task.workload_key, [
+                auto_scheduler.measure_record.dump_record_to_string(inp, res)
+            ])
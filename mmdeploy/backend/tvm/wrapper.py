@@ -68,6 +68,7 @@ class TVMWrapper(BaseWrapper):
 
         self._lib = lib
         self._device = device
+        self._device_type = device_type
         self._module = module
 
     def forward(self, inputs: Dict[str,
@@ -85,8 +86,9 @@ class TVMWrapper(BaseWrapper):
 
         mod_inputs = dict()
         for name, tensor in inputs.items():
-            if tensor.device.type == 'cuda':
-                mod_inputs[name] = tvm.nd.from_dlpack(tensor)
+            if tensor.device.type in ('cuda', self._device_type):
+                # share the memory of the tensor on the device of the module
+                mod_inputs[name] = tvm.nd.from_dlpack(tensor.contiguous())
             else:
                 mod_inputs[name] = tvm.nd.array(tensor.cpu().numpy(), device)
 
@@ -94,24 +96,20 @@ class TVMWrapper(BaseWrapper):
             module.set_input('main', **mod_inputs)
             self.__tvm_execute()
             vm_ret = module.get_outputs()
-            ret = dict()
-            for idx, name in enumerate(self._output_names):
-                ndarray = vm_ret[idx]
-                tensor = torch.from_dlpack(ndarray.to_dlpack())
-                ret[name] = tensor
-            return ret
+            return self._wrap_outputs(
+                dict((name, vm_ret[idx])
+                     for idx, name in enumerate(self._output_names)))
 
         else:
             module.set_input(**mod_inputs)
 
             self.__tvm_execute()
 
-            ret = dict()
-            for idx, name in enumerate(self._output_names):
-                ndarray = module.get_output(idx)
-                tensor = torch.from_dlpack(ndarray.to_dlpack())
-                ret[name] = tensor.clone()
-            return ret
+            # the outputs of the graph executor are reused by the next run
+            return self._wrap_outputs(
+                dict((name, module.get_output(idx))
+                     for idx, name in enumerate(self._output_names)),
+                copy=True)
 
     @TimeCounter.count_time(Backend.TVM.value)
     def __tvm_execute(self):
@@ -6,7 +6,10 @@ import mmengine
 from mmengine.model import BaseModel
 from torch import nn
 
-from mmdeploy.utils import Backend, get_ir_config
+from mmdeploy.utils import (Backend, get_backend_config,
+                            get_input_shape_profiles, get_ir_config,
+                            get_model_inputs, get_root_logger,
+                            is_dynamic_batch, load_config)
 
 
 class BaseBackendModel(BaseModel, metaclass=ABCMeta):
@@ -55,15 +58,83 @@ class BaseBackendModel(BaseModel, metaclass=ABCMeta):
             output_names (Sequence[str] | None): Names of model outputs in
                 order. Defaults to `None` and the wrapper will load the output
                 names from the model.
-            deploy_cfg: Deployment config file.
+            deploy_cfg: Deployment config file. The outputs are moved to host
+                memory if `keep_on_device` of the backend config is `False`.
         """
         from mmdeploy.backend.base import get_backend_manager
         backend_mgr = get_backend_manager(backend.value)
         if backend_mgr is None:
             raise NotImplementedError(
                 f'Unsupported backend type: {backend.value}')
-        return backend_mgr.build_wrapper(backend_files, device, input_names,
-                                         output_names, deploy_cfg, **kwargs)
+        wrapper = backend_mgr.build_wrapper(backend_files, device, input_names,
+                                            output_names, deploy_cfg, **kwargs)
+        if deploy_cfg is not None:
+            keep_on_device = get_backend_config(deploy_cfg).get(
+                'keep_on_device', None)
+            if keep_on_device is not None:
+                wrapper.keep_on_device = keep_on_device
+        return wrapper
+
+    def enable_batching(self,
+                        max_batch_size: Optional[int] = None,
+                        timeout: float = 0.005):
+        """Aggregate concurrent calls of the backend wrapper into batches.
+
+        `self.wrapper` is replaced by a `BatchingWrapper`, so that the
+        requests from concurrent threads calling this model are run with one
+        inference of the backend. Batching is only enabled for deploy config
+        with dynamic batch, and the batch size is limited by the max shape of
+        the input in `backend_config.model_inputs` if given.
+
+        Args:
+            max_batch_size (int | None): Max number of samples in a batch.
+                Defaults to `None`, which means the max batch size of the
+                backend or 8 if it is not limited.
+            timeout (float): Max seconds to wait for more requests after the
+                first one of a batch. Defaults to 0.005.
+        """
+        from mmdeploy.backend.base import BatchingWrapper
+        logger = get_root_logger()
+        assert hasattr(self, 'wrapper'), \
+            f'{self.__class__.__name__} has no backend wrapper to batch.'
+        deploy_cfg = getattr(self, 'deploy_cfg', None)
+        if deploy_cfg is None or not is_dynamic_batch(
+                deploy_cfg, input_name=self.input_name):
+            logger.warning('Batching requires a deploy config with dynamic '
+                           'batch, keep running requests one by one.')
+            return
+        deploy_cfg = load_config(deploy_cfg)[0]
+        input_names = get_ir_config(deploy_cfg).get('input_names', [])
+        backend_max_batch_size = None
+        for model_inputs in get_model_inputs(deploy_cfg):
+            profiles = get_input_shape_profiles(
+                model_inputs.get('input_shapes', {}), input_names)
+            if isinstance(profiles, dict):
+                profiles = [profiles]
+            # the largest batch size of all the profiles
+            for profile in profiles:
+                input_shape = profile.get(self.input_name, None)
+                if not isinstance(input_shape, dict) or \
+                        'max_shape' not in input_shape:
+                    continue
+                batch_size = input_shape['max_shape'][0]
+                backend_max_batch_size = batch_size \
+                    if backend_max_batch_size is None \
+                    else max(backend_max_batch_size, batch_size)
+        if max_batch_size is None:
+            max_batch_size = backend_max_batch_size or 8
+        elif backend_max_batch_size is not None and \
+                max_batch_size > backend_max_batch_size:
+            logger.warning(f'max_batch_size {max_batch_size} exceeds the '
+                           f'max batch size {backend_max_batch_size} of the '
+                           'backend and is clipped.')
+            max_batch_size = backend_max_batch_size
+        if isinstance(self.wrapper, BatchingWrapper):
+            self.wrapper.max_batch_size = max_batch_size
+            self.wrapper.timeout = timeout
+        else:
+            self.wrapper = BatchingWrapper(
+                self.wrapper, max_batch_size=max_batch_size, timeout=timeout)
 
     def destroy(self):
         if hasattr(self, 'wrapper') and hasattr(self.wrapper, 'destroy'):
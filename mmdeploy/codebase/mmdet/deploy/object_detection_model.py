@@ -21,6 +21,10 @@ from mmdeploy.utils import (Backend, get_backend, get_codebase_config,
                             get_ir_config, get_partition_config,
                             get_quantization_config, load_config)
 
+BYTES_PER_FLOAT = 4
+# Max memory to paste the masks of a chunk
+GPU_MEM_LIMIT = 1024**3
+
 # Use registry to store models with different partition methods
 # If a model doesn't need to partition, we don't need this registry
 __BACKEND_MODEL = Registry('backend_detectors')
@@ -109,20 +113,35 @@ class End2EndModel(BaseBackendModel):
                              det_masks: Union[np.ndarray, Tensor],
                              img_w: int,
                              img_h: int,
-                             device: str = 'cpu') -> Tensor:
+                             device: str = 'cpu',
+                             skip_empty: bool = False,
+                             mem_limit: int = GPU_MEM_LIMIT) -> Tensor:
         """Additional processing of masks. Resizes masks from [num_det, 28, 28]
         to [num_det, img_w, img_h]. Analog of the 'mmdeploy.codebase.mmdet.
         models.roi_heads.fcn_mask_head._do_paste_mask' function.
 
+        The masks are pasted in chunks, each chunk samples all of its masks
+        with one `grid_sample` and the size of a chunk is bounded by
+        `mem_limit`. If `skip_empty` is True, only the region that tightly
+        bounds the boxes of a chunk is sampled, and the masks are pasted one
+        by one on cpu as mmdet does.
+
         Args:
             det_bboxes (np.ndarray | Tensor): Bbox of shape [num_det, 4]
             det_masks (np.ndarray | Tensor): Masks of shape [num_det, 28, 28].
             img_w (int): Width of the original image.
             img_h (int): Height of the original image.
             device :(str): The device type.
+            skip_empty (bool): Whether to sample masks only inside the region
+                of the boxes. The values outside the region are zeros, which
+                may differ slightly from full image sampling on the border
+                of large boxes, but mask probabilities never reach 0.5 there.
+                Defaults to False.
+            mem_limit (int): Max bytes of the pasted masks and sampling grids
+                of a chunk. Defaults to 1GB.
 
         Returns:
-            Tensor: masks of shape [N, num_det, img_h, img_w].
+            Tensor: masks of shape [num_det, img_h, img_w].
         """
         masks = det_masks
         bboxes = det_bboxes
@@ -137,42 +156,61 @@ class End2EndModel(BaseBackendModel):
             masks = torch.tensor(masks, device=device)
             bboxes = torch.tensor(bboxes, device=device)
 
-        masks = masks.to(device)
-        bboxes = bboxes.to(device)
+        masks = masks.to(device=device, dtype=torch.float32)
+        bboxes = bboxes.to(device=device, dtype=torch.float32)
 
-        result_masks = []
-        for bbox, mask in zip(bboxes, masks):
-
-            x0_int, y0_int = 0, 0
-            x1_int, y1_int = img_w, img_h
+        if skip_empty and device.type == 'cpu':
+            # pasting the region of each box is faster on cpu
+            num_chunks = num_det
+        else:
+            # the pasted masks and the two channel sampling grids
+            num_chunks = math.ceil(num_det * img_h * img_w * BYTES_PER_FLOAT *
+                                   3 / mem_limit)
+            num_chunks = min(max(num_chunks, 1), num_det)
+        chunk_size = math.ceil(num_det / num_chunks)
+
+        result_masks = masks.new_zeros(num_det, img_h, img_w)
+        for start in range(0, num_det, chunk_size):
+            end = min(start + chunk_size, num_det)
+            chunk_bboxes = bboxes[start:end]
+            if skip_empty:
+                x0_int = max(
+                    int(chunk_bboxes[:, 0].min().floor().item()) - 1, 0)
+                y0_int = max(
+                    int(chunk_bboxes[:, 1].min().floor().item()) - 1, 0)
+                x1_int = min(
+                    int(chunk_bboxes[:, 2].max().ceil().item()) + 1, img_w)
+                y1_int = min(
+                    int(chunk_bboxes[:, 3].max().ceil().item()) + 1, img_h)
+                if x1_int <= x0_int or y1_int <= y0_int:
+                    continue
+            else:
+                x0_int, y0_int = 0, 0
+                x1_int, y1_int = img_w, img_h
 
+            x0, y0, x1, y1 = torch.split(chunk_bboxes, 1, dim=1)
             img_y = torch.arange(
                 y0_int, y1_int, dtype=torch.float32, device=device) + 0.5
             img_x = torch.arange(
                 x0_int, x1_int, dtype=torch.float32, device=device) + 0.5
-            x0, y0, x1, y1 = bbox
-
             img_y = (img_y - y0) / (y1 - y0) * 2 - 1
             img_x = (img_x - x0) / (x1 - x0) * 2 - 1
-            if torch.isinf(img_x).any():
-                inds = torch.where(torch.isinf(img_x))
-                img_x[inds] = 0
-            if torch.isinf(img_y).any():
-                inds = torch.where(torch.isinf(img_y))
-                img_y[inds] = 0
+            # boxes with zero width or height
+            img_y = img_y.masked_fill(torch.isinf(img_y), 0)
+            img_x = img_x.masked_fill(torch.isinf(img_x), 0)
 
-            gx = img_x[None, :].expand(img_y.size(0), img_x.size(0))
-            gy = img_y[:, None].expand(img_y.size(0), img_x.size(0))
-            grid = torch.stack([gx, gy], dim=2)
+            num_chunk_det = end - start
+            gx = img_x[:, None, :].expand(num_chunk_det, img_y.size(1),
+                                          img_x.size(1))
+            gy = img_y[:, :, None].expand(num_chunk_det, img_y.size(1),
+                                          img_x.size(1))
+            grid = torch.stack([gx, gy], dim=3)
 
             img_masks = F.grid_sample(
-                mask.to(dtype=torch.float32)[None, None, :, :],
-                grid[None, :, :, :],
-                align_corners=False)
-
-            result_masks.append(img_masks)
-        result_masks = torch.cat(result_masks, 1)
-        return result_masks.squeeze(0)
+                masks[start:end, None], grid, align_corners=False)
+            result_masks[start:end, y0_int:y1_int,
+                         x0_int:x1_int] = img_masks[:, 0]
+        return result_masks
 
     def postprocessing_results(self,
                                batch_dets: torch.Tensor,
@@ -252,8 +290,14 @@ class End2EndModel(BaseBackendModel):
                         export_postprocess_mask = mmdet_deploy_cfg.get(
                             'export_postprocess_mask', False)
                     if not export_postprocess_mask:
+                        # the values outside the boxes are below threshold
                         masks = End2EndModel.postprocessing_masks(
-                            dets[:, :4], masks, ori_w, ori_h, self.device)
+                            dets[:, :4],
+                            masks,
+                            ori_w,
+                            ori_h,
+                            self.device,
+                            skip_empty=True)
                     else:
                         masks = masks[:, :img_h, :img_w]
                 # avoid to resize masks with zero dim
@@ -47,6 +47,7 @@ class VoxelDetectionModel(BaseBackendModel):
         self.device = device
         self._init_wrapper(
             backend=backend, backend_files=backend_files, device=device)
+        self.bbox_head = VoxelDetectionModel.build_bbox_head(model_cfg)
 
     def _init_wrapper(self, backend: Backend, backend_files: Sequence[str],
                       device: str):
@@ -105,7 +106,8 @@ class VoxelDetectionModel(BaseBackendModel):
             model_cfg=self.model_cfg,
             deploy_cfg=self.deploy_cfg,
             outs=outputs,
-            metas=data_samples)
+            metas=data_samples,
+            head=self.bbox_head)
 
         return prediction
 
@@ -200,9 +202,109 @@ class VoxelDetectionModel(BaseBackendModel):
             data_sample.pred_instances = data_instances_2d[i]
         return data_samples
 
+    @staticmethod
+    def build_bbox_head(model_cfg: Config) -> torch.nn.Module:
+        """Build the bbox head used by the postprocess.
+
+        Args:
+            model_cfg (Config): The model config from trainning repo.
+
+        Raises:
+            NotImplementedError: Only support mmdet3d model with `bbox_head`
+
+        Returns:
+            torch.nn.Module: The bbox head.
+        """
+        from mmengine.registry import MODELS
+        if 'bbox_head' in model_cfg.model:
+            # pointpillars postprocess
+            return MODELS.build(model_cfg.model['bbox_head'])
+        elif 'pts_bbox_head' in model_cfg.model:
+            # centerpoint postprocess
+            return MODELS.build(model_cfg.model['pts_bbox_head'])
+        else:
+            raise NotImplementedError('mmdet3d model bbox_head not found')
+
+    @staticmethod
+    def _decode_task_heads(head: torch.nn.Module, cls_score: torch.Tensor,
+                           bbox_pred: torch.Tensor,
+                           dir_cls_pred: torch.Tensor) -> List[List[Dict]]:
+        """Decode the outputs of all task heads of CenterPoint at once.
+
+        The tasks are stacked along the batch dim, and the heatmaps of the
+        tasks with fewer classes are padded with zero scores, so the bbox
+        coder decodes them in one call.
+
+        Args:
+            head (torch.nn.Module): The CenterHead.
+            cls_score (torch.Tensor): The heatmaps of all tasks, of shape
+                (B, sum(num_classes), H, W).
+            bbox_pred (torch.Tensor): The reg, height, dim and velocity of
+                all tasks, of shape (B, 8 * num_tasks, H, W).
+            dir_cls_pred (torch.Tensor): The sine and cosine of rotation of
+                all tasks, of shape (B, 2 * num_tasks, H, W).
+
+        Returns:
+            List[List[Dict]]: The decoded `bboxes`, `scores` and `labels` of
+                each sample for each task.
+        """
+        num_classes = list(head.num_classes)
+        num_tasks = len(num_classes)
+        batch_size, _, height, width = cls_score.shape
+        max_classes = max(num_classes)
+
+        batch_heatmap = cls_score.sigmoid()
+        if all(num_class == max_classes for num_class in num_classes):
+            batch_heatmap = batch_heatmap.view(batch_size, num_tasks,
+                                               max_classes, height, width)
+        else:
+            heatmaps = batch_heatmap.split(num_classes, dim=1)
+            batch_heatmap = batch_heatmap.new_zeros(batch_size, num_tasks,
+                                                    max_classes, height, width)
+            for task_id, heatmap in enumerate(heatmaps):
+                batch_heatmap[:, task_id, :num_classes[task_id]] = heatmap
+
+        def _stack_tasks(x, channels):
+            # (B, T * C, H, W) -> (T * B, C, H, W)
+            x = x.reshape(batch_size, num_tasks, channels, height, width)
+            return x.transpose(0, 1).reshape(num_tasks * batch_size, channels,
+                                             height, width)
+
+        batch_heatmap = batch_heatmap.transpose(0, 1).reshape(
+            num_tasks * batch_size, max_classes, height, width)
+        bbox_pred = _stack_tasks(bbox_pred, 8)
+        dir_cls_pred = _stack_tasks(dir_cls_pred, 2)
+
+        batch_dim = bbox_pred[:, 3:6]
+        if head.norm_bbox:
+            batch_dim = torch.exp(batch_dim)
+        preds = head.bbox_coder.decode(
+            batch_heatmap,
+            dir_cls_pred[:, 0:1],
+            dir_cls_pred[:, 1:2],
+            bbox_pred[:, 2:3],
+            batch_dim,
+            bbox_pred[:, 6:8],
+            reg=bbox_pred[:, 0:2])
+
+        task_preds = []
+        for task_id, num_class in enumerate(num_classes):
+            task_pred = preds[task_id * batch_size:(task_id + 1) * batch_size]
+            if num_class < max_classes:
+                # remove the padded classes
+                task_pred = [
+                    dict((k, v[pred['labels'] < num_class])
+                         for k, v in pred.items()) for pred in task_pred
+                ]
+            task_preds.append(task_pred)
+        return task_preds
+
     @staticmethod
     def postprocess(model_cfg: Union[str, Config],
-                    deploy_cfg: Union[str, Config], outs: Dict, metas: Dict):
+                    deploy_cfg: Union[str, Config],
+                    outs: Dict,
+                    metas: Dict,
+                    head: Optional[torch.nn.Module] = None):
         """postprocess outputs to datasamples.
 
         Args:
@@ -212,6 +314,9 @@ class VoxelDetectionModel(BaseBackendModel):
                 backend and input shape
             outs (Dict): output bbox, cls and score
             metas (Dict): DataSample3D for bbox3d render
+            head (torch.nn.Module | None): The bbox head built by
+                `build_bbox_head`, built from `model_cfg` if not given.
+                Defaults to `None`.
 
         Raises:
             NotImplementedError: Only support mmdet3d model with `bbox_head`
@@ -225,24 +330,19 @@ class VoxelDetectionModel(BaseBackendModel):
         if 'test_cfg' not in model_cfg.model:
             raise RuntimeError('test_cfg not found')
 
-        from mmengine.registry import MODELS
         cls_score = outs['cls_score']
         bbox_pred = outs['bbox_pred']
         dir_cls_pred = outs['dir_cls_pred']
         batch_input_metas = [data_samples.metainfo for data_samples in metas]
 
-        head = None
-        cfg = None
+        if head is None:
+            head = VoxelDetectionModel.build_bbox_head(model_cfg)
         if 'bbox_head' in model_cfg.model:
             # pointpillars postprocess
-            head = MODELS.build(model_cfg.model['bbox_head'])
             cfg = model_cfg.model.test_cfg
-        elif 'pts_bbox_head' in model_cfg.model:
+        else:
             # centerpoint postprocess
-            head = MODELS.build(model_cfg.model['pts_bbox_head'])
             cfg = model_cfg.model.test_cfg.pts
-        else:
-            raise NotImplementedError('mmdet3d model bbox_head not found')
 
         if not hasattr(head, 'task_heads'):
             data_instances_3d = head.predict_by_feat(
@@ -256,120 +356,49 @@ class VoxelDetectionModel(BaseBackendModel):
                 data_samples=metas, data_instances_3d=data_instances_3d)
 
         else:
-            cls_score = cls_score[0]
-            bbox_pred = bbox_pred[0]
-            dir_cls_pred = dir_cls_pred[0]
-
-            pts = model_cfg.model.test_cfg.pts
+            assert cfg['nms_type'] in ['circle', 'rotate']
+            task_preds = VoxelDetectionModel._decode_task_heads(
+                head, cls_score[0], bbox_pred[0], dir_cls_pred[0])
 
             rets = []
-            scores_range = [0]
-            bbox_range = [0]
-            dir_range = [0]
-            for i, _ in enumerate(head.task_heads):
-                scores_range.append(scores_range[i] + head.num_classes[i])
-                bbox_range.append(bbox_range[i] + 8)
-                dir_range.append(dir_range[i] + 2)
-
-            for task_id in range(len(head.num_classes)):
-                num_class_with_bg = head.num_classes[task_id]
-
-                batch_heatmap = cls_score[:,
-                                          scores_range[task_id]:scores_range[
-                                              task_id + 1], ...].sigmoid()
-
-                batch_reg = bbox_pred[:,
-                                      bbox_range[task_id]:bbox_range[task_id] +
-                                      2, ...]
-                batch_hei = bbox_pred[:, bbox_range[task_id] +
-                                      2:bbox_range[task_id] + 3, ...]
-
-                if head.norm_bbox:
-                    batch_dim = torch.exp(bbox_pred[:, bbox_range[task_id] +
-                                                    3:bbox_range[task_id] + 6,
-                                                    ...])
-                else:
-                    batch_dim = bbox_pred[:, bbox_range[task_id] +
-                                          3:bbox_range[task_id] + 6, ...]
-
-                batch_vel = bbox_pred[:, bbox_range[task_id] +
-                                      6:bbox_range[task_id + 1], ...]
-
-                batch_rots = dir_cls_pred[:,
-                                          dir_range[task_id]:dir_range[task_id
-                                                                       + 1],
-                                          ...][:, 0].unsqueeze(1)
-                batch_rotc = dir_cls_pred[:,
-                                          dir_range[task_id]:dir_range[task_id
-                                                                       + 1],
-                                          ...][:, 1].unsqueeze(1)
-
-                temp = head.bbox_coder.decode(
-                    batch_heatmap,
-                    batch_rots,
-                    batch_rotc,
-                    batch_hei,
-                    batch_dim,
-                    batch_vel,
-                    reg=batch_reg,
-                    task_id=task_id)
-
-                assert pts['nms_type'] in ['circle', 'rotate']
-                batch_reg_preds = [box['bboxes'] for box in temp]
-                batch_cls_preds = [box['scores'] for box in temp]
-                batch_cls_labels = [box['labels'] for box in temp]
-                if pts['nms_type'] == 'circle':
-                    boxes3d = temp[0]['bboxes']
-                    scores = temp[0]['scores']
-                    labels = temp[0]['labels']
-                    centers = boxes3d[:, [0, 1]]
-                    boxes = torch.cat([centers, scores.view(-1, 1)], dim=1)
-                    from mmdet3d.models.layers import circle_nms
-                    keep = torch.tensor(
-                        circle_nms(
-                            boxes.detach().cpu().numpy(),
-                            pts['min_radius'][task_id],
-                            post_max_size=pts['post_max_size']),
-                        dtype=torch.long,
-                        device=boxes.device)
-
-                    boxes3d = boxes3d[keep]
-                    scores = scores[keep]
-                    labels = labels[keep]
-                    ret = dict(bboxes=boxes3d, scores=scores, labels=labels)
-                    ret_task = [ret]
+            for task_id, preds in enumerate(task_preds):
+                if cfg['nms_type'] == 'circle':
+                    ret_task = []
+                    for pred in preds:
+                        keep = _circle_nms(
+                            pred['bboxes'][:, :2],
+                            pred['scores'],
+                            cfg['min_radius'][task_id],
+                            post_max_size=cfg['post_max_size'])
+                        ret_task.append(
+                            dict((k, v[keep]) for k, v in pred.items()))
                     rets.append(ret_task)
                 else:
                     rets.append(
-                        head.get_task_detections(num_class_with_bg,
-                                                 batch_cls_preds,
-                                                 batch_reg_preds,
-                                                 batch_cls_labels,
-                                                 batch_input_metas))
+                        head.get_task_detections(
+                            head.num_classes[task_id],
+                            [pred['scores'] for pred in preds],
+                            [pred['bboxes'] for pred in preds],
+                            [pred['labels']
+                             for pred in preds], batch_input_metas))
 
             # Merge branches results
-            num_samples = len(rets[0])
-
+            label_offsets = [0]
+            for num_class in head.num_classes[:-1]:
+                label_offsets.append(label_offsets[-1] + num_class)
             ret_list = []
-            for i in range(num_samples):
+            for i in range(len(rets[0])):
+                bboxes = torch.cat([ret[i]['bboxes'] for ret in rets])
+                bboxes[:, 2] = bboxes[:, 2] - bboxes[:, 5] * 0.5
                 temp_instances = InstanceData()
-                for k in rets[0][i].keys():
-                    if k == 'bboxes':
-                        bboxes = torch.cat([ret[i][k] for ret in rets])
-                        bboxes[:, 2] = bboxes[:, 2] - bboxes[:, 5] * 0.5
-                        bboxes = batch_input_metas[i]['box_type_3d'](
-                            bboxes, head.bbox_coder.code_size)
-                    elif k == 'scores':
-                        scores = torch.cat([ret[i][k] for ret in rets])
-                    elif k == 'labels':
-                        flag = 0
-                        for j, num_class in enumerate(head.num_classes):
-                            rets[j][i][k] += flag
-                            flag += num_class
-                        labels = torch.cat([ret[i][k].int() for ret in rets])
-                temp_instances.bboxes_3d = bboxes
-                temp_instances.scores_3d = scores
-                temp_instances.labels_3d = labels
+                temp_instances.bboxes_3d = batch_input_metas[i]['box_type_3d'](
+                    bboxes, head.bbox_coder.code_size)
+                temp_instances.scores_3d = torch.cat(
+                    [ret[i]['scores'] for ret in rets])
+                temp_instances.labels_3d = torch.cat([
+                    ret[i]['labels'].int() + offset
+                    for ret, offset in zip(rets, label_offsets)
+                ])
                 ret_list.append(temp_instances)
 
             data_samples = VoxelDetectionModel.convert_to_datasample(
@@ -378,6 +407,42 @@ class VoxelDetectionModel(BaseBackendModel):
         return data_samples
 
 
+def _circle_nms(centers: torch.Tensor,
+                scores: torch.Tensor,
+                thresh: float,
+                post_max_size: int = 83) -> torch.Tensor:
+    """Circular NMS on the device of the boxes.
+
+    Same as `mmdet3d.models.layers.circle_nms`: the boxes are visited in the
+    order of scores, and a box is suppressed if the squared distance between
+    its center and the center of a kept box is not larger than `thresh`.
+    The greedy result is the fixed point of `keep[j] = not any(keep[i] and
+    close[i, j] for i < j)`, which is iterated on the whole matrix instead of
+    one box at a time.
+
+    Args:
+        centers (torch.Tensor): The centers of boxes, of shape (N, 2).
+        scores (torch.Tensor): The scores of boxes, of shape (N, ).
+        thresh (float): The threshold of the squared distance.
+        post_max_size (int): Max number of kept boxes. Defaults to 83.
+
+    Returns:
+        torch.Tensor: The indices of the kept boxes in the order of scores.
+    """
+    order = scores.argsort(descending=True)
+    centers = centers[order]
+    dist = (centers[:, None, :] - centers[None, :, :]).pow(2).sum(-1)
+    # close[i, j]: box i has higher score than box j and suppresses it
+    close = (dist <= thresh).triu(diagonal=1)
+    keep = torch.ones_like(order, dtype=torch.bool)
+    for _ in range(order.numel()):
+        new_keep = ~(close & keep[:, None]).any(0)
+        if torch.equal(new_keep, keep):
+            break
+        keep = new_keep
+    return order[keep][:post_max_size]
+
+
 def build_voxel_detection_model(
         model_files: Sequence[str],
         model_cfg: Union[str, Config],
@@ -1,8 +1,11 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-from typing import List, Optional, Sequence, Union
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple, Union
 
 import cv2
 import mmengine
+import numpy as np
 import torch
 from mmengine.registry import Registry
 from mmengine.structures import BaseDataElement, InstanceData
@@ -113,7 +116,6 @@ class End2EndModel(BaseBackendModel):
         if hasattr(self, 'det_head'):
             return self.det_head.postprocessor(x[0], data_samples)
         # post-process of mmdet models
-        from mmdet.structures.mask import bitmap_to_polygon
         from mmocr.utils.bbox_utils import bbox2poly
 
         from mmdeploy.codebase.mmdet.deploy import get_post_processing_params
@@ -129,8 +131,6 @@ class End2EndModel(BaseBackendModel):
                 ori_h, ori_w = data_samples[i].ori_shape[:2]
                 img_h, img_w = data_samples[i].img_shape[:2]
                 export_postprocess_mask = True
-                polygons = []
-                scores = []
                 if self.deploy_cfg is not None:
                     codebase_cfg = get_post_processing_params(self.deploy_cfg)
                     # this flag enable postprocess when export.
@@ -141,35 +141,17 @@ class End2EndModel(BaseBackendModel):
                         bboxes, masks, ori_w, ori_h, batch_masks.device)
                 else:
                     masks = masks[:, :img_h, :img_w]
-                masks = torch.nn.functional.interpolate(
-                    masks.unsqueeze(0).float(), size=(ori_h, ori_w))
-                masks = masks.squeeze(0)
-                if masks.dtype != bool:
-                    masks = masks >= 0.5
-
-                for mask_idx, mask in enumerate(masks.cpu()):
-                    contours, _ = bitmap_to_polygon(mask)
-                    polygons += [contour.reshape(-1) for contour in contours]
-                    scores += [batch_dets[i, :, 4][mask_idx].cpu()
-                               ] * len(contours)
-                # filter invalid polygons
-                filterd_polygons = []
-                keep_idx = []
-                for poly_idx, polygon in enumerate(polygons):
-                    if len(polygon) < 6:
-                        continue
-                    filterd_polygons.append(polygon)
-                    keep_idx.append(poly_idx)
-                # convert by text_repr_type
-                if self.text_repr_type == 'quad':
-                    for j, poly in enumerate(filterd_polygons):
-                        rect = cv2.minAreaRect(poly)
-                        vertices = cv2.boxPoints(rect)
-                        poly = vertices.flatten()
-                        filterd_polygons[j] = poly
+                # only the region of each box is resized to the original
+                # image, instead of the whole masks
+                mask_crops, offsets = _crop_masks(masks, bboxes,
+                                                  (ori_h, ori_w))
+                polygons, num_polygons = _extract_polygons(
+                    mask_crops, offsets, self.text_repr_type)
+                scores = batch_dets[i, :, 4].float().cpu().repeat_interleave(
+                    torch.from_numpy(num_polygons))
                 pred_instances = InstanceData()
-                pred_instances.polygons = filterd_polygons
-                pred_instances.scores = torch.FloatTensor(scores)[keep_idx]
+                pred_instances.polygons = polygons
+                pred_instances.scores = scores
                 data_samples[i].pred_instances = pred_instances
         else:
             dets = x[0]
@@ -199,6 +181,181 @@ class End2EndModel(BaseBackendModel):
         return outputs
 
 
+def _crop_masks(
+        masks: torch.Tensor, bboxes: torch.Tensor,
+        dst_size: Tuple[int, int]) -> Tuple[List[np.ndarray], np.ndarray]:
+    """Resize the region of each box of the masks to the original image.
+
+    The result is the same as the region of the masks resized by the
+    nearest `interpolate` to `dst_size`, the pixels are gathered only in the
+    boxes padded by one pixel. All crops are thresholded on the device and
+    copied to host at once.
+
+    Args:
+        masks (torch.Tensor): The masks of shape (N, H, W).
+        bboxes (torch.Tensor): The boxes of shape (N, 4) in the original
+            image.
+        dst_size (Tuple[int, int]): The height and width of the original
+            image.
+
+    Returns:
+        Tuple[List[np.ndarray], np.ndarray]: The binary crops, and the
+            (x, y) offsets of the crops of shape (N, 2).
+    """
+    num_masks, src_h, src_w = masks.shape
+    dst_h, dst_w = dst_size
+    if num_masks == 0:
+        return [], np.zeros((0, 2), dtype=np.int32)
+    bboxes = bboxes.detach().float().cpu()
+    x0 = (bboxes[:, 0].floor() - 1).clamp(0, dst_w).int().tolist()
+    y0 = (bboxes[:, 1].floor() - 1).clamp(0, dst_h).int().tolist()
+    x1 = (bboxes[:, 2].ceil() + 1).clamp(0, dst_w).int().tolist()
+    y1 = (bboxes[:, 3].ceil() + 1).clamp(0, dst_h).int().tolist()
+    x1 = [max(end, start) for start, end in zip(x0, x1)]
+    y1 = [max(end, start) for start, end in zip(y0, y1)]
+
+    # the source index of each pixel, same as the nearest interpolation
+    device = masks.device
+    src_y = (torch.arange(dst_h, dtype=torch.float32, device=device) *
+             (src_h / dst_h)).long().clamp(max=src_h - 1)
+    src_x = (torch.arange(dst_w, dtype=torch.float32, device=device) *
+             (src_w / dst_w)).long().clamp(max=src_w - 1)
+
+    crops = []
+    for k in range(num_masks):
+        crop = masks[k].index_select(0, src_y[y0[k]:y1[k]]).index_select(
+            1, src_x[x0[k]:x1[k]])
+        if crop.dtype != torch.bool:
+            crop = crop >= 0.5
+        crops.append(crop.flatten())
+    crops = torch.cat(crops).cpu().numpy()
+    sizes = [(h1 - h0) * (w1 - w0) for h0, h1, w0, w1 in zip(y0, y1, x0, x1)]
+    crops = np.split(crops, np.cumsum(sizes)[:-1])
+    crops = [
+        crop.reshape(h1 - h0, w1 - w0)
+        for crop, h0, h1, w0, w1 in zip(crops, y0, y1, x0, x1)
+    ]
+    offsets = np.stack([x0, y0], axis=1).astype(np.int32)
+    return crops, offsets
+
+
+_POLYGON_EXECUTOR = None
+
+
+def _get_polygon_executor() -> ThreadPoolExecutor:
+    """Get the thread pool to extract the polygons.
+
+    `cv2` releases the GIL, so the masks are processed in parallel.
+    """
+    global _POLYGON_EXECUTOR
+    if _POLYGON_EXECUTOR is None:
+        _POLYGON_EXECUTOR = ThreadPoolExecutor(
+            max_workers=min(8,
+                            os.cpu_count() or 1),
+            thread_name_prefix='text_det_polygons')
+    return _POLYGON_EXECUTOR
+
+
+def _find_contours(bitmap: np.ndarray) -> List[np.ndarray]:
+    """Find the contours of a binary mask, same as `bitmap_to_polygon` in
+    mmdet.
+
+    Args:
+        bitmap (np.ndarray): The binary mask of shape (H, W).
+
+    Returns:
+        List[np.ndarray]: The contours of shape (n, 2) in (x, y) order.
+    """
+    bitmap = np.ascontiguousarray(bitmap).astype(np.uint8)
+    outs = cv2.findContours(bitmap, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_NONE)
+    contours, hierarchy = outs[-2], outs[-1]
+    if hierarchy is None:
+        return []
+    return [contour.reshape(-1, 2) for contour in contours]
+
+
+def _min_area_rects(contours: List[np.ndarray]) -> np.ndarray:
+    """Fit the min area rectangles of contours.
+
+    Args:
+        contours (List[np.ndarray]): The contours.
+
+    Returns:
+        np.ndarray: The (cx, cy, w, h, angle) of each rectangle, of shape
+            (n, 5).
+    """
+    rects = np.zeros((len(contours), 5), dtype=np.float32)
+    for j, contour in enumerate(contours):
+        (cx, cy), (w, h), angle = cv2.minAreaRect(contour)
+        rects[j] = (cx, cy, w, h, angle)
+    return rects
+
+
+def _box_points(rects: np.ndarray) -> np.ndarray:
+    """Get the vertices of rectangles, same as `cv2.boxPoints` in batch.
+
+    Args:
+        rects (np.ndarray): The (cx, cy, w, h, angle) of rectangles, of
+            shape (n, 5). The angles are in degrees.
+
+    Returns:
+        np.ndarray: The vertices of shape (n, 4, 2).
+    """
+    rects = rects.astype(np.float32)
+    cx, cy, w, h, angle = rects.T
+    angle = angle * np.float32(np.pi / 180.)
+    b = np.cos(angle) * np.float32(0.5)
+    a = np.sin(angle) * np.float32(0.5)
+    pt0 = np.stack([cx - a * h - b * w, cy + b * h - a * w], axis=-1)
+    pt1 = np.stack([cx + a * h - b * w, cy - b * h - a * w], axis=-1)
+    center = np.stack([cx, cy], axis=-1)
+    return np.stack([pt0, pt1, 2 * center - pt0, 2 * center - pt1], axis=1)
+
+
+def _extract_polygons(
+        mask_crops: List[np.ndarray], offsets: np.ndarray,
+        text_repr_type: str) -> Tuple[List[np.ndarray], np.ndarray]:
+    """Extract the polygons of masks.
+
+    The contours of all masks are found in a thread pool, the contours with
+    less than 3 points are dropped, and the quads of the kept contours are
+    fitted in batch if `text_repr_type` is `'quad'`.
+
+    Args:
+        mask_crops (List[np.ndarray]): The binary crops of masks.
+        offsets (np.ndarray): The (x, y) offsets of the crops.
+        text_repr_type (str): `'poly'` or `'quad'`.
+
+    Returns:
+        Tuple[List[np.ndarray], np.ndarray]: The flattened polygons, and the
+            number of polygons of each mask.
+    """
+    if len(mask_crops) == 0:
+        return [], np.zeros(0, dtype=np.int64)
+
+    def _process(crop, offset):
+        contours = [
+            contour + offset for contour in _find_contours(crop)
+            if len(contour) >= 3
+        ]
+        rects = _min_area_rects(contours) if text_repr_type == 'quad' \
+            else None
+        return contours, rects
+
+    results = list(_get_polygon_executor().map(_process, mask_crops, offsets))
+    num_polygons = np.array([len(contours) for contours, _ in results],
+                            dtype=np.int64)
+    if text_repr_type == 'quad':
+        rects = np.concatenate([rects for _, rects in results])
+        polygons = list(_box_points(rects).reshape(-1, 8))
+    else:
+        polygons = [
+            contour.reshape(-1) for contours, _ in results
+            for contour in contours
+        ]
+    return polygons, num_polygons
+
+
 @__BACKEND_MODEL.register_module('sdk')
 class SDKEnd2EndModel(End2EndModel):
     """SDK inference class, converts SDK output to mmocr format."""
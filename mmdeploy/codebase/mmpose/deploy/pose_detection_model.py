@@ -56,6 +56,13 @@ class End2EndModel(BaseBackendModel):
         # create head for decoding heatmap
         self.head = builder.build_head(model_cfg.model.head) if hasattr(
             model_cfg.model, 'head') else None
+        # resolve the postprocess once instead of on every forward
+        codec = getattr(model_cfg, 'codec', None)
+        if isinstance(codec, (list, tuple)):
+            codec = codec[-1]
+        self.codec_type = codec.type if codec is not None else None
+        self.export_postprocess = get_codebase_config(deploy_cfg).get(
+            'export_postprocess', False)
 
     def _init_wrapper(self, backend: Backend, backend_files: Sequence[str],
                       device: str, **kwargs):
@@ -99,16 +106,10 @@ class End2EndModel(BaseBackendModel):
         batch_outputs = self.wrapper({self.input_name: inputs})
         batch_outputs = self.wrapper.output_to_list(batch_outputs)
 
-        codebase_cfg = get_codebase_config(self.deploy_cfg)
-        codec = self.model_cfg.codec
-        if isinstance(codec, (list, tuple)):
-            codec = codec[-1]
-
-        if codec.type == 'YOLOXPoseAnnotationProcessor':
+        if self.codec_type == 'YOLOXPoseAnnotationProcessor':
             return self.pack_yolox_pose_result(batch_outputs, data_samples)
-        elif codec.type == 'SimCCLabel':
-            export_postprocess = codebase_cfg.get('export_postprocess', False)
-            if export_postprocess:
+        elif self.codec_type == 'SimCCLabel':
+            if self.export_postprocess:
                 keypoints, scores = [_.cpu().numpy() for _ in batch_outputs]
                 preds = [
                     InstanceData(keypoints=keypoints, keypoint_scores=scores)
@@ -116,7 +117,7 @@ class End2EndModel(BaseBackendModel):
             else:
                 batch_pred_x, batch_pred_y = batch_outputs
                 preds = self.head.decode((batch_pred_x, batch_pred_y))
-        elif codec.type in ['RegressionLabel', 'IntegralRegressionLabel']:
+        elif self.codec_type in ['RegressionLabel', 'IntegralRegressionLabel']:
             preds = self.head.decode(batch_outputs)
         else:
             preds = self.head.decode(batch_outputs[0])
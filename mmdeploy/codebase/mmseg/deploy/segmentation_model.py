@@ -41,6 +41,8 @@ class End2EndModel(BaseBackendModel):
             deploy_cfg=deploy_cfg, data_preprocessor=data_preprocessor)
         self.deploy_cfg = deploy_cfg
         self.device = device
+        self.with_argmax = get_codebase_config(deploy_cfg).get(
+            'with_argmax', True)
         self._init_wrapper(
             backend=backend,
             backend_files=backend_files,
@@ -101,20 +103,32 @@ class End2EndModel(BaseBackendModel):
             list[:obj:`SegDataSample`]: The updated seg data samples.
         """
 
-        predictions = []
-        for seg_pred, data_sample in zip(batch_outputs, data_samples):
-            # resize seg_pred to original image shape
+        if self.with_argmax is False:
+            batch_outputs = batch_outputs.argmax(dim=1, keepdim=True)
+
+        # resize the samples sharing the same original shape at once
+        groups = dict()
+        for i, data_sample in enumerate(data_samples):
             metainfo = data_sample.metainfo
-            if get_codebase_config(self.deploy_cfg).get('with_argmax',
-                                                        True) is False:
-                seg_pred = seg_pred.argmax(dim=0, keepdim=True)
-            if metainfo['ori_shape'] != metainfo['img_shape']:
-                from mmseg.models.utils import resize
-                ori_type = seg_pred.dtype
-                seg_pred = resize(
-                    seg_pred.unsqueeze(0).to(torch.float32),
-                    size=metainfo['ori_shape'],
-                    mode='nearest').squeeze(0).to(ori_type)
+            ori_shape = tuple(metainfo['ori_shape'][:2])
+            if ori_shape == tuple(metainfo['img_shape'][:2]):
+                ori_shape = None
+            groups.setdefault(ori_shape, []).append(i)
+
+        seg_preds = list(batch_outputs[:len(data_samples)])
+        for ori_shape, indices in groups.items():
+            if ori_shape is None:
+                continue
+            if len(indices) == len(data_samples):
+                group_outputs = batch_outputs[:len(data_samples)]
+            else:
+                group_outputs = batch_outputs[indices]
+            group_outputs = _resize_nearest(group_outputs, ori_shape)
+            for i, seg_pred in zip(indices, group_outputs):
+                seg_preds[i] = seg_pred
+
+        predictions = []
+        for seg_pred, data_sample in zip(seg_preds, data_samples):
             data_sample.set_data(
                 dict(pred_sem_seg=PixelData(**dict(data=seg_pred))))
             predictions.append(data_sample)
@@ -122,6 +136,35 @@ class End2EndModel(BaseBackendModel):
         return predictions
 
 
+def _resize_nearest(inputs: torch.Tensor, size: Sequence[int]) -> torch.Tensor:
+    """Resize the last two dims of a tensor of any dtype.
+
+    Same as `F.interpolate` with `mode='nearest'`, the pixels are gathered by
+    index, so integer labels do not need a round trip through float32.
+
+    Args:
+        inputs (torch.Tensor): The tensor of shape (..., H, W).
+        size (Sequence[int]): The output height and width.
+
+    Returns:
+        torch.Tensor: The resized tensor of shape (..., size[0], size[1]).
+    """
+
+    def _nearest_indices(input_size, output_size):
+        # the scale is computed in float32 as the interpolate kernels do
+        scale = torch.tensor(input_size, dtype=torch.float32) / output_size
+        indices = torch.arange(output_size, dtype=torch.float32) * scale
+        return indices.long().clamp(max=input_size - 1).to(inputs.device)
+
+    in_h, in_w = inputs.shape[-2:]
+    out_h, out_w = size
+    if in_h != out_h:
+        inputs = inputs.index_select(-2, _nearest_indices(in_h, out_h))
+    if in_w != out_w:
+        inputs = inputs.index_select(-1, _nearest_indices(in_w, out_w))
+    return inputs
+
+
 @__BACKEND_MODEL.register_module('vacc_seg')
 class VACCModel(End2EndModel):
     """SDK inference class, converts VACC output to mmseg format."""
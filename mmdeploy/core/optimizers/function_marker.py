@@ -88,7 +88,7 @@ def forward_of_mark(ctx, x, dtype, shape, func, func_id, type, name, id,
         from mmdeploy.apis import get_predefined_partition_cfg
         partition_cfgs = get_predefined_partition_cfg(deploy_cfg,
                                                       partition_type)
-        assert hasattr(rewriter, 'calib_file')
+        assert hasattr(rewriter, 'calib_writer')
 
         for partition_id, partition_cfg in enumerate(partition_cfgs):
             start = partition_cfg['start']
@@ -97,30 +97,10 @@ def forward_of_mark(ctx, x, dtype, shape, func, func_id, type, name, id,
                 continue
 
             input_name = name
-            dynamic_axes = partition_cfg.get('dynamic_axes', None)
-            if dynamic_axes is not None:
-                input_name = name
-            calib_file = rewriter.calib_file
-
-            calib_data_group = calib_file['calib_data']
             partition_name = f'partition{partition_id}'
-
-            if partition_name not in calib_data_group:
-                calib_data_group.create_group(partition_name)
-            partition_group = calib_data_group[partition_name]
-
-            if input_name not in partition_group:
-                partition_group.create_group(input_name)
-            input_data_group = partition_group[input_name]
-
-            data_id = rewriter.data_id
-            x_np = x.detach().cpu().numpy()
-            input_data_group.create_dataset(
-                str(data_id),
-                shape=x_np.shape,
-                compression='gzip',
-                compression_opts=4,
-                data=x_np)
+            rewriter.calib_writer.write(
+                f'calib_data/{partition_name}/{input_name}',
+                str(rewriter.data_id), x)
 
     return rewriter.origin_func(ctx, x, dtype, shape, func, func_id, type,
                                 name, id, attrs)
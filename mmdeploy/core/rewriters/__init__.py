@@ -1,6 +1,7 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 from .rewriter_manager import (FUNCTION_REWRITER, MODULE_REWRITER,
                                SYMBOLIC_REWRITER, RewriterContext, patch_model)
+from .rewriter_profiler import RewriterProfiler
 
 __all__ = [
     'FUNCTION_REWRITER',
@@ -8,4 +9,5 @@ __all__ = [
     'MODULE_REWRITER',
     'patch_model',
     'SYMBOLIC_REWRITER',
+    'RewriterProfiler',
 ]
@@ -1,13 +1,16 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import gc
+import sys
 import types
 from collections import defaultdict
-from typing import (Any, Callable, Dict, List, MutableSequence, Optional,
-                    Tuple, Union)
+from typing import (Any, Callable, Dict, Hashable, List, MutableSequence,
+                    Optional, Sequence, Set, Tuple, Union)
 
 from mmdeploy.utils import IR, Backend, get_root_logger
-from .rewriter_utils import (Checker, ContextCaller, RewriterRegistry,
-                             copy_function, get_frame_func, get_func_qualname,
-                             import_function)
+from .rewriter_profiler import RewriterProfiler
+from .rewriter_utils import (Checker, ContextCaller, LazyEnv, RewriterRegistry,
+                             copy_function, eval_with_import, get_frame_func,
+                             get_func_qualname, import_function)
 
 try:
     try:
@@ -33,7 +36,6 @@ def _replace_all_obj(obj: Any,
         ignore_refs (Tuple[Any]): These refs will be ignored.
         ignore_keys (Tuple[str]): object with these keys will be ignored.
     """
-    import gc
     refs = gc.get_referrers(obj)
     obj_id = id(obj)
     for ref in refs:
@@ -89,6 +91,72 @@ def _set_func(origin_func_path: str,
     exec(f'{origin_func_path} = rewrite_func')
 
 
+def _get_module_dict_ids() -> Set[int]:
+    """Get the ids of the `__dict__` of the imported modules."""
+    return set(
+        id(module.__dict__) for module in list(sys.modules.values())
+        if isinstance(module, types.ModuleType))
+
+
+def _find_reference_sites(
+    objs: Sequence[Any],
+    module_dict_ids: Set[int],
+    in_modules: bool,
+    ignore_keys: Tuple[str] = ('origin_func', )
+) -> List[Tuple[Tuple[Any, Hashable], ...]]:
+    """Find the lists and dicts that refer to the objects, i.e. the sites
+    that `_replace_all_obj` would replace, with one scan of the referrers.
+
+    Args:
+        objs (Sequence[Any]): The objects to find.
+        module_dict_ids (Set[int]): The ids of the `__dict__` of the modules.
+        in_modules (bool): Whether to find the sites in the `__dict__` of
+            the modules, or the sites in the other containers.
+        ignore_keys (Tuple[str]): object with these keys will be ignored.
+
+    Returns:
+        List[Tuple[Tuple[Any, Hashable], ...]]: The containers and the
+            indices or keys of each object in them.
+    """
+    if len(objs) == 0:
+        return []
+    obj_indices = defaultdict(list)
+    for i, obj in enumerate(objs):
+        obj_indices[id(obj)].append(i)
+    sites = [[] for _ in objs]
+    for ref in gc.get_referrers(*objs):
+        if ref is objs or (id(ref) in module_dict_ids) != in_modules:
+            continue
+        if isinstance(ref, MutableSequence):
+            items = enumerate(ref)
+        elif isinstance(ref, Dict):
+            items = ((k, v) for k, v in ref.items() if k not in ignore_keys)
+        else:
+            continue
+        for key, value in items:
+            for i in obj_indices.get(id(value), []):
+                sites[i].append((ref, key))
+    return [tuple(_) for _ in sites]
+
+
+def _replace_in_sites(sites: Tuple[Tuple[Any, Hashable], ...], obj: Any,
+                      new_obj: Any):
+    """Replace an object with new_obj in the sites that still refer to it.
+
+    Args:
+        sites (Tuple[Tuple[Any, Hashable], ...]): The containers and the
+            indices or keys.
+        obj (Any): The object to be replaced.
+        new_obj (Any): The object to replace obj.
+    """
+    for container, key in sites:
+        try:
+            if container[key] is obj:
+                container[key] = new_obj
+        except (IndexError, KeyError):
+            continue
+
+
 def _del_func(path: str):
     """Delete a function that is denoted by a path.
 
@@ -124,6 +192,84 @@ def _fx_wrap_copied_fn(func: types.FunctionType,
         _wrapped_fns_to_patch.append((copied_func.__globals__, fn_name))
 
 
+class _RewriteTarget:
+    """A function to rewrite, resolved from its path.
+
+    Attributes are stored in slots so the target is not a referrer dict of
+    the origin function. Only the sites in the `__dict__` of the modules are
+    cached, which stay valid as long as no module is imported.
+    """
+    __slots__ = ('func_path', 'record', 'origin_func', 'owner', 'name',
+                 'is_addition', 'module_sites')
+
+    def __init__(self, func_path: str, record: Dict, origin_func: Callable,
+                 owner: Any, is_addition: bool):
+        self.func_path = func_path
+        self.record = record
+        self.origin_func = origin_func
+        self.owner = owner
+        self.name = func_path.split('.')[-1]
+        self.is_addition = is_addition
+        self.module_sites = tuple()
+
+    @property
+    def replaces_references(self) -> bool:
+        """Whether the references of the origin function are replaced. The
+        references of a method are not replaced, see `_set_func`."""
+        return not isinstance(self.owner, type)
+
+    def is_valid(self) -> bool:
+        """Check if the origin function is still at its path."""
+        return getattr(self.owner, self.name, None) == self.origin_func
+
+
+class _RewritePlan:
+    """The resolved targets of the valid rewriters in an environment.
+
+    Args:
+        targets (Tuple[_RewriteTarget]): The targets to rewrite.
+        registry_version (int): The version of the registry the plan is
+            compiled from.
+    """
+    __slots__ = ('targets', 'registry_version', 'num_modules',
+                 'module_dict_ids')
+
+    def __init__(self, targets: Tuple[_RewriteTarget], registry_version: int):
+        self.targets = targets
+        self.registry_version = registry_version
+        # New modules might refer to the origin functions.
+        self.num_modules = len(sys.modules)
+        self.module_dict_ids = _get_module_dict_ids()
+        scan_targets = [
+            target for target in targets if target.replaces_references
+        ]
+        origin_funcs = [target.origin_func for target in scan_targets]
+        for target, sites in zip(
+                scan_targets,
+                _find_reference_sites(
+                    origin_funcs, self.module_dict_ids, in_modules=True)):
+            target.module_sites = sites
+
+    def is_valid(self, registry_version: int) -> bool:
+        """Check if the plan can be applied again."""
+        return self.registry_version == registry_version and \
+            self.num_modules == len(sys.modules) and \
+            all(target.is_valid() for target in self.targets)
+
+
+def _get_env_key(env: Dict) -> Optional[Tuple]:
+    """Get the hashable key of an environment, or None if it has none."""
+    if isinstance(env, LazyEnv):
+        key = env.static_items()
+    else:
+        key = tuple(sorted(env.items()))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
 class FunctionRewriter:
     """A function rewriter which maintains rewritten functions.
 
@@ -148,6 +294,7 @@ class FunctionRewriter:
     def __init__(self):
         self._registry = RewriterRegistry()
         self._func_contexts = defaultdict(list)
+        self._plans = dict()
 
     def register_rewriter(
             self,
@@ -172,22 +319,26 @@ class FunctionRewriter:
         return self._registry.register_object(func_name, backend, ir,
                                               extra_checkers, **kwargs)
 
-    def enter(self, cfg: Dict = dict(), env: Dict = dict(), **kwargs):
-        """The implementation of function rewrite."""
-        self._func_contexts.clear()
+    def _compile_plan(self, env: Dict) -> _RewritePlan:
+        """Resolve the functions to rewrite in the environment.
+
+        Args:
+            env (Dict): The backend, IR info and version info.
+
+        Returns:
+            _RewritePlan: The plan with the origin functions and the sites
+                that refer to them.
+        """
         # Get current records
         functions_records = self._registry.get_records(env)
-        # Get current fx wrapped func nums
-        self._ori_fx_wrap_num = len(_wrapped_fns_to_patch)
-
-        self._origin_functions = list()
-        self._additional_functions = list()
-        new_functions = list()
+        targets = []
         for function_path, record_dict in functions_records:
 
             # Check if the origin function exists
             try:
                 origin_func, origin_class = import_function(function_path)
+                owner = eval_with_import('.'.join(
+                    function_path.split('.')[:-1]))
             except Exception:
                 origin_func = None
                 logger = get_root_logger()
@@ -209,40 +360,106 @@ class FunctionRewriter:
                         # class.
                         is_addition_function = True
 
-                if is_addition_function:
-                    self._additional_functions.append(function_path)
-
-                # Save origin function
-                self._origin_functions.append(
-                    dict(func_path=function_path, origin_func=origin_func))
-
-                # Create context_caller
-                rewrite_function = record_dict['_object']
-                # The func before and after copy has different globals
-                rewrite_function = copy_function(rewrite_function)
-                extra_kwargs = kwargs.copy()
-                extra_kwargs.update(record_dict)
-                context_caller = ContextCaller(rewrite_function, origin_func,
-                                               cfg, **extra_kwargs)
-                # If there is a function wrapped by torch.fx.wrap in
-                # rewrite_function's globals, we need to wrap the same name
-                # function in copied function's globals.
-                _fx_wrap_copied_fn(record_dict['_object'], context_caller.func)
-
-                qualname = get_func_qualname(rewrite_function)
-                self._func_contexts[qualname].append(context_caller)
-                self._func_contexts[function_path].append(context_caller)
-
-                # Cache new the function to avoid homonymic bug
-                new_functions.append(
-                    dict(
-                        func_path=function_path, origin_func=rewrite_function))
-
-        for func_dict in new_functions:
-            function_path = func_dict['func_path']
-            new_function = func_dict['origin_func']
+                targets.append(
+                    _RewriteTarget(function_path, record_dict, origin_func,
+                                   owner, is_addition_function))
+        return _RewritePlan(tuple(targets), self._registry.version)
+
+    def _get_plan(self, env: Dict) -> _RewritePlan:
+        """Get the cached plan of the environment or compile a new one."""
+        key = _get_env_key(env)
+        plan = self._plans.get(key, None)
+        if plan is None or not plan.is_valid(self._registry.version):
+            plan = self._compile_plan(env)
+            if key is not None:
+                self._plans[key] = plan
+        return plan
+
+    def enter(self,
+              cfg: Dict = dict(),
+              env: Dict = dict(),
+              profiler: Optional[RewriterProfiler] = None,
+              **kwargs):
+        """The implementation of function rewrite.
+
+        The resolved functions and the sites in the modules referring to
+        them are cached for each environment, so entering the same
+        environment again does not import them again. The other lists and
+        dicts referring to them might be created later, and are found with
+        one scan of the referrers of all the functions.
+        """
+        self._func_contexts.clear()
+        plan = self._get_plan(env)
+        if profiler is not None:
+            profiler.add_registry('function', self._registry, env)
+        # Get current fx wrapped func nums
+        self._ori_fx_wrap_num = len(_wrapped_fns_to_patch)
+        self._num_modules = len(sys.modules)
+
+        self._origin_functions = list()
+        self._additional_functions = list()
+        self._rewritten_targets = list()
+        for target in plan.targets:
+            function_path = target.func_path
+            record_dict = target.record
+            origin_func = target.origin_func
+
+            if target.is_addition:
+                self._additional_functions.append(function_path)
+
+            # Save origin function
+            self._origin_functions.append(
+                dict(func_path=function_path, origin_func=origin_func))
+
+            # Create context_caller
+            rewrite_function = record_dict['_object']
+            # The func before and after copy has different globals
+            rewrite_function = copy_function(rewrite_function)
+            extra_kwargs = kwargs.copy()
+            extra_kwargs.update(record_dict)
+            context_caller = ContextCaller(rewrite_function, origin_func, cfg,
+                                           **extra_kwargs)
+            new_function = rewrite_function
+            if profiler is not None:
+                context_caller.origin_func = profiler.wrap(
+                    'function',
+                    function_path,
+                    record_dict,
+                    origin_func,
+                    origin=True)
+                new_function = profiler.wrap('function', function_path,
+                                             record_dict, rewrite_function)
+            # If there is a function wrapped by torch.fx.wrap in
+            # rewrite_function's globals, we need to wrap the same name
+            # function in copied function's globals.
+            _fx_wrap_copied_fn(record_dict['_object'], context_caller.func)
+
+            qualname = get_func_qualname(rewrite_function)
+            self._func_contexts[qualname].append(context_caller)
+            self._func_contexts[function_path].append(context_caller)
+
+            # Cache new the function to avoid homonymic bug
+            self._rewritten_targets.append((target, new_function))
+
+        scan_targets = [
+            target for target, _ in self._rewritten_targets
+            if target.replaces_references
+        ]
+        origin_funcs = [target.origin_func for target in scan_targets]
+        other_sites = dict(
+            zip(
+                map(id, scan_targets),
+                _find_reference_sites(
+                    origin_funcs, plan.module_dict_ids, in_modules=False)))
+        self._rewritten_targets = [
+            (target, new_function,
+             target.module_sites + other_sites.get(id(target), tuple()))
+            for target, new_function in self._rewritten_targets
+        ]
+        for target, new_function, sites in self._rewritten_targets:
             # Rewrite functions
-            _set_func(function_path, new_function)
+            _replace_in_sites(sites, target.origin_func, new_function)
+            setattr(target.owner, target.name, new_function)
 
     def exit(self):
         """Recover the function rewrite."""
@@ -251,13 +468,24 @@ class FunctionRewriter:
         for _ in range(cur_fx_wrap_num - self._ori_fx_wrap_num):
             _wrapped_fns_to_patch.pop(-1)
 
-        for func_dict in self._origin_functions:
-            func_path = func_dict['func_path']
-            func = func_dict['origin_func']
-            _set_func(func_path, func)
-        for func_path in self._additional_functions:
-            _del_func(func_path)
-
+        if len(sys.modules) != self._num_modules:
+            # The modules imported in the context might refer to the
+            # rewritten functions, scan all references.
+            for func_dict in self._origin_functions:
+                func_path = func_dict['func_path']
+                func = func_dict['origin_func']
+                _set_func(func_path, func)
+            for func_path in self._additional_functions:
+                _del_func(func_path)
+        else:
+            for target, new_function, sites in self._rewritten_targets:
+                _replace_in_sites(sites, new_function, target.origin_func)
+                setattr(target.owner, target.name, target.origin_func)
+            for target, _, _ in self._rewritten_targets:
+                if target.is_addition:
+                    delattr(target.owner, target.name)
+
+        self._rewritten_targets = list()
         self._func_contexts.clear()
 
     def get_context(self, key: Optional[str] = None) -> ContextCaller:
@@ -6,6 +6,7 @@ import mmengine
 from torch import nn
 
 from mmdeploy.utils.constants import IR, Backend
+from .rewriter_profiler import RewriterProfiler
 from .rewriter_utils import (Checker, RewriterRegistry, collect_env,
                              eval_with_import)
 
@@ -27,6 +28,7 @@ class ModuleRewriter:
 
     def __init__(self):
         self._registry = RewriterRegistry()
+        self._profiler = None
 
     def register_rewrite_module(
             self,
@@ -56,6 +58,7 @@ class ModuleRewriter:
                     backend: str = Backend.DEFAULT.value,
                     ir: IR = IR.DEFAULT,
                     recursive: bool = True,
+                    profiler: Optional[RewriterProfiler] = None,
                     **kwargs) -> nn.Module:
         """Replace the models that was registered.
 
@@ -65,6 +68,8 @@ class ModuleRewriter:
             backend (str): The inference engine name.
             ir (IR): The intermeditate representation name.
             recursive (bool): The flag to enable recursive patching.
+            profiler (RewriterProfiler | None): The profiler to record the
+                replaced modules and their forward time. Defaults to `None`.
 
         Returns:
             nn.Module: THe patched model.
@@ -77,7 +82,13 @@ class ModuleRewriter:
         # TODO: Make the type of parameter backend to Backend
         env = collect_env(Backend.get(backend), ir)
         self._collect_record(env)
-        return self._replace_module(model, cfg, recursive, **kwargs)
+        self._profiler = profiler
+        if profiler is not None:
+            profiler.add_registry('module', self._registry, env)
+        try:
+            return self._replace_module(model, cfg, recursive, **kwargs)
+        finally:
+            self._profiler = None
 
     def _replace_one_module(self, module, cfg, **kwargs):
         """Build a rewritten model."""
@@ -113,7 +124,11 @@ class ModuleRewriter:
         for k in redundant_key_name:
             input_args.pop(k)
 
-        return module_class(module, cfg, **input_args)
+        new_module = module_class(module, cfg, **input_args)
+        if self._profiler is not None:
+            self._profiler.add_instance(object_dict['_name'], object_dict,
+                                        new_module)
+        return new_module
 
     def _replace_module(self, model: nn.Module, cfg: mmengine.Config,
                         recursive: bool, **kwargs):
@@ -140,4 +155,4 @@ class ModuleRewriter:
         records = self._registry.get_records(env)
         for name, kwargs in records:
             self._cls_set.add(kwargs['_object'])
-            self._records[eval_with_import(name)] = kwargs
+            self._records[eval_with_import(name)] = dict(kwargs, _name=name)
@@ -1,5 +1,5 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-from typing import Dict
+from typing import Dict, Optional
 
 import mmengine
 import torch.nn as nn
@@ -7,6 +7,7 @@ import torch.nn as nn
 from mmdeploy.utils.constants import IR, Backend
 from .function_rewriter import FunctionRewriter
 from .module_rewriter import ModuleRewriter
+from .rewriter_profiler import RewriterProfiler
 from .rewriter_utils import collect_env
 from .symbolic_rewriter import SymbolicRewriter
 
@@ -32,6 +33,7 @@ def patch_model(model: nn.Module,
                 backend: str = Backend.DEFAULT.value,
                 ir: IR = IR.DEFAULT,
                 recursive: bool = True,
+                profiler: Optional[RewriterProfiler] = None,
                 **kwargs) -> nn.Module:
     """Patch the model, replace the modules that can be rewritten. Note that
     the original model will be modified permanently.
@@ -42,6 +44,8 @@ def patch_model(model: nn.Module,
         backend (str): The inference engine name.
         ir (IR): The intermeditate representation name.
         recursive (bool): The flag to enable recursive patching.
+        profiler (RewriterProfiler | None): The profiler to record the
+            replaced modules and their forward time. Defaults to `None`.
 
     Returns:
         nn.Module: THe patched model.
@@ -55,7 +59,7 @@ def patch_model(model: nn.Module,
         >>> patched_model = patch_model(model, deploy_cfg, backend, ir)
     """
     return MODULE_REWRITER.patch_model(model, cfg, backend, ir, recursive,
-                                       **kwargs)
+                                       profiler, **kwargs)
 
 
 class RewriterContext:
@@ -69,6 +73,9 @@ class RewriterContext:
         ir (IR): The intermeditate representation name.
         rewrite_manager (RewriterManager): An RewriteManager that consists of
             several rewriters
+        profiler (RewriterProfiler | None): The profiler to record the calls
+            and time of the function and symbolic rewriters. Defaults to
+            `None`.
 
     Examples:
         >>> from mmdeploy.core import RewriterContext
@@ -82,18 +89,20 @@ class RewriterContext:
                  backend: str = Backend.DEFAULT.value,
                  ir: IR = IR.DEFAULT,
                  rewriter_manager: RewriterManager = REWRITER_MANAGER,
+                 profiler: Optional[RewriterProfiler] = None,
                  **kwargs):
         self._cfg = cfg
         self._kwargs = kwargs
+        self._profiler = profiler
         self._rewriter_manager = rewriter_manager
         self._env = collect_env(Backend.get(backend), ir)
 
     def enter(self):
         """Call the enter() of rewriters."""
-        self._rewriter_manager.function_rewriter.enter(self._cfg, self._env,
-                                                       **self._kwargs)
-        self._rewriter_manager.symbolic_rewriter.enter(self._cfg, self._env,
-                                                       **self._kwargs)
+        self._rewriter_manager.function_rewriter.enter(
+            self._cfg, self._env, profiler=self._profiler, **self._kwargs)
+        self._rewriter_manager.symbolic_rewriter.enter(
+            self._cfg, self._env, profiler=self._profiler, **self._kwargs)
 
     def exit(self):
         """Call the exit() of rewriters."""
@@ -0,0 +1,177 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import functools
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+from mmdeploy.utils.constants import IR, Backend
+from .rewriter_utils import (BackendChecker, IRChecker, RewriterRegistry,
+                             get_func_qualname)
+
+
+class RewriterProfiler:
+    """Profile the activations of the function, module and symbolic
+    rewriters.
+
+    Pass a profiler to `patch_model` and `RewriterContext` to record how
+    often each rewriter is invoked and how much time is spent in it. For a
+    function rewriter, the time spent in `ctx.origin_func` is recorded
+    separately, so `self_ms` is the time added by the rewrite itself. The
+    report also lists the rewriters that are registered but not active in
+    the environment, or active but never invoked.
+
+    Examples:
+        >>> from mmdeploy.core import (RewriterContext, RewriterProfiler,
+        >>>                            patch_model)
+        >>> profiler = RewriterProfiler()
+        >>> model = patch_model(model, cfg, backend, profiler=profiler)
+        >>> with RewriterContext(cfg, backend, profiler=profiler):
+        >>>     torch.onnx.export(model, inputs, onnx_file)
+        >>> profiler.dump('rewriters.json')
+    """
+
+    def __init__(self):
+        self._stats = OrderedDict()
+        self._registries = OrderedDict()
+
+    def add_registry(self, kind: str, registry: RewriterRegistry, env: Dict):
+        """Add a registry whose records are active in the environment.
+
+        Args:
+            kind (str): The kind of the rewriters, `function`, `module` or
+                `symbolic`.
+            registry (RewriterRegistry): The registry of the rewriters.
+            env (Dict): The backend, IR info and version info.
+        """
+        self._registries.setdefault(kind, (registry, []))[1].append(env)
+
+    def _get_stats(self, kind: str, name: str, record: Dict) -> Dict:
+        """Get the statistics of a rewriter record."""
+        key = (kind, name, id(record['_object']))
+        if key not in self._stats:
+            self._stats[key] = dict(
+                calls=0,
+                total_time=0.,
+                origin_calls=0,
+                origin_time=0.,
+                instances=0)
+        return self._stats[key]
+
+    def wrap(self,
+             kind: str,
+             name: str,
+             record: Dict,
+             func: Callable,
+             origin: bool = False) -> Callable:
+        """Wrap a rewritten function to count its calls and time.
+
+        Args:
+            kind (str): The kind of the rewriter.
+            name (str): The name of the rewritten function or module.
+            record (Dict): The record of the rewriter.
+            func (Callable): The function to wrap.
+            origin (bool): Whether `func` is the origin function called by
+                the rewriter. Defaults to `False`.
+
+        Returns:
+            Callable: The wrapped function.
+        """
+        stats = self._get_stats(kind, name, record)
+        if origin:
+            calls_key, time_key = 'origin_calls', 'origin_time'
+        else:
+            calls_key, time_key = 'calls', 'total_time'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stats[calls_key] += 1
+                stats[time_key] += time.perf_counter() - start
+
+        return wrapper
+
+    def add_instance(self, name: str, record: Dict, module: Any):
+        """Record a module replaced by a module rewriter and wrap its forward.
+
+        Args:
+            name (str): The name of the rewritten module type.
+            record (Dict): The record of the rewriter.
+            module (Any): The rewritten module.
+        """
+        self._get_stats('module', name, record)['instances'] += 1
+        module.forward = self.wrap('module', name, record, module.forward)
+
+    def report(self) -> Dict:
+        """Get the report of the rewriters.
+
+        Returns:
+            Dict: The `summary` with the numbers of registered, active and
+                invoked rewriters, the `rewriters` with the statistics of each
+                rewriter sorted by the time, and the `never_hit` active
+                rewriters.
+        """
+        rewriters = []
+        for kind, (registry, envs) in self._registries.items():
+            active = set()
+            for env in envs:
+                for name, record in registry.get_records(env):
+                    active.add((name, id(record['_object'])))
+            for name, records in registry._rewrite_records.items():
+                for record in records:
+                    stats = self._get_stats(kind, name, record)
+                    backend, ir = Backend.DEFAULT.value, IR.DEFAULT.value
+                    for checker in record['_checkers']:
+                        if isinstance(checker, BackendChecker):
+                            backend = checker.required_backend.value
+                        elif isinstance(checker, IRChecker):
+                            ir = checker.required_ir.value
+                    total_ms = stats['total_time'] * 1000
+                    origin_ms = stats['origin_time'] * 1000
+                    entry = OrderedDict(
+                        kind=kind,
+                        name=name,
+                        rewriter=get_func_qualname(record['_object']),
+                        backend=backend,
+                        ir=ir,
+                        active=(name, id(record['_object'])) in active,
+                        calls=stats['calls'],
+                        total_ms=total_ms,
+                        origin_calls=stats['origin_calls'],
+                        origin_ms=origin_ms,
+                        self_ms=total_ms - origin_ms)
+                    if kind == 'module':
+                        entry['instances'] = stats['instances']
+                    rewriters.append(entry)
+        rewriters.sort(key=lambda entry: entry['total_ms'], reverse=True)
+
+        def _is_hit(entry):
+            return entry['calls'] > 0 or entry.get('instances', 0) > 0
+
+        never_hit = [
+            f'{entry["kind"]}:{entry["name"]}' for entry in rewriters
+            if entry['active'] and not _is_hit(entry)
+        ]
+        summary = OrderedDict(
+            registered=len(rewriters),
+            active=sum(entry['active'] for entry in rewriters),
+            hit=sum(_is_hit(entry) for entry in rewriters))
+        return OrderedDict(
+            summary=summary, rewriters=rewriters, never_hit=never_hit)
+
+    def dump(self, file: str) -> Dict:
+        """Dump the report to a json file.
+
+        Args:
+            file (str): The json file to save the report.
+
+        Returns:
+            Dict: The report.
+        """
+        report = self.report()
+        with open(file, 'w') as f:
+            json.dump(report, f, indent=4)
+        return report
@@ -62,10 +62,99 @@ def import_function(path: str) -> Tuple[Callable, Optional[type]]:
         return obj, None
 
 
+class LazyEnv(dict):
+    """The environment dict which probes the versions of libraries lazily.
+
+    The version of a codebase or backend library is only looked up when it
+    is accessed, e.g. by a `LibVersionChecker`, so creating the environment
+    does not import or scan any library. Iterating or comparing the dict
+    probes all of them.
+
+    Args:
+        libs (List[str]): The libraries to probe the versions of.
+    """
+
+    def __init__(self, libs: List[str], *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending_libs = [
+            lib for lib in libs if not dict.__contains__(self, lib)
+        ]
+        self._static_keys = tuple(dict.keys(self))
+
+    def static_items(self) -> Tuple[Tuple[str, Any], ...]:
+        """Get the items given on creation, without probing the libraries.
+
+        The probed versions are constant in a process, so the static items
+        identify the environment.
+
+        Returns:
+            Tuple[Tuple[str, Any], ...]: The sorted key-value pairs.
+        """
+        return tuple(sorted((key, self[key]) for key in self._static_keys))
+
+    def __missing__(self, key: str) -> Optional[str]:
+        if key not in self._pending_libs:
+            raise KeyError(key)
+        from mmdeploy.utils import get_library_version
+        self._pending_libs.remove(key)
+        version = get_library_version(key)
+        self[key] = version
+        return version
+
+    def __contains__(self, key: Any) -> bool:
+        return super().__contains__(key) or key in self._pending_libs
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self[key] if key in self else default
+
+    def probe_all(self):
+        """Probe the versions of all pending libraries."""
+        for lib in list(self._pending_libs):
+            self[lib]
+
+    def __iter__(self):
+        self.probe_all()
+        return super().__iter__()
+
+    def __len__(self) -> int:
+        return super().__len__() + len(self._pending_libs)
+
+    def __eq__(self, other: Any) -> bool:
+        self.probe_all()
+        if isinstance(other, LazyEnv):
+            other.probe_all()
+        return super().__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        self.probe_all()
+        return super().__repr__()
+
+    def keys(self):
+        self.probe_all()
+        return super().keys()
+
+    def values(self):
+        self.probe_all()
+        return super().values()
+
+    def items(self):
+        self.probe_all()
+        return super().items()
+
+    def copy(self) -> Dict:
+        self.probe_all()
+        return dict(super().items())
+
+
 def collect_env(backend: Backend, ir: IR, **kwargs) -> Dict:
     """Collect current environment information, including backend, ir, codebase
     version, etc. Rewriters will be checked according to env infos.
 
+    The versions of the codebases and backends are probed lazily from the
+    package metadata, see `LazyEnv`.
+
     Args:
         backend (Backend): Current backend.
         ir (IR): Current IR.
@@ -74,13 +163,13 @@ def collect_env(backend: Backend, ir: IR, **kwargs) -> Dict:
         Dict: Record the value of Backend and IR as well as the versions of
         libraries.
     """
-    from mmdeploy.utils import get_backend_version, get_codebase_version
+    from mmdeploy.utils import Codebase
+    from mmdeploy.utils.env import BACKEND_LIBRARIES
+    libs = BACKEND_LIBRARIES + [codebase.value for codebase in Codebase]
     env = dict(backend=backend, ir=ir)
     env['mmdeploy'] = mmdeploy.__version__
-    env.update(get_backend_version())
-    env.update(get_codebase_version())
     env.update(kwargs)
-    return env
+    return LazyEnv(libs, env)
 
 
 class Checker(metaclass=ABCMeta):
@@ -193,6 +282,8 @@ class RewriterRegistry:
     Members:
         _rewrite_records (Dict[Backend, Dict[str, Dict]]): A data structure
             which records the register message in a specific backend.
+        version (int): The number of modifications of the records, used to
+            invalidate the results cached from the records.
 
     Example:
         >>> FUNCTION_REGISTRY = RewriterRegistry()
@@ -204,6 +295,7 @@ class RewriterRegistry:
 
     def __init__(self):
         self._rewrite_records = dict()
+        self.version = 0
 
     def get_records(self, env: Dict) -> List:
         """Get all registered records that are valid in the given environment
@@ -293,6 +385,7 @@ class RewriterRegistry:
         if name not in self._rewrite_records:
             self._rewrite_records[name] = list()
         self._rewrite_records[name].append(record_dict)
+        self.version += 1
 
     def register_object(self,
                         name: str,
@@ -350,6 +443,7 @@ class RewriterRegistry:
             records.remove(rec)
             if len(records) == 0:
                 self._rewrite_records.pop(key)
+        self.version += 1
 
 
 class ContextCaller:
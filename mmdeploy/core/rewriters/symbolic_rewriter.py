@@ -7,6 +7,7 @@ from torch.autograd import Function
 from torch.onnx.symbolic_helper import parse_args
 
 from mmdeploy.utils import IR, Backend, get_root_logger
+from .rewriter_profiler import RewriterProfiler
 from .rewriter_utils import (Checker, ContextCaller, RewriterRegistry,
                              copy_function, eval_with_import, get_frame_func,
                              get_func_qualname)
@@ -76,10 +77,13 @@ class SymbolicRewriter:
               cfg: Dict = dict(),
               env: Dict = dict(),
               opset: int = 11,
+              profiler: Optional[RewriterProfiler] = None,
               **kwargs):
         """The implementation of symbolic register."""
         # clear context
         self._func_contexts.clear()
+        if profiler is not None:
+            profiler.add_registry('symbolic', self._registry, env)
 
         # Get current records
         symbolic_records = self._registry.get_records(env)
@@ -102,6 +106,11 @@ class SymbolicRewriter:
             self._func_contexts[qualname].append(context_caller)
             self._func_contexts[function_name].append(context_caller)
 
+            if profiler is not None:
+                symbolic_function = profiler.wrap('symbolic', function_name,
+                                                  record_dict,
+                                                  symbolic_function)
+
             if arg_descriptors is not None and len(arg_descriptors) > 0:
                 symbolic_function = parse_args(*arg_descriptors)(
                     symbolic_function)
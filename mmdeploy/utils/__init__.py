@@ -4,13 +4,13 @@ import importlib
 from .constants import IR, SDK_TASK_MAP, Backend, Codebase, Task
 from .device import parse_cuda_device_id, parse_device_id, parse_device_type
 from .env import get_backend_version, get_codebase_version, get_library_version
-from .utils import get_file_path, get_root_logger, target_wrapper
+from .utils import LRUCache, get_file_path, get_root_logger, target_wrapper
 
 __all__ = [
     'SDK_TASK_MAP', 'IR', 'Backend', 'Codebase', 'Task',
     'parse_cuda_device_id', 'get_library_version', 'get_codebase_version',
     'get_backend_version', 'parse_device_id', 'get_file_path',
-    'get_root_logger', 'target_wrapper', 'parse_device_type'
+    'get_root_logger', 'target_wrapper', 'parse_device_type', 'LRUCache'
 ]
 
 if importlib.util.find_spec('mmcv') is not None:
@@ -20,12 +20,12 @@ if importlib.util.find_spec('mmcv') is not None:
                                get_calib_filename, get_codebase,
                                get_codebase_config, get_common_config,
                                get_dynamic_axes, get_input_shape,
-                               get_ir_config, get_model_inputs,
-                               get_normalization, get_onnx_config,
-                               get_partition_config, get_precision,
-                               get_quantization_config, get_rknn_quantization,
-                               get_task_type, is_dynamic_batch,
-                               is_dynamic_shape, load_config)
+                               get_input_shape_profiles, get_ir_config,
+                               get_model_inputs, get_normalization,
+                               get_onnx_config, get_partition_config,
+                               get_precision, get_quantization_config,
+                               get_rknn_quantization, get_task_type,
+                               is_dynamic_batch, is_dynamic_shape, load_config)
 
     # yapf: enable
 
@@ -37,5 +37,5 @@ if importlib.util.find_spec('mmcv') is not None:
         'get_onnx_config', 'get_partition_config', 'get_quantization_config',
         'get_precision', 'get_task_type', 'is_dynamic_batch',
         'is_dynamic_shape', 'load_config', 'get_rknn_quantization',
-        'get_normalization'
+        'get_normalization', 'get_input_shape_profiles'
     ]
@@ -385,6 +385,33 @@ def get_model_inputs(deploy_cfg: Union[str, mmengine.Config]) -> List[Dict]:
     return model_params
 
 
+def get_input_shape_profiles(input_shapes: Union[Dict, List],
+                             input_names: List[str]) -> Union[Dict, List]:
+    """Normalize the `input_shapes` of the model inputs.
+
+    The shapes are given as a dict mapping the input names to shapes, a list
+    of the shapes of the inputs in order, or a list of several optimization
+    profiles, each of them maps the input names to shapes or lists the shapes
+    in order.
+
+    Args:
+        input_shapes (Dict | List): The `input_shapes` of the model inputs.
+        input_names (List[str]): The names of the inputs.
+
+    Returns:
+        Dict | List[Dict]: A dict mapping the input names to shapes, or a
+            list of such dicts for several profiles.
+    """
+    if isinstance(input_shapes, Dict):
+        return input_shapes
+    if all('min_shape' in shapes for shapes in input_shapes):
+        return dict(zip(input_names, input_shapes))
+    return [
+        shapes if isinstance(shapes, Dict) else dict(zip(input_names, shapes))
+        for shapes in input_shapes
+    ]
+
+
 def get_dynamic_axes(
     deploy_cfg: Union[str, mmengine.Config],
     axes_names: List[str] = None
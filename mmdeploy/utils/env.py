@@ -1,18 +1,78 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import importlib
+import importlib.util
+from functools import lru_cache
+from typing import Dict, List, Optional
 
 from mmdeploy.utils import Codebase
 
+try:
+    from importlib import metadata as importlib_metadata
+except ImportError:  # python < 3.8
+    importlib_metadata = None
 
+BACKEND_LIBRARIES = ['tensorrt', 'onnxruntime', 'ncnn', 'tvm']
+
+
+@lru_cache()
+def _get_packages_distributions() -> Dict[str, List[str]]:
+    """Get the distributions that provide each top-level package.
+
+    Returns:
+        Dict[str, List[str]]: The distribution names of the packages, e.g.
+            `{'mmseg': ['mmsegmentation']}`.
+    """
+    if importlib_metadata is None or not hasattr(importlib_metadata,
+                                                 'packages_distributions'):
+        return dict()
+    return importlib_metadata.packages_distributions()
+
+
+def _get_metadata_version(lib: str) -> Optional[str]:
+    """Get the version of a library from the metadata of its distribution,
+    without importing it.
+
+    Args:
+        lib (str): The name of library.
+
+    Returns:
+        None | str: The version if the metadata is found.
+    """
+    if importlib_metadata is None:
+        return None
+    candidates = _get_packages_distributions().get(lib, []) + [lib]
+    for name in candidates:
+        try:
+            return importlib_metadata.version(name)
+        except Exception:
+            continue
+    return None
+
+
+@lru_cache(maxsize=None)
 def get_library_version(lib):
     """Try to get the version of a library if it has been installed.
 
+    The version is read from the package metadata, the library is only
+    imported if it is installed without metadata, e.g. built from source.
+    The result is memoized in the process.
+
     Args:
         lib (str): The name of library.
 
     Returns:
         None | str: If the library has been installed, return version.
     """
+    try:
+        if importlib.util.find_spec(lib) is None:
+            return None
+    except Exception:
+        return None
+
+    version = _get_metadata_version(lib)
+    if version is not None:
+        return version
+
     try:
         lib = importlib.import_module(lib)
         if hasattr(lib, '__version__'):
@@ -44,8 +104,7 @@ def get_backend_version():
     Returns:
         Dict: The name and the version of some supported backend.
     """
-    backend_library_list = ['tensorrt', 'onnxruntime', 'ncnn', 'tvm']
     version_dict = dict()
-    for backend in backend_library_list:
+    for backend in BACKEND_LIBRARIES:
         version_dict[backend] = get_library_version(backend)
     return version_dict
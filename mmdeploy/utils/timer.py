@@ -1,19 +1,119 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import csv
+import json
+import math
+import os
+import threading
 import time
 import warnings
 from contextlib import contextmanager
 from logging import Logger
-from typing import Optional
+from typing import Dict, List, Optional
 
-import numpy as np
 import torch
 
 from mmdeploy.utils.logging import get_logger
 
 
+class LatencyHistogram:
+    """Streaming statistics of latencies with bounded memory.
+
+    The latencies are counted in log-scaled buckets, so the memory does not
+    grow with the number of records and the relative error of percentiles is
+    bounded by `precision`.
+
+    Args:
+        precision (float): The relative width of a bucket. Defaults to 0.01.
+        min_value (float): The lower bound of the first bucket in seconds.
+            Defaults to 1e-7.
+    """
+    percentiles = (50, 90, 99, 99.9)
+
+    def __init__(self, precision: float = 0.01, min_value: float = 1e-7):
+        self._log_base = math.log1p(precision)
+        self._min_value = min_value
+        self._buckets = dict()
+        self.count = 0
+        self.total = 0.
+        self.min = math.inf
+        self.max = 0.
+
+    def add(self, value: float):
+        """Record a latency.
+
+        Args:
+            value (float): The latency in seconds.
+        """
+        index = int(
+            math.log(max(value, self._min_value) / self._min_value) /
+            self._log_base)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        """The mean latency in seconds."""
+        return self.total / self.count if self.count > 0 else math.nan
+
+    def percentile(self, q: float) -> float:
+        """Get a percentile of the latencies.
+
+        Args:
+            q (float): The percentile in range [0, 100].
+
+        Returns:
+            float: The latency in seconds.
+        """
+        if self.count == 0:
+            return math.nan
+        rank = min(max(math.ceil(q / 100 * self.count), 1), self.count)
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= rank:
+                value = self._min_value * math.exp(
+                    (index + 0.5) * self._log_base)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        """Summarize the latencies in milliseconds.
+
+        Returns:
+            Dict[str, float]: The count, mean, min, max and percentiles.
+        """
+        summary = dict(
+            count=self.count,
+            mean=1000 * self.mean,
+            min=1000 * self.min if self.count > 0 else math.nan,
+            max=1000 * self.max if self.count > 0 else math.nan)
+        for q in self.percentiles:
+            summary[f'p{q:g}'] = 1000 * self.percentile(q)
+        return summary
+
+
 class TimeCounter:
-    """A tool for counting inference time of backends."""
+    """A tool for counting inference time of backends.
+
+    Besides the functions registered with `count_time`, the stages of a
+    pipeline can be counted with nested `span`. The latencies are kept in
+    `LatencyHistogram`, and can be exported with `export_stats`. If the
+    counter is activated with `trace=True`, the calls are also recorded as
+    events of Chrome trace format and can be exported with `export_trace`.
+    """
     names = dict()
+    spans = dict()
+    trace_events = []
+    enable = False
+    trace = False
+    max_trace_events = 100000
+    span_warmup = 1
+    span_batch_size = 1
+    _local = threading.local()
+    _start_time = time.perf_counter()
 
     # Avoid instantiating every time
     @classmethod
@@ -40,7 +140,7 @@ class TimeCounter:
             # data does not interfere with each other
             cls.names[name] = dict(
                 count=0,
-                execute_time=[],
+                histogram=LatencyHistogram(),
                 log_interval=log_interval,
                 warmup=warmup,
                 with_sync=with_sync,
@@ -49,7 +149,7 @@ class TimeCounter:
 
             def fun(*args, **kwargs):
                 count = cls.names[name]['count']
-                execute_time = cls.names[name]['execute_time']
+                histogram = cls.names[name]['histogram']
                 log_interval = cls.names[name]['log_interval']
                 warmup = cls.names[name]['warmup']
                 with_sync = cls.names[name]['with_sync']
@@ -69,13 +169,15 @@ class TimeCounter:
                 if enable:
                     if with_sync and torch.cuda.is_available():
                         torch.cuda.synchronize()
-                    elapsed = (time.perf_counter() - start_time) / batch_size
+                    end_time = time.perf_counter()
+                    elapsed = (end_time - start_time) / batch_size
+                    cls._add_trace_event(name, start_time, end_time)
 
                 if enable and count > warmup:
-                    execute_time.append(elapsed)
+                    histogram.add(elapsed)
 
                     if (count - warmup) % log_interval == 0:
-                        times_per_count = 1000 * float(np.mean(execute_time))
+                        times_per_count = 1000 * histogram.mean
                         fps = 1000 / times_per_count
                         msg = f'[{name}]-{count} times per count: '\
                               f'{times_per_count:.2f} ms, '\
@@ -88,6 +190,75 @@ class TimeCounter:
 
         return _register
 
+    @classmethod
+    @contextmanager
+    def span(cls, name: str, with_sync: bool = False):
+        """Count the time of a stage in a pipeline.
+
+        Spans can be nested, a span is named by the path of the enclosing
+        spans, e.g. `pipeline/preprocess`. The time is only counted when the
+        counter is activated.
+
+        Args:
+            name (str): Name of the stage.
+            with_sync (bool): Whether use cuda synchronize for time counting,
+                default `False`.
+
+        Examples:
+            >>> with TimeCounter.activate(warmup=10):
+            >>>     for data in dataset:
+            >>>         with TimeCounter.span('pipeline'):
+            >>>             with TimeCounter.span('preprocess'):
+            >>>                 inputs = preprocess(data)
+            >>>             with TimeCounter.span('backend'):
+            >>>                 outputs = model(inputs)
+            >>> TimeCounter.print_stats('pipeline/backend')
+        """
+        stack = cls._span_stack()
+        stack.append(name)
+        path = '/'.join(stack)
+        enable = cls.enable
+        if enable:
+            if with_sync and torch.cuda.is_available():
+                torch.cuda.synchronize()
+            start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            stack.pop()
+            if enable:
+                if with_sync and torch.cuda.is_available():
+                    torch.cuda.synchronize()
+                end_time = time.perf_counter()
+                cls._add_trace_event(path, start_time, end_time)
+                stats = cls.spans.setdefault(
+                    path, dict(count=0, histogram=LatencyHistogram()))
+                stats['count'] += 1
+                if stats['count'] > cls.span_warmup:
+                    stats['histogram'].add(
+                        (end_time - start_time) / cls.span_batch_size)
+
+    @classmethod
+    def _span_stack(cls) -> List[str]:
+        """Get the span stack of the current thread."""
+        if not hasattr(cls._local, 'stack'):
+            cls._local.stack = []
+        return cls._local.stack
+
+    @classmethod
+    def _add_trace_event(cls, name: str, start_time: float, end_time: float):
+        """Record a complete event of Chrome trace format."""
+        if not cls.trace or len(cls.trace_events) >= cls.max_trace_events:
+            return
+        cls.trace_events.append(
+            dict(
+                name=name,
+                ph='X',
+                ts=(start_time - cls._start_time) * 1e6,
+                dur=(end_time - start_time) * 1e6,
+                pid=os.getpid(),
+                tid=threading.get_ident()))
+
     @classmethod
     @contextmanager
     def activate(cls,
@@ -98,6 +269,8 @@ class TimeCounter:
                  file: Optional[str] = None,
                  logger: Optional[Logger] = None,
                  batch_size: int = 1,
+                 trace: bool = False,
+                 max_trace_events: int = 100000,
                  **kwargs):
         """Activate the time counter.
 
@@ -112,6 +285,14 @@ class TimeCounter:
                 is `None`.
             logger (Logger): The logger for the timer. Default to None.
             batch_size (int): The batch size. Default to 1.
+            trace (bool): Whether to record the calls as Chrome trace events.
+                Default to False.
+            max_trace_events (int): Max number of recorded trace events.
+                Default to 100000.
+
+        Notes:
+            The statistics of the spans, the trace events and the statistics
+            of the activated functions are reset on activation.
         """
         assert warmup >= 1
         if logger is None:
@@ -127,6 +308,8 @@ class TimeCounter:
             cls.names[func_name]['with_sync'] = with_sync
             cls.names[func_name]['batch_size'] = batch_size
             cls.names[func_name]['enable'] = True
+            cls.names[func_name]['count'] = 0
+            cls.names[func_name]['histogram'] = LatencyHistogram()
         else:
             for name in cls.names:
                 cls.names[name]['warmup'] = warmup
@@ -134,38 +317,108 @@ class TimeCounter:
                 cls.names[name]['with_sync'] = with_sync
                 cls.names[name]['batch_size'] = batch_size
                 cls.names[name]['enable'] = True
+                cls.names[name]['count'] = 0
+                cls.names[name]['histogram'] = LatencyHistogram()
+        # discard the statistics of the previous activations
+        cls.spans.clear()
+        cls.trace_events.clear()
+        cls.enable = True
+        cls.span_warmup = warmup
+        cls.span_batch_size = batch_size
+        cls.trace = trace
+        cls.max_trace_events = max_trace_events
         yield
         if func_name is not None:
             cls.names[func_name]['enable'] = False
         else:
             for name in cls.names:
                 cls.names[name]['enable'] = False
+        cls.enable = False
+        cls.trace = False
+
+    @classmethod
+    def get_stats(cls, name: str) -> Dict[str, float]:
+        """Get the statistics of a function or a span.
+
+        Args:
+            name (str): The name registered with `count_time` or the path of
+                a span.
+
+        Returns:
+            Dict[str, float]: The count, the latencies in milliseconds and the
+                mean FPS.
+        """
+        stats = cls.names[name] if name in cls.names else cls.spans[name]
+        summary = stats['histogram'].summary()
+        summary['fps'] = 1000 / summary['mean'] \
+            if summary['count'] > 0 else math.nan
+        return summary
+
+    @classmethod
+    def get_all_stats(cls) -> Dict[str, Dict[str, float]]:
+        """Get the statistics of all counted functions and spans.
+
+        Returns:
+            Dict[str, Dict[str, float]]: The statistics of each name.
+        """
+        names = [
+            name for name in list(cls.names) + list(cls.spans)
+            if cls.names.get(name, cls.spans.get(name))['histogram'].count > 0
+        ]
+        return dict((name, cls.get_stats(name)) for name in names)
+
+    @classmethod
+    def export_stats(cls, file: str):
+        """Export the statistics of all counted functions and spans.
+
+        Args:
+            file (str): The output file, in json format if it ends with
+                `.json`, otherwise in csv format.
+        """
+        all_stats = cls.get_all_stats()
+        with open(file, 'w') as f:
+            if file.endswith('.json'):
+                json.dump(all_stats, f, indent=4)
+            else:
+                fields = ['name', 'count', 'mean', 'min', 'max'] + [
+                    f'p{q:g}' for q in LatencyHistogram.percentiles
+                ] + ['fps']
+                writer = csv.DictWriter(f, fieldnames=fields)
+                writer.writeheader()
+                for name, stats in all_stats.items():
+                    writer.writerow(dict(name=name, **stats))
+
+    @classmethod
+    def export_trace(cls, file: str):
+        """Export the recorded events in Chrome trace format, which can be
+        opened with `chrome://tracing` or Perfetto.
+
+        Args:
+            file (str): The output json file.
+        """
+        with open(file, 'w') as f:
+            json.dump(
+                dict(traceEvents=cls.trace_events, displayTimeUnit='ms'), f)
 
     @classmethod
     def print_stats(cls, name: str):
         """print statistics results of timer.
 
         Args:
-            name (str): The name registered with `count_time`.
+            name (str): The name registered with `count_time` or the path of
+                a span.
         """
         from prettytable import PrettyTable
 
-        assert name in cls.names
-        stats = cls.names[name]
-        execute_time = stats['execute_time']
-        latency_mean = 1000 * float(np.mean(execute_time))
-        latency_median = 1000 * float(np.median(execute_time))
-        latency_min = 1000 * float(np.min(execute_time))
-        latency_max = 1000 * float(np.max(execute_time))
-        fps_mean, fps_median = 1000 / latency_mean, 1000 / latency_median
-        fps_min, fps_max = 1000 / latency_min, 1000 / latency_max
+        assert name in cls.names or name in cls.spans
+        stats = cls.get_stats(name)
         results = PrettyTable()
         results.field_names = ['Stats', 'Latency/ms', 'FPS']
-        results.add_rows([
-            ['Mean', latency_mean, fps_mean],
-            ['Median', latency_median, fps_median],
-            ['Min', latency_min, fps_min],
-            ['Max', latency_max, fps_max],
-        ])
+        rows = [('Mean', 'mean'), ('Median', 'p50'), ('Min', 'min'),
+                ('Max', 'max')]
+        rows += [(f'P{q:g}', f'p{q:g}')
+                 for q in LatencyHistogram.percentiles[1:]]
+        results.add_rows([[title, stats[key], 1000 / stats[key]]
+                          for title, key in rows])
         results.float_format = '.3'
         print(results)
@@ -3,8 +3,10 @@ import glob
 import logging
 import os
 import sys
+import threading
 import traceback
-from typing import Callable, Optional, Union
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Union
 
 try:
     from torch import multiprocessing as mp
@@ -126,3 +128,63 @@ def get_file_path(prefix, candidates) -> str:
             lib_path = paths[0]
             return lib_path
     return ''
+
+
+class LRUCache:
+    """A thread-safe cache keeping the least recently used entries.
+
+    Args:
+        max_size (int): Max number of cached entries, at least 1.
+
+    Examples:
+        >>> cache = LRUCache(2)
+        >>> cache.put('a', 1)
+        >>> cache.put('b', 2)
+        >>> cache.get('a')
+        1
+        >>> cache.put('c', 3)  # 'b' is evicted
+        >>> cache.get('b') is None
+        True
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max(max_size, 1)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a cached value and mark it as the most recently used.
+
+        Args:
+            key (Hashable): The key of the value.
+            default (Any): The value returned if the key is not cached.
+                Defaults to `None`.
+
+        Returns:
+            Any: The cached value or `default`.
+        """
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any):
+        """Cache a value, the least recently used one is evicted if the cache
+        is full.
+
+        Args:
+            key (Hashable): The key of the value.
+            value (Any): The value to cache.
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
@@ -3,6 +3,9 @@ import os.path as osp
 import tempfile
 from multiprocessing import Process
 
+import numpy as np
+import pytest
+import torch
 from mmengine import Config
 
 from mmdeploy.apis import create_calib_input_data
@@ -233,3 +236,52 @@ def test_create_calib_parittion():
         p.start()
     finally:
         p.join()
+
+
+@pytest.mark.parametrize('compression', ['gzip', 'lzf', None])
+def test_calib_data_writer(compression):
+    h5py = pytest.importorskip('h5py')
+    from mmdeploy.apis.utils.calibration import CalibDataWriter
+    samples = [np.random.rand(1, 3, 8, 8).astype(np.float32) for _ in range(4)]
+    with h5py.File(calib_file, mode='w') as file:
+        with CalibDataWriter(
+                file, compression=compression, max_queue_size=2) as writer:
+            for data_id, sample in enumerate(samples):
+                writer.write('calib_data/end2end/input', str(data_id), sample)
+
+    with h5py.File(calib_file, mode='r') as file:
+        input_group = file['calib_data']['end2end']['input']
+        assert len(input_group) == len(samples)
+        for data_id, sample in enumerate(samples):
+            dataset = input_group[str(data_id)]
+            assert dataset.compression == compression
+            np.testing.assert_array_equal(dataset[...], sample)
+
+
+def test_calib_data_writer_error():
+    h5py = pytest.importorskip('h5py')
+    from mmdeploy.apis.utils.calibration import CalibDataWriter
+    sample = np.zeros((1, 3), dtype=np.float32)
+    with h5py.File(calib_file, mode='w') as file:
+        writer = CalibDataWriter(file)
+        writer.write('calib_data/end2end/input', '0', sample)
+        # the dataset exists
+        writer.write('calib_data/end2end/input', '0', sample)
+        with pytest.raises(ValueError):
+            writer.close()
+
+
+def test_calib_data_writer_copy():
+    h5py = pytest.importorskip('h5py')
+    from mmdeploy.apis.utils.calibration import CalibDataWriter
+    tensor = torch.rand(1, 3, 8, 8)
+    expected = tensor.clone().numpy()
+    with h5py.File(calib_file, mode='w') as file:
+        with CalibDataWriter(file) as writer:
+            writer.write('calib_data/end2end/input', '0', tensor)
+            # e.g. a following ReLU(inplace=True)
+            tensor.zero_()
+
+    with h5py.File(calib_file, mode='r') as file:
+        np.testing.assert_array_equal(
+            file['calib_data']['end2end']['input']['0'][...], expected)
@@ -0,0 +1,106 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import os
+import os.path as osp
+import time
+
+from mmdeploy.apis.utils import ConversionCache, hash_file
+
+
+def _write(path, content):
+    with open(path, 'wb') as f:
+        f.write(content)
+    return str(path)
+
+
+def test_hash_file(tmp_path):
+    file = _write(tmp_path / 'a.bin', b'abc')
+    digest = hash_file(file)
+    assert digest == hash_file(file)
+    time.sleep(0.01)
+    _write(file, b'abcd')
+    assert hash_file(file) != digest
+
+
+def test_conversion_cache(tmp_path):
+    cache = ConversionCache(str(tmp_path / 'cache'), max_size=12)
+    work_dir = tmp_path / 'work_dir'
+    work_dir.mkdir()
+    key0 = ConversionCache.make_key('backend', dict(a=1, b=(2, 3)))
+    assert key0 == ConversionCache.make_key('backend', dict(b=(2, 3), a=1))
+    assert cache.get(key0, str(work_dir)) is None
+
+    files = [
+        _write(work_dir / 'end2end.param', b'1234'),
+        _write(work_dir / 'end2end.bin', b'56')
+    ]
+    cache.put(key0, files)
+    restore_dir = str(tmp_path / 'restore')
+    restored = cache.get(key0, restore_dir)
+    assert [osp.basename(file) for file in restored] == \
+        ['end2end.param', 'end2end.bin']
+    with open(restored[0], 'rb') as f:
+        assert f.read() == b'1234'
+
+    # the least recently used entry is evicted
+    key1 = ConversionCache.make_key('backend', 1)
+    cache.put(key1, [_write(work_dir / 'x.engine', b'12345')])
+    entry_time = time.time() - 100
+    os.utime(
+        osp.join(cache.cache_dir, key1, 'meta.json'), (entry_time, entry_time))
+    key2 = ConversionCache.make_key('backend', 2)
+    cache.put(key2, [_write(work_dir / 'y.engine', b'123')])
+    assert cache.get(key1, restore_dir) is None
+    assert cache.get(key0, restore_dir) is not None
+    assert cache.get(key2, restore_dir) is not None
+
+
+def test_conversion_cache_companion_files(tmp_path):
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    work_dir = tmp_path / 'work_dir'
+    work_dir.mkdir()
+
+    # an OpenVINO model, the weights are loaded by the path of the xml
+    xml_file = _write(work_dir / 'end2end.xml', b'<net/>')
+    _write(work_dir / 'end2end.bin', b'weights')
+    _write(work_dir / 'end2end.mapping', b'mapping')
+    key = ConversionCache.make_key('backend', 'openvino')
+    cache.put(key, [xml_file])
+    restore_dir = tmp_path / 'restore'
+    restored = cache.get(key, str(restore_dir))
+    assert restored == [str(restore_dir / 'end2end.xml')]
+    with open(restore_dir / 'end2end.bin', 'rb') as f:
+        assert f.read() == b'weights'
+    assert osp.exists(restore_dir / 'end2end.mapping')
+
+
+def test_conversion_cache_onnx_external_data(tmp_path):
+    import numpy as np
+    import onnx
+    from onnx import helper, numpy_helper
+    cache = ConversionCache(str(tmp_path / 'cache'))
+    work_dir = tmp_path / 'work_dir'
+    work_dir.mkdir()
+
+    weight = np.random.rand(4, 4).astype(np.float32)
+    node = helper.make_node('MatMul', ['input', 'weight'], ['output'])
+    input_info = helper.make_tensor_value_info('input', onnx.TensorProto.FLOAT,
+                                               [1, 4])
+    output_info = helper.make_tensor_value_info('output',
+                                                onnx.TensorProto.FLOAT, [1, 4])
+    graph = helper.make_graph([node], 'test', [input_info], [output_info],
+                              [numpy_helper.from_array(weight, 'weight')])
+    onnx_file = str(work_dir / 'end2end.onnx')
+    onnx.save(
+        helper.make_model(graph),
+        onnx_file,
+        save_as_external_data=True,
+        location='end2end.onnx.data',
+        size_threshold=0)
+
+    key = ConversionCache.make_key('ir', 'onnx')
+    cache.put(key, [onnx_file])
+    restore_dir = tmp_path / 'restore'
+    restored = cache.get(key, str(restore_dir))
+    model = onnx.load(restored[0])
+    np.testing.assert_array_equal(
+        numpy_helper.to_array(model.graph.initializer[0]), weight)
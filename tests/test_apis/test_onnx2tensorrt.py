@@ -1,4 +1,5 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import os
 import os.path as osp
 import tempfile
 
@@ -87,3 +88,31 @@ def test_onnx2tensorrt():
     assert osp.exists(engine_file)
     engine = load(engine_file)
     assert engine is not None
+
+
+@backend_checker(Backend.TENSORRT)
+def test_onnx2tensorrt_timing_cache():
+    from mmdeploy.apis.tensorrt import onnx2tensorrt
+    from mmdeploy.backend.tensorrt import load
+    model = test_model
+    generate_onnx_file(model)
+    deploy_cfg = get_deploy_cfg()
+    cache_dir = tempfile.mkdtemp()
+    deploy_cfg.backend_config.common_config.timing_cache = cache_dir + '/'
+
+    work_dir, save_file = osp.split(engine_file)
+
+    onnx2tensorrt(work_dir, save_file, 0, deploy_cfg, onnx_file)
+    cache_files = os.listdir(cache_dir)
+    assert len(cache_files) == 1
+    assert cache_files[0].endswith('.cache')
+    cache_file = osp.join(cache_dir, cache_files[0])
+    cache_size = osp.getsize(cache_file)
+    assert cache_size > 0
+
+    # rebuild with the saved timing cache
+    onnx2tensorrt(work_dir, save_file, 0, deploy_cfg, onnx_file)
+    assert os.listdir(cache_dir) == cache_files
+    assert osp.getsize(cache_file) >= cache_size
+    engine = load(engine_file)
+    assert engine is not None
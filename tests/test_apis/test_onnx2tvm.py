@@ -1,4 +1,5 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import os
 import os.path as osp
 import tempfile
 
@@ -103,3 +104,52 @@ def test_onnx2tvm():
         tuner=tuner_dict)
     assert osp.exists(lib_path)
     assert osp.exists(bytecode_path)
+
+
+@backend_checker(Backend.TVM)
+def test_tuning_record_store():
+    from mmdeploy.apis.tvm import from_onnx, get_library_ext
+    from mmdeploy.backend.tvm.tuner import TuningRecordStore
+    model = test_model
+    generate_onnx_file(model)
+
+    work_dir, _ = osp.split(onnx_file)
+    file_name = osp.splitext(onnx_file)[0]
+    ext = get_library_ext()
+    tuning_db = tempfile.mkdtemp()
+    shape = {'input': test_img.shape}
+    dtype = {'input': 'float32'}
+
+    def _convert(suffix):
+        lib_path = osp.join(work_dir, file_name + suffix + ext)
+        tuner_dict = dict(
+            type='AutoTVMTuner',
+            target='llvm',
+            log_file=osp.join(work_dir, file_name + suffix + '.log'),
+            n_trial=1,
+            tuner=dict(type='XGBTuner'),
+            tuning_db=tuning_db)
+        from_onnx(
+            onnx_file, lib_path, shape=shape, dtype=dtype, tuner=tuner_dict)
+        assert osp.exists(lib_path)
+
+    def _read_store():
+        records = dict()
+        for root, _, names in os.walk(tuning_db):
+            for name in names:
+                with open(osp.join(root, name)) as f:
+                    records[name] = f.read()
+        return records
+
+    _convert('_store0')
+    records = _read_store()
+    assert len(records) > 0
+
+    # the tuned workloads are not tuned again
+    _convert('_store1')
+    assert _read_store() == records
+
+    store = TuningRecordStore(tuning_db)
+    store.append('autotvm', 'llvm', 'workload', ['record'])
+    assert store.read('autotvm', 'llvm', 'workload') == ['record\n']
+    assert store.read('autotvm', 'cuda', 'workload') == []
@@ -1,4 +1,5 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import os
 import os.path as osp
 import subprocess
 import tempfile
@@ -217,3 +218,406 @@ def test_wrapper(backend):
     assert wrapper is not None
     results = run_wrapper(backend, wrapper, test_img)
     assert results is not None
+
+
+@pytest.mark.parametrize('backend', [Backend.ONNXRUNTIME])
+def test_ort_io_binding_cache(backend):
+    check_backend(backend)
+    from mmdeploy.backend.onnxruntime import ORTWrapper
+    wrapper = ORTWrapper(
+        onnx_file, 'cpu', output_names, use_io_binding_cache=True)
+    expected = run_wrapper(backend, create_wrapper(backend, onnx_file),
+                           test_img)
+    for _ in range(2):
+        results = run_wrapper(backend, wrapper, test_img)
+        torch.testing.assert_close(results, expected)
+    assert len(wrapper._io_binding_cache) == 1
+
+
+@pytest.mark.parametrize('backend', [Backend.ONNXRUNTIME])
+def test_ort_concurrent_calls(backend):
+    check_backend(backend)
+    from concurrent.futures import ThreadPoolExecutor
+
+    from mmdeploy.backend.onnxruntime import ORTWrapper
+    wrapper = ORTWrapper(onnx_file, 'cpu', output_names)
+    assert wrapper.thread_safe
+    inputs = [{'input': torch.full_like(test_img, i)} for i in range(32)]
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(wrapper, inputs))
+    for data, result in zip(inputs, results):
+        torch.testing.assert_close(result['output'], data['input'] * 2)
+
+    # the outputs of the io binding cache are overwritten by the next call
+    wrapper = ORTWrapper(
+        onnx_file, 'cpu', output_names, use_io_binding_cache=True)
+    assert not wrapper.thread_safe
+
+
+@pytest.mark.parametrize('backend', [Backend.ONNXRUNTIME])
+def test_ort_session_options(backend):
+    check_backend(backend)
+    import shutil
+
+    from mmdeploy.backend.onnxruntime import ORTWrapper
+    work_dir = tempfile.mkdtemp()
+    model_file = osp.join(work_dir, 'end2end.onnx')
+    shutil.copyfile(onnx_file, model_file)
+    session_options = dict(
+        intra_op_num_threads=1,
+        execution_mode='sequential',
+        graph_optimization_level='all')
+    expected = run_wrapper(backend, create_wrapper(backend, onnx_file),
+                           test_img)
+    for _ in range(2):
+        wrapper = ORTWrapper(
+            model_file,
+            'cpu',
+            output_names,
+            session_options=session_options,
+            providers=['NotExistExecutionProvider', 'CPUExecutionProvider'],
+            optimized_model_cache=True)
+        assert wrapper.sess.get_providers() == ['CPUExecutionProvider']
+        results = run_wrapper(backend, wrapper, test_img)
+        torch.testing.assert_close(results, expected)
+        cache_files = [
+            name for name in os.listdir(work_dir) if name != 'end2end.onnx'
+        ]
+        assert len(cache_files) == 1
+        assert cache_files[0].startswith('end2end.ort-')
+    with pytest.raises(KeyError):
+        ORTWrapper(model_file, 'cpu', session_options=dict(not_exist=1))
+
+
+@pytest.mark.parametrize('backend', [Backend.ONNXRUNTIME])
+def test_ort_optimized_model_cache(backend, monkeypatch):
+    check_backend(backend)
+    import shutil
+    from unittest.mock import MagicMock
+
+    from mmdeploy.backend.onnxruntime import ORTWrapper
+    from mmdeploy.backend.onnxruntime import wrapper as ort_wrapper
+    work_dir = tempfile.mkdtemp()
+    model_file = osp.join(work_dir, 'end2end.onnx')
+    shutil.copyfile(onnx_file, model_file)
+    ORTWrapper(model_file, 'cpu', output_names, optimized_model_cache=True)
+    cache_files = [
+        name for name in os.listdir(work_dir) if name != 'end2end.onnx'
+    ]
+    assert len(cache_files) == 1
+
+    # the options of the cached model have the custom ops registered too
+    create_session_options = ORTWrapper._create_session_options
+    created_options = []
+
+    def _create_session_options(cfg):
+        created_options.append(cfg)
+        return create_session_options(cfg)
+
+    logger = MagicMock()
+    monkeypatch.setattr(ort_wrapper, 'get_root_logger', lambda: logger)
+    monkeypatch.setattr(ORTWrapper, '_create_session_options',
+                        staticmethod(_create_session_options))
+    wrapper = ORTWrapper(
+        model_file, 'cpu', output_names, optimized_model_cache=True)
+    assert len(created_options) == 2
+    assert wrapper.sess._model_path == osp.join(work_dir, cache_files[0])
+    # no warning of the failure to load the cached model
+    assert not any('optimized' in str(call)
+                   for call in logger.warning.call_args_list)
+
+
+class CopyCounter(torch.overrides.TorchFunctionMode):
+    """Count the copies between devices made by torch."""
+
+    COPY_FUNCS = (torch.Tensor.to, torch.Tensor.cpu, torch.Tensor.cuda,
+                  torch.Tensor.copy_)
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def __torch_function__(self, func, types, args=(), kwargs=None):
+        result = func(*args, **(kwargs or {}))
+        if func in self.COPY_FUNCS:
+            if func is torch.Tensor.copy_:
+                src, dst = args[1], args[0]
+            else:
+                src, dst = args[0], result
+            if isinstance(src, torch.Tensor) and src.device != dst.device:
+                self.count += 1
+        return result
+
+
+@pytest.mark.parametrize('backend', [Backend.ONNXRUNTIME])
+def test_ort_output_placement(backend):
+    check_backend(backend)
+    import onnxruntime as ort
+
+    from mmdeploy.backend.onnxruntime import ORTWrapper
+    device = 'cuda' if torch.cuda.is_available() and \
+        'CUDAExecutionProvider' in ort.get_available_providers() else 'cpu'
+    wrapper = ORTWrapper(onnx_file, device, output_names)
+    inputs = {'input': test_img.to(device)}
+    expected = test_img.to(device) * 2
+
+    # the outputs stay on the device without copy
+    with CopyCounter() as counter:
+        outputs = wrapper(inputs)
+    assert counter.count == 0
+    assert outputs['output'].device == expected.device
+    torch.testing.assert_close(outputs['output'], expected)
+
+    # the session writes to the buffer on the same device directly
+    buffer = torch.empty_like(expected)
+    wrapper.set_output_buffers({'output': buffer})
+    with CopyCounter() as counter:
+        outputs = wrapper(inputs)
+    assert counter.count == 0
+    assert outputs['output'] is buffer
+    torch.testing.assert_close(buffer, expected)
+
+    # one copy per output to a buffer on host or to host memory
+    wrapper.set_output_buffers({'output': torch.empty_like(test_img)})
+    with CopyCounter() as counter:
+        outputs = wrapper(inputs)
+    assert counter.count == (device != 'cpu')
+    wrapper.set_output_buffers()
+    wrapper.keep_on_device = False
+    with CopyCounter() as counter:
+        outputs = wrapper(inputs)
+    assert counter.count == (device != 'cpu')
+    assert outputs['output'].device.type == 'cpu'
+    torch.testing.assert_close(outputs['output'], expected.cpu())
+
+
+def test_wrap_output():
+    import numpy as np
+
+    from mmdeploy.backend.base import BaseWrapper
+
+    class NumpyWrapper(BaseWrapper):
+
+        def forward(self, inputs):
+            return self._wrap_outputs({'output': inputs['input']})
+
+    wrapper = NumpyWrapper(output_names)
+    array = np.ones((2, 3), dtype=np.float32)
+    output = wrapper({'input': array})['output']
+    assert np.shares_memory(output.numpy(), array)
+    output = wrapper._wrap_output('output', array, copy=True)
+    assert not np.shares_memory(output.numpy(), array)
+    buffer = torch.zeros(2, 3, dtype=torch.float64)
+    wrapper.set_output_buffers({'output': buffer})
+    assert wrapper({'input': array})['output'] is buffer
+    torch.testing.assert_close(buffer, torch.ones(2, 3, dtype=torch.float64))
+    with pytest.raises(ValueError):
+        wrapper({'input': np.ones((3, 3), dtype=np.float32)})
+
+
+@pytest.mark.skipif(
+    not torch.cuda.is_available(), reason='requires cuda device')
+def test_get_output_buffer_device():
+    from mmdeploy.backend.base import BaseWrapper
+
+    class DummyWrapper(BaseWrapper):
+
+        def forward(self, inputs):
+            return inputs
+
+    wrapper = DummyWrapper(output_names)
+    buffer = torch.empty(1, 3, device=f'cuda:{torch.cuda.current_device()}')
+    wrapper.set_output_buffers({'output': buffer})
+    # the device without index is the current device
+    assert wrapper._get_output_buffer('output', (1, 3), buffer.dtype,
+                                      torch.device('cuda')) is buffer
+    assert wrapper._get_output_buffer('output',
+                                      (1, 3), buffer.dtype, 'cpu') is None
+
+
+@pytest.mark.parametrize('backend', [Backend.TENSORRT])
+def test_trt_output_buffers(backend):
+    check_backend(backend, True)
+    from mmdeploy.backend.tensorrt import TRTWrapper
+    engine_file = ir2backend(backend, onnx_file, ts_file)
+    wrapper = TRTWrapper(engine_file, output_names)
+    expected = run_wrapper(backend, wrapper, test_img)
+    buffer = torch.empty_like(expected, device='cuda:0')
+    wrapper.set_output_buffers({'output': buffer})
+    inputs = {'input': test_img.cuda()}
+    with CopyCounter() as counter:
+        output = wrapper(inputs)['output']
+    # the engine writes to the registered buffer directly
+    assert counter.count == 0
+    assert output.data_ptr() == buffer.data_ptr()
+    torch.testing.assert_close(buffer.cpu(), expected)
+
+
+@pytest.mark.parametrize('backend', [Backend.TENSORRT])
+def test_trt_context_pool(backend):
+    check_backend(backend, True)
+    from mmdeploy.backend.tensorrt import TRTWrapper
+    engine_file = ir2backend(backend, onnx_file, ts_file)
+    wrapper = TRTWrapper(engine_file, output_names, num_contexts=2)
+    expected = run_wrapper(backend, wrapper, test_img)
+    futures = [
+        wrapper.forward_async({'input': test_img.cuda()}) for _ in range(4)
+    ]
+    for future in futures:
+        torch.testing.assert_close(future.result()['output'].cpu(), expected)
+
+
+@pytest.mark.parametrize('backend', [Backend.TENSORRT])
+def test_trt_non_contiguous_input(backend):
+    check_backend(backend, True)
+    from mmdeploy.backend.tensorrt import TRTWrapper
+    engine_file = ir2backend(backend, onnx_file, ts_file)
+    wrapper = TRTWrapper(engine_file, output_names, num_contexts=2)
+    expected = run_wrapper(backend, wrapper, test_img)
+    # the inputs are made contiguous on the streams of the pool
+    inputs = [
+        test_img.permute(0, 2, 3, 1).cuda().permute(0, 3, 1, 2)
+        for _ in range(4)
+    ]
+    assert not inputs[0].is_contiguous()
+    outputs = wrapper({'input': inputs[0]})
+    torch.testing.assert_close(outputs['output'].cpu(), expected)
+    futures = [wrapper.forward_async({'input': data}) for data in inputs]
+    for future in futures:
+        torch.testing.assert_close(future.result()['output'].cpu(), expected)
+
+
+@pytest.mark.parametrize('backend', [Backend.TENSORRT])
+def test_trt_cuda_graph(backend):
+    check_backend(backend, True)
+    from mmdeploy.backend.tensorrt import TRTWrapper
+    engine_file = ir2backend(backend, onnx_file, ts_file)
+    expected = run_wrapper(backend, TRTWrapper(engine_file, output_names),
+                           test_img)
+    wrapper = TRTWrapper(engine_file, output_names, use_cuda_graph=True)
+    for _ in range(2):
+        results = run_wrapper(backend, wrapper, test_img)
+        torch.testing.assert_close(results, expected)
+
+
+@pytest.mark.parametrize('backend', [Backend.TENSORRT])
+def test_trt_multiple_profiles(backend):
+    check_backend(backend, True)
+    from mmdeploy.backend.tensorrt import TRTWrapper, from_onnx
+    dynamic_onnx_file = tempfile.NamedTemporaryFile(suffix='.onnx').name
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            test_img,
+            dynamic_onnx_file,
+            output_names=output_names,
+            input_names=input_names,
+            opset_version=11,
+            dynamic_axes=dict(input={0: 'batch'}, output={0: 'batch'}))
+    engine_file = tempfile.NamedTemporaryFile(suffix='.engine').name
+
+    def _profile(max_batch):
+        return dict(
+            input=dict(
+                min_shape=[1, 3, 8, 8],
+                opt_shape=[max_batch, 3, 8, 8],
+                max_shape=[max_batch, 3, 8, 8]))
+
+    from_onnx(dynamic_onnx_file,
+              osp.splitext(engine_file)[0],
+              [_profile(8), _profile(2)])
+    wrapper = TRTWrapper(engine_file, output_names)
+    assert len(wrapper._contexts) == 2
+    for batch_size, profile_id in [(2, 1), (4, 0)]:
+        inputs = test_img.repeat(batch_size, 1, 1, 1).cuda()
+        outputs = wrapper({'input': inputs})
+        torch.testing.assert_close(outputs['output'], inputs + test_img.cuda())
+        input_shapes = (('input', tuple(inputs.shape)), )
+        assert wrapper._matched_profiles[input_shapes][0] == profile_id
+    with pytest.raises(AssertionError):
+        wrapper({'input': test_img.repeat(16, 1, 1, 1).cuda()})
+
+
+@pytest.mark.parametrize('backend', [Backend.OPENVINO])
+def test_openvino_request_pool(backend):
+    check_backend(backend)
+    from mmdeploy.backend.openvino import OpenVINOWrapper
+    model_file = ir2backend(backend, onnx_file, ts_file)
+    wrapper = OpenVINOWrapper(
+        model_file, output_names, num_requests=2, max_cached_networks=1)
+    expected = run_wrapper(backend, wrapper, test_img)
+    futures = [wrapper.forward_async({'input': test_img}) for _ in range(4)]
+    for future in futures:
+        torch.testing.assert_close(future.result()['output'], expected)
+    assert len(wrapper._exec_nets) == 1
+
+
+def test_batching_wrapper():
+    from concurrent.futures import ThreadPoolExecutor
+
+    from mmdeploy.backend.base import BaseWrapper, BatchingWrapper
+
+    class DoubleWrapper(BaseWrapper):
+
+        def __init__(self):
+            super().__init__(output_names)
+            self.batch_sizes = []
+
+        def forward(self, inputs):
+            self.batch_sizes.append(inputs['input'].size(0))
+            return {'output': inputs['input'] * 2}
+
+    wrapper = BatchingWrapper(DoubleWrapper(), max_batch_size=4, timeout=0.1)
+    inputs = [{'input': torch.full((1, 3), float(i))} for i in range(8)]
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(wrapper, inputs))
+    for data, result in zip(inputs, results):
+        torch.testing.assert_close(result['output'], data['input'] * 2)
+    assert max(wrapper.wrapper.batch_sizes) <= 4
+    assert len(wrapper.wrapper.batch_sizes) < len(inputs)
+    wrapper.destroy()
+
+
+def test_enable_batching_multiple_profiles():
+    from mmdeploy.backend.base import BaseWrapper, BatchingWrapper
+    from mmdeploy.codebase.base import BaseBackendModel
+
+    class IdentityWrapper(BaseWrapper):
+
+        def forward(self, inputs):
+            return {'output': inputs['input']}
+
+    class IdentityModel(BaseBackendModel):
+
+        def __init__(self, deploy_cfg):
+            super().__init__(deploy_cfg=deploy_cfg)
+            self.deploy_cfg = deploy_cfg
+            self.wrapper = IdentityWrapper(output_names)
+
+        def forward(self, inputs):
+            return self.wrapper({'input': inputs})['output']
+
+    def _profile(max_batch_size):
+        return dict(
+            input=dict(
+                min_shape=[1, 3, 8, 8],
+                opt_shape=[1, 3, 8, 8],
+                max_shape=[max_batch_size, 3, 8, 8]))
+
+    profiles = [_profile(2), _profile(6), _profile(4)]
+    deploy_cfg = mmengine.Config(
+        dict(
+            onnx_config=dict(
+                type='onnx',
+                input_names=input_names,
+                output_names=output_names,
+                dynamic_axes=dict(input={0: 'batch'})),
+            backend_config=dict(
+                type='tensorrt', model_inputs=[dict(input_shapes=profiles)])))
+    model = IdentityModel(deploy_cfg)
+    model.enable_batching()
+    assert isinstance(model.wrapper, BatchingWrapper)
+    assert model.wrapper.max_batch_size == 6
+    model.enable_batching(max_batch_size=16)
+    assert model.wrapper.max_batch_size == 6
+    model.destroy()
@@ -144,7 +144,8 @@ def test_build_backend_model(backend_model):
     assert isinstance(backend_model, End2EndModel)
 
 
-def test_can_postprocess_masks():
+@pytest.mark.parametrize('skip_empty', [False, True])
+def test_can_postprocess_masks(skip_empty):
     from mmdeploy.codebase.mmdet.deploy.object_detection_model import \
         End2EndModel
     num_dets = [0, 1, 5]
@@ -152,8 +153,8 @@ def test_can_postprocess_masks():
         det_bboxes = np.random.randn(num_det, 4)
         det_masks = np.random.randn(num_det, 28, 28)
         img_w, img_h = (30, 40)
-        masks = End2EndModel.postprocessing_masks(det_bboxes, det_masks, img_w,
-                                                  img_h)
+        masks = End2EndModel.postprocessing_masks(
+            det_bboxes, det_masks, img_w, img_h, skip_empty=skip_empty)
         expected_shape = (num_det, img_h, img_w)
         actual_shape = masks.shape
         assert actual_shape == expected_shape, \
@@ -161,6 +162,23 @@ def test_can_postprocess_masks():
             f'did not match actual shape {actual_shape}.'
 
 
+def test_postprocess_masks_in_chunks():
+    from mmdeploy.codebase.mmdet.deploy.object_detection_model import \
+        End2EndModel
+    det_bboxes = torch.tensor([[2., 3., 20., 25.], [10., 5., 28., 38.],
+                               [0., 0., 30., 40.]])
+    det_masks = torch.rand(3, 28, 28)
+    img_w, img_h = (30, 40)
+    masks = End2EndModel.postprocessing_masks(det_bboxes, det_masks, img_w,
+                                              img_h)
+    chunk_masks = End2EndModel.postprocessing_masks(
+        det_bboxes, det_masks, img_w, img_h, mem_limit=img_w * img_h * 12)
+    torch.testing.assert_close(chunk_masks, masks)
+    roi_masks = End2EndModel.postprocessing_masks(
+        det_bboxes, det_masks, img_w, img_h, skip_empty=True)
+    assert torch.equal(roi_masks >= 0.5, masks >= 0.5)
+
+
 @pytest.mark.parametrize('device', ['cpu', 'cuda:0'])
 def test_create_input(device):
     if device == 'cuda:0' and not torch.cuda.is_available():
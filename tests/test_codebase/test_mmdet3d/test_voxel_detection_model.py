@@ -101,3 +101,18 @@ def test_build_voxel_detection_model():
                                                     deploy_cfg=deploy_cfg,
                                                     device='cpu')
         assert isinstance(voxeldetector, VoxelDetectionModel)
+
+
+def test_circle_nms():
+    from mmdet3d.models.layers import circle_nms
+
+    from mmdeploy.codebase.mmdet3d.deploy.voxel_detection_model import \
+        _circle_nms
+    centers = torch.rand(64, 2) * 4
+    scores = torch.rand(64)
+    keep = _circle_nms(centers, scores, 0.5, post_max_size=32)
+    expected = circle_nms(
+        torch.cat([centers, scores[:, None]], dim=1).numpy(),
+        0.5,
+        post_max_size=32)
+    assert keep.tolist() == list(expected)
@@ -92,3 +92,40 @@ def test_build_text_detection_model():
         segmentor = build_text_detection_model([''], model_cfg, deploy_cfg,
                                                'cpu')
         assert isinstance(segmentor, End2EndModel)
+
+
+@pytest.mark.parametrize('text_repr_type', ['poly', 'quad'])
+def test_extract_polygons(text_repr_type):
+    import cv2
+    from mmdet.structures.mask import bitmap_to_polygon
+
+    from mmdeploy.codebase.mmocr.deploy.text_detection_model import (
+        _crop_masks, _extract_polygons)
+    masks = torch.zeros(3, IMAGE_SIZE, IMAGE_SIZE)
+    masks[0, 2:10, 3:20] = 1
+    masks[1, 12:30, 8:16] = torch.rand(18, 8)
+    masks[2, 20:24, 20:31] = 1
+    bboxes = torch.tensor([[6., 4., 40., 20.], [16., 24., 32., 60.],
+                           [40., 40., 62., 48.]])
+    ori_shape = (2 * IMAGE_SIZE, 2 * IMAGE_SIZE)
+
+    # resize the whole masks and fit the quads one by one
+    expected = []
+    resized = torch.nn.functional.interpolate(
+        masks.unsqueeze(0), size=ori_shape).squeeze(0) >= 0.5
+    for mask in resized:
+        contours, _ = bitmap_to_polygon(mask)
+        for contour in contours:
+            if len(contour) < 3:
+                continue
+            if text_repr_type == 'quad':
+                contour = cv2.boxPoints(cv2.minAreaRect(contour))
+            expected.append(contour.reshape(-1))
+
+    mask_crops, offsets = _crop_masks(masks, bboxes, ori_shape)
+    polygons, num_polygons = _extract_polygons(mask_crops, offsets,
+                                               text_repr_type)
+    assert num_polygons.sum() == len(polygons) == len(expected)
+    for polygon, expected_polygon in zip(polygons, expected):
+        assert polygon.shape == expected_polygon.shape
+        assert abs(polygon - expected_polygon).max() < 1e-3
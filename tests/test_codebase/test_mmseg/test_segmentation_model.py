@@ -55,6 +55,24 @@ class TestEnd2EndModel:
         assert len(results) == 1
         assert isinstance(results[0], SegDataSample)
 
+    def test_pack_result(self):
+        from mmseg.models.utils import resize
+        batch_outputs = torch.rand(4, NUM_CLASS, IMAGE_SIZE, IMAGE_SIZE)
+        ori_shapes = [(48, 40), (48, 40), (IMAGE_SIZE, IMAGE_SIZE), (20, 32)]
+        data_samples = []
+        for ori_shape in ori_shapes:
+            data_sample = generate_datasample(IMAGE_SIZE, IMAGE_SIZE)
+            data_sample.set_metainfo(dict(ori_shape=ori_shape))
+            data_samples.append(data_sample)
+        results = self.end2end_model.pack_result(batch_outputs, data_samples)
+        for seg_logit, ori_shape, result in zip(batch_outputs, ori_shapes,
+                                                results):
+            expected = seg_logit.argmax(dim=0, keepdim=True)
+            expected = resize(
+                expected.unsqueeze(0).float(), size=ori_shape,
+                mode='nearest').squeeze(0).long()
+            assert torch.equal(result.pred_sem_seg.data, expected)
+
 
 @backend_checker(Backend.RKNN)
 class TestRKNNModel:
@@ -187,3 +187,66 @@ def test_rewrite_derived_methods():
 
     assert base_obj.method() == 1
     assert derived_obj.method() == 1
+
+
+def test_rewrite_plan_cache():
+    import torch.nn.functional as F
+
+    function_rewriter = FunctionRewriter()
+    # a reference of the function out of its module
+    refs = dict(relu=F.relu)
+    origin_relu = F.relu
+
+    @function_rewriter.register_rewriter(
+        func_name='torch.nn.functional.relu', backend=Backend.NCNN.value)
+    def relu(input, inplace=False):
+        return input + 1
+
+    x = torch.tensor([-1., 1.])
+    for _ in range(2):
+        function_rewriter.enter(env=collect_env(Backend.NCNN, ir=IR.DEFAULT))
+        torch_assert_close(F.relu(x), x + 1)
+        torch_assert_close(refs['relu'](x), x + 1)
+        function_rewriter.exit()
+        assert F.relu is origin_relu
+        assert refs['relu'] is origin_relu
+    assert len(function_rewriter._plans) == 1
+    plan = next(iter(function_rewriter._plans.values()))
+
+    # the cached plan is reused
+    function_rewriter.enter(env=collect_env(Backend.NCNN, ir=IR.DEFAULT))
+    function_rewriter.exit()
+    assert next(iter(function_rewriter._plans.values())) is plan
+
+    # the plan is compiled again if the registry changes
+    function_rewriter._registry.remove_record(relu)
+    function_rewriter.enter(env=collect_env(Backend.NCNN, ir=IR.DEFAULT))
+    torch_assert_close(F.relu(x), torch.tensor([0., 1.]))
+    function_rewriter.exit()
+    assert next(iter(function_rewriter._plans.values())) is not plan
+
+
+def test_rewrite_plan_cache_new_references():
+    function_rewriter = FunctionRewriter()
+    origin_add = torch.add
+
+    @function_rewriter.register_rewriter(
+        func_name='torch.add', backend=Backend.NCNN.value)
+    def add(input, other):
+        return input + other + 1
+
+    x = torch.tensor([1., 2.])
+    function_rewriter.enter(env=collect_env(Backend.NCNN, ir=IR.DEFAULT))
+    function_rewriter.exit()
+
+    # the references created after the plan is compiled are rewritten
+    refs = dict(add=torch.add)
+    ref_list = [torch.add]
+    function_rewriter.enter(env=collect_env(Backend.NCNN, ir=IR.DEFAULT))
+    torch_assert_close(refs['add'](x, x), x + x + 1)
+    torch_assert_close(ref_list[0](x, x), x + x + 1)
+    function_rewriter.exit()
+    assert refs['add'] is origin_add
+    assert ref_list[0] is origin_add
+    assert torch.add is origin_add
+    assert len(function_rewriter._plans) == 1
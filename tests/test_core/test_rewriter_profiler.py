@@ -0,0 +1,60 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import json
+
+import torch
+
+from mmdeploy.core import (FUNCTION_REWRITER, MODULE_REWRITER, RewriterContext,
+                           RewriterProfiler, patch_model)
+
+
+def test_rewriter_profiler(tmp_path):
+
+    @FUNCTION_REWRITER.register_rewriter(
+        func_name='torch.add', backend='tensorrt')
+    def add_func(x, y):
+        ctx = FUNCTION_REWRITER.get_context('torch.add')
+        return ctx.origin_func(x, y) + 1
+
+    @FUNCTION_REWRITER.register_rewriter(
+        func_name='torch.mul', backend='tensorrt')
+    def mul_func(x, y):
+        return x - y
+
+    @MODULE_REWRITER.register_rewrite_module(
+        'torch.nn.ReLU', backend='tensorrt')
+    class ReLUWrapper(torch.nn.Module):
+
+        def __init__(self, module, cfg, **kwargs):
+            super().__init__()
+            self.module = module
+
+        def forward(self, x):
+            return self.module(x) + 2
+
+    profiler = RewriterProfiler()
+    model = torch.nn.Sequential(torch.nn.ReLU(), torch.nn.ReLU())
+    model = patch_model(model, {}, backend='tensorrt', profiler=profiler)
+    x = torch.tensor([1., 2.])
+    with RewriterContext({}, backend='tensorrt', profiler=profiler):
+        torch.add(x, x)
+        torch.add(x, x)
+        model(x)
+
+    report = profiler.dump(str(tmp_path / 'report.json'))
+    with open(tmp_path / 'report.json') as f:
+        assert json.load(f) == json.loads(json.dumps(report))
+
+    entries = dict(((entry['kind'], entry['name']), entry)
+                   for entry in report['rewriters'])
+    add_entry = entries[('function', 'torch.add')]
+    assert add_entry['active'] and add_entry['backend'] == 'tensorrt'
+    assert add_entry['calls'] == 2 and add_entry['origin_calls'] == 2
+    assert add_entry['total_ms'] >= add_entry['origin_ms']
+    relu_entry = entries[('module', 'torch.nn.ReLU')]
+    assert relu_entry['instances'] == 2 and relu_entry['calls'] == 2
+    assert 'function:torch.mul' in report['never_hit']
+    assert report['summary']['hit'] >= 2
+
+    FUNCTION_REWRITER._registry.remove_record(add_func)
+    FUNCTION_REWRITER._registry.remove_record(mul_func)
+    MODULE_REWRITER._registry.remove_record(ReLUWrapper)
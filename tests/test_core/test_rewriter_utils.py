@@ -15,6 +15,27 @@ def test_collect_env():
     assert env_dict['mmdeploy'] == mmdeploy.__version__
 
 
+def test_collect_env_lazy(monkeypatch):
+    probed = []
+
+    def get_library_version(lib):
+        probed.append(lib)
+        return '1.0'
+
+    monkeypatch.setattr('mmdeploy.utils.get_library_version',
+                        get_library_version)
+    env = collect_env(Backend.ONNXRUNTIME, IR.ONNX, mmdet='2.0')
+    assert probed == []
+    assert 'onnxruntime' in env
+    assert env['onnxruntime'] == '1.0'
+    assert env['onnxruntime'] == '1.0'
+    assert env['mmdet'] == '2.0'
+    assert probed == ['onnxruntime']
+    assert env.get('unknown') is None
+    assert dict(env)['tensorrt'] == '1.0'
+    assert 'mmdet' not in probed
+
+
 class TestChecker:
     env = collect_env(Backend.ONNXRUNTIME, IR.ONNX)
 
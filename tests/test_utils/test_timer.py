@@ -21,3 +21,54 @@ def test_count_time():
         t.fun1()
 
     TimeCounter.print_stats('fun1')
+
+
+def test_latency_histogram():
+    from mmdeploy.utils.timer import LatencyHistogram
+
+    histogram = LatencyHistogram()
+    for i in range(1, 1001):
+        histogram.add(i * 1e-3)
+    summary = histogram.summary()
+    assert summary['count'] == 1000
+    assert abs(summary['mean'] - 500.5) < 1e-6
+    assert summary['min'] == 1 and summary['max'] == 1000
+    for q in LatencyHistogram.percentiles:
+        assert abs(summary[f'p{q:g}'] - q * 10) <= q * 10 * 0.01 + 1
+
+
+def test_span_and_export(tmp_path):
+    import json
+
+    with TimeCounter.activate(warmup=1, trace=True):
+        for i in range(5):
+            with TimeCounter.span('pipeline'):
+                with TimeCounter.span('preprocess'):
+                    time.sleep(0.001)
+    stats = TimeCounter.get_stats('pipeline/preprocess')
+    assert stats['count'] == 4
+    assert stats['mean'] >= 1
+    TimeCounter.print_stats('pipeline')
+
+    stats_file = str(tmp_path / 'stats.json')
+    TimeCounter.export_stats(stats_file)
+    with open(stats_file) as f:
+        assert 'pipeline/preprocess' in json.load(f)
+    TimeCounter.export_stats(str(tmp_path / 'stats.csv'))
+
+    trace_file = str(tmp_path / 'trace.json')
+    TimeCounter.export_trace(trace_file)
+    with open(trace_file) as f:
+        events = json.load(f)['traceEvents']
+    assert len([e for e in events if e['name'] == 'pipeline']) == 5
+
+
+def test_activate_resets_stats():
+    for _ in range(2):
+        with TimeCounter.activate(warmup=1, trace=True):
+            for i in range(3):
+                with TimeCounter.span('reset'):
+                    pass
+        # the spans of the previous activation are discarded
+        assert TimeCounter.get_stats('reset')['count'] == 2
+        assert len(TimeCounter.trace_events) == 3
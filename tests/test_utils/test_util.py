@@ -487,3 +487,22 @@ def test_get_backend_version():
     versions = util.get_backend_version()
     for k, v in versions.items():
         assert v == util.get_library_version(k)
+
+
+def test_lru_cache():
+    from mmdeploy.utils import LRUCache
+    cache = LRUCache(2)
+    shapes = [(('input', (1, 3, h, 32)), ) for h in (32, 64, 96)]
+    cache.put(shapes[0], [0])
+    cache.put(shapes[1], [1, 0])
+    assert cache.get(shapes[0]) == [0]
+    # the least recently used shapes are evicted
+    cache.put(shapes[2], [1])
+    assert len(cache) == 2
+    assert shapes[1] not in cache
+    assert cache.get(shapes[1]) is None
+    assert cache.get(shapes[0]) == [0]
+    assert cache.get(shapes[2]) == [1]
+    cache.put(shapes[2], [0, 1])
+    assert cache.get(shapes[2]) == [0, 1]
+    assert len(cache) == 2
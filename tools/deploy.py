@@ -1,11 +1,16 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import argparse
+import json
 import logging
 import os
 import os.path as osp
+import shutil
+from collections import OrderedDict
 from functools import partial
+from typing import Any, Dict, List, Sequence, Tuple
 
 import mmengine
+import torch
 import torch.multiprocessing as mp
 from torch.multiprocessing import Process, set_start_method
 
@@ -13,16 +18,25 @@ from mmdeploy.apis import (create_calib_input_data, extract_model,
                            get_predefined_partition_cfg, torch2onnx,
                            torch2torchscript, visualize_model)
 from mmdeploy.apis.core import PIPELINE_MANAGER
-from mmdeploy.apis.utils import to_backend
+from mmdeploy.apis.core.pipeline_manager import PipelineResult
+from mmdeploy.apis.utils import (ConversionCache, get_companion_files,
+                                 hash_file, to_backend)
 from mmdeploy.backend.sdk.export_info import export2SDK
 from mmdeploy.utils import (IR, Backend, get_backend, get_calib_filename,
-                            get_ir_config, get_partition_config,
-                            get_root_logger, load_config, target_wrapper)
+                            get_ir_config, get_library_version,
+                            get_partition_config, get_root_logger, load_config,
+                            target_wrapper)
+from mmdeploy.version import __version__
 
 
 def parse_args():
     parser = argparse.ArgumentParser(description='Export model to backends.')
-    parser.add_argument('deploy_cfg', help='deploy config path')
+    parser.add_argument(
+        'deploy_cfg',
+        nargs='+',
+        help='deploy config path. If several configs are given, the model '
+        'is converted to all of them in parallel, each in a sub-directory of '
+        '`--work-dir` named after the config.')
     parser.add_argument('model_cfg', help='model config path')
     parser.add_argument('checkpoint', help='model checkpoint path')
     parser.add_argument('img', help='image used to convert model model')
@@ -62,11 +76,23 @@ def parse_args():
         '--uri',
         default='192.168.1.1:60000',
         help='Remote ipv4:port or ipv6:port for inference on edge device.')
+    parser.add_argument(
+        '--cache-dir',
+        default=None,
+        help='the directory of the conversion cache. The exported IR and '
+        'backend models are stored by the hash of the checkpoint, configs '
+        'and versions, and reused instead of converting again.')
+    parser.add_argument(
+        '--cache-max-size',
+        type=float,
+        default=20.,
+        help='max GB of the conversion cache, the least recently used '
+        'models are evicted when it is exceeded.')
     args = parser.parse_args()
     return args
 
 
-def create_process(name, target, args, kwargs, ret_value=None):
+def create_process(name, target, args, kwargs, ret_value=None, join=True):
     logger = get_root_logger()
     logger.info(f'{name} start.')
     log_level = logger.level
@@ -75,6 +101,13 @@ def create_process(name, target, args, kwargs, ret_value=None):
 
     process = Process(target=wrap_func, args=args, kwargs=kwargs)
     process.start()
+    if not join:
+        return process
+    join_process(name, process, ret_value)
+
+
+def join_process(name, process, ret_value=None):
+    logger = get_root_logger()
     process.join()
 
     if ret_value is not None:
@@ -85,6 +118,110 @@ def create_process(name, target, args, kwargs, ret_value=None):
             logger.info(f'{name} success.')
 
 
+def get_result(result: Any) -> Any:
+    """Wait for the result of a pipeline function called asynchronously."""
+    if isinstance(result, PipelineResult):
+        return result.get()
+    return result
+
+
+def get_ir_key(deploy_cfg: mmengine.Config) -> str:
+    """Get the key of the intermediate representation exported with a deploy
+    config.
+
+    The IR depends on the backend type through the rewriters and on
+    `fp16_mode` through some of them, but not on the other backend options
+    such as the input shapes of the engine or the calibration, so deploy
+    configs with the same key can share one IR.
+
+    Args:
+        deploy_cfg (mmengine.Config): The deploy config.
+
+    Returns:
+        str: The key of the IR.
+    """
+    cfg = dict(deploy_cfg)
+    cfg.pop('calib_config', None)
+    backend_config = cfg.pop('backend_config', dict())
+    common_config = backend_config.get('common_config', dict())
+    cfg['backend_config'] = dict(
+        type=backend_config.get('type', None),
+        fp16_mode=common_config.get('fp16_mode', False))
+    return json.dumps(cfg, sort_keys=True, default=str)
+
+
+def get_cache_keys(args, deploy_cfg: mmengine.Config,
+                   model_cfg: mmengine.Config) -> Tuple[str, str]:
+    """Get the keys of the IR and the backend models in the conversion
+    cache.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+        deploy_cfg (mmengine.Config): The deploy config.
+        model_cfg (mmengine.Config): The model config.
+
+    Returns:
+        Tuple[str, str]: The keys of the IR and the backend models.
+    """
+
+    def _hash(path):
+        if path is not None and osp.isfile(path):
+            return hash_file(path)
+        return path
+
+    ir_key = ConversionCache.make_key('ir', get_ir_key(deploy_cfg),
+                                      dict(model_cfg), _hash(args.checkpoint),
+                                      _hash(args.img), args.device,
+                                      __version__, torch.__version__)
+    backend = get_backend(deploy_cfg)
+    # the engines of some backends are specific to the device model
+    device_name = None
+    if args.device.startswith('cuda') and torch.cuda.is_available():
+        device_name = torch.cuda.get_device_name(args.device)
+    backend_key = ConversionCache.make_key('backend', ir_key, dict(deploy_cfg),
+                                           get_library_version(backend.value),
+                                           device_name,
+                                           _hash(args.calib_dataset_cfg),
+                                           args.quant, args.quant_image_dir,
+                                           args.uri)
+    return ir_key, backend_key
+
+
+def link_files(files: Sequence[str], work_dir: str) -> List[str]:
+    """Link files into a work directory, copy them if links are not
+    supported. The companion files, e.g. the external data of an onnx model,
+    are linked as well.
+
+    Args:
+        files (Sequence[str]): The files to link.
+        work_dir (str): The directory to link the files into.
+
+    Returns:
+        List[str]: The linked files.
+    """
+
+    def _link(file, dst):
+        if osp.abspath(dst) != osp.abspath(file):
+            if osp.exists(dst):
+                os.remove(dst)
+            os.makedirs(osp.dirname(dst), exist_ok=True)
+            try:
+                os.link(file, dst)
+            except OSError:
+                shutil.copyfile(file, dst)
+
+    linked_files = []
+    for file in files:
+        dst = osp.join(work_dir, osp.basename(file))
+        for companion in get_companion_files(file):
+            _link(
+                companion,
+                osp.join(work_dir, osp.relpath(companion, osp.dirname(file))))
+        _link(file, dst)
+        linked_files.append(dst)
+    return linked_files
+
+
 def torch2ir(ir_type: IR):
     """Return the conversion function from torch to the intermediate
     representation.
@@ -100,56 +237,32 @@ def torch2ir(ir_type: IR):
         raise KeyError(f'Unexpected IR type {ir_type}')
 
 
-def main():
-    args = parse_args()
-    set_start_method('spawn', force=True)
-    logger = get_root_logger()
-    log_level = logging.getLevelName(args.log_level)
-    logger.setLevel(log_level)
-
-    pipeline_funcs = [
-        torch2onnx, torch2torchscript, extract_model, create_calib_input_data
-    ]
-    PIPELINE_MANAGER.enable_multiprocess(True, pipeline_funcs)
-    PIPELINE_MANAGER.set_log_level(log_level, pipeline_funcs)
-
-    deploy_cfg_path = args.deploy_cfg
-    model_cfg_path = args.model_cfg
-    checkpoint_path = args.checkpoint
-    quant = args.quant
-    quant_image_dir = args.quant_image_dir
-
-    # load deploy_cfg
-    deploy_cfg, model_cfg = load_config(deploy_cfg_path, model_cfg_path)
-
-    # create work_dir if not
-    mmengine.mkdir_or_exist(osp.abspath(args.work_dir))
-
-    if args.dump_info:
-        export2SDK(
-            deploy_cfg,
-            model_cfg,
-            args.work_dir,
-            pth=checkpoint_path,
-            device=args.device)
+def export_ir(args, deploy_cfg_path: str, work_dir: str) -> List[str]:
+    """Export the intermediate representation and extract the partitions.
 
-    ret_value = mp.Value('d', 0, lock=False)
+    Args:
+        args (argparse.Namespace): The command line arguments.
+        deploy_cfg_path (str): The path of the deploy config.
+        work_dir (str): The directory to save the IR files.
 
-    # convert to IR
+    Returns:
+        List[str]: The IR files.
+    """
+    deploy_cfg, model_cfg = load_config(deploy_cfg_path, args.model_cfg)
     ir_config = get_ir_config(deploy_cfg)
     ir_save_file = ir_config['save_file']
     ir_type = IR.get(ir_config['type'])
     torch2ir(ir_type)(
         args.img,
-        args.work_dir,
+        work_dir,
         ir_save_file,
         deploy_cfg_path,
-        model_cfg_path,
-        checkpoint_path,
+        args.model_cfg,
+        args.checkpoint,
         device=args.device)
 
     # convert backend
-    ir_files = [osp.join(args.work_dir, ir_save_file)]
+    ir_files = [osp.join(work_dir, ir_save_file)]
 
     # partition model
     partition_cfgs = get_partition_config(deploy_cfg)
@@ -165,37 +278,44 @@ def main():
 
         origin_ir_file = ir_files[0]
         ir_files = []
+        results = []
         for partition_cfg in partition_cfgs:
             save_file = partition_cfg['save_file']
-            save_path = osp.join(args.work_dir, save_file)
+            save_path = osp.join(work_dir, save_file)
             start = partition_cfg['start']
             end = partition_cfg['end']
             dynamic_axes = partition_cfg.get('dynamic_axes', None)
 
-            extract_model(
-                origin_ir_file,
-                start,
-                end,
-                dynamic_axes=dynamic_axes,
-                save_file=save_path)
+            results.append(
+                extract_model(
+                    origin_ir_file,
+                    start,
+                    end,
+                    dynamic_axes=dynamic_axes,
+                    save_file=save_path))
 
             ir_files.append(save_path)
+        for result in results:
+            get_result(result)
+    return ir_files
 
-    # calib data
-    calib_filename = get_calib_filename(deploy_cfg)
-    if calib_filename is not None:
-        calib_path = osp.join(args.work_dir, calib_filename)
-        create_calib_input_data(
-            calib_path,
-            deploy_cfg_path,
-            model_cfg_path,
-            checkpoint_path,
-            dataset_cfg=args.calib_dataset_cfg,
-            dataset_type='val',
-            device=args.device)
-
-    backend_files = ir_files
-    # convert backend
+
+def convert_backend(args, deploy_cfg_path: str, ir_files: List[str],
+                    work_dir: str, ret_value: Any) -> Any:
+    """Convert the intermediate representation to the backend.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+        deploy_cfg_path (str): The path of the deploy config.
+        ir_files (List[str]): The IR files.
+        work_dir (str): The directory to save the backend files.
+        ret_value (mp.Value): The success flag of the subprocesses.
+
+    Returns:
+        List[str] | PipelineResult: The backend files, or the pending result
+            if `to_backend` is called asynchronously.
+    """
+    deploy_cfg, model_cfg = load_config(deploy_cfg_path, args.model_cfg)
     backend = get_backend(deploy_cfg)
 
     # preprocess deploy_cfg
@@ -224,7 +344,7 @@ def main():
         # TODO: Add this to backend manager in the future
         if args.dump_info:
             from mmdeploy.backend.ascend import update_sdk_pipeline
-            update_sdk_pipeline(args.work_dir)
+            update_sdk_pipeline(work_dir)
 
     if backend == Backend.VACC:
         # TODO: Add this to task_processor in the future
@@ -233,7 +353,7 @@ def main():
 
         from mmdeploy.utils import get_model_inputs
 
-        deploy_cfg, model_cfg = load_config(deploy_cfg_path, model_cfg_path)
+        deploy_cfg, model_cfg = load_config(deploy_cfg_path, args.model_cfg)
         model_inputs = get_model_inputs(deploy_cfg)
 
         for onnx_path, model_input in zip(ir_files, model_inputs):
@@ -247,87 +367,247 @@ def main():
                 create_process(
                     'vacc quant dataset',
                     target=get_quant,
-                    args=(deploy_cfg, model_cfg, shape_dict, checkpoint_path,
-                          args.work_dir, args.device),
+                    args=(deploy_cfg, model_cfg, shape_dict, args.checkpoint,
+                          work_dir, args.device),
                     kwargs=dict(),
                     ret_value=ret_value)
 
     # convert to backend
-    PIPELINE_MANAGER.set_log_level(log_level, [to_backend])
-    if backend == Backend.TENSORRT:
-        PIPELINE_MANAGER.enable_multiprocess(True, [to_backend])
-    backend_files = to_backend(
+    return to_backend(
         backend,
         ir_files,
-        work_dir=args.work_dir,
+        work_dir=work_dir,
         deploy_cfg=deploy_cfg,
-        log_level=log_level,
+        log_level=get_root_logger().level,
         device=args.device,
         uri=args.uri)
 
-    # ncnn quantization
-    if backend == Backend.NCNN and quant:
-        from onnx2ncnn_quant_table import get_table
-
-        from mmdeploy.apis.ncnn import get_quant_model_file, ncnn2int8
-        model_param_paths = backend_files[::2]
-        model_bin_paths = backend_files[1::2]
-        backend_files = []
-        for onnx_path, model_param_path, model_bin_path in zip(
-                ir_files, model_param_paths, model_bin_paths):
-
-            deploy_cfg, model_cfg = load_config(deploy_cfg_path,
-                                                model_cfg_path)
-            quant_onnx, quant_table, quant_param, quant_bin = get_quant_model_file(  # noqa: E501
-                onnx_path, args.work_dir)
-
-            create_process(
-                'ncnn quant table',
-                target=get_table,
-                args=(onnx_path, deploy_cfg, model_cfg, quant_onnx,
-                      quant_table, quant_image_dir, args.device),
-                kwargs=dict(),
-                ret_value=ret_value)
-
-            create_process(
-                'ncnn_int8',
-                target=ncnn2int8,
-                args=(model_param_path, model_bin_path, quant_table,
-                      quant_param, quant_bin),
-                kwargs=dict(),
-                ret_value=ret_value)
-            backend_files += [quant_param, quant_bin]
+
+def quantize_ncnn(args, deploy_cfg_path: str, ir_files: List[str],
+                  backend_files: List[str], work_dir: str,
+                  ret_value: Any) -> List[str]:
+    """Quantize the ncnn models to int8.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+        deploy_cfg_path (str): The path of the deploy config.
+        ir_files (List[str]): The IR files.
+        backend_files (List[str]): The ncnn param and bin files.
+        work_dir (str): The directory to save the quantized models.
+        ret_value (mp.Value): The success flag of the subprocesses.
+
+    Returns:
+        List[str]: The quantized param and bin files.
+    """
+    from onnx2ncnn_quant_table import get_table
+
+    from mmdeploy.apis.ncnn import get_quant_model_file, ncnn2int8
+    model_param_paths = backend_files[::2]
+    model_bin_paths = backend_files[1::2]
+    backend_files = []
+    for onnx_path, model_param_path, model_bin_path in zip(
+            ir_files, model_param_paths, model_bin_paths):
+
+        deploy_cfg, model_cfg = load_config(deploy_cfg_path, args.model_cfg)
+        quant_onnx, quant_table, quant_param, quant_bin = get_quant_model_file(  # noqa: E501
+            onnx_path, work_dir)
+
+        create_process(
+            'ncnn quant table',
+            target=get_table,
+            args=(onnx_path, deploy_cfg, model_cfg, quant_onnx, quant_table,
+                  args.quant_image_dir, args.device),
+            kwargs=dict(),
+            ret_value=ret_value)
+
+        create_process(
+            'ncnn_int8',
+            target=ncnn2int8,
+            args=(model_param_path, model_bin_path, quant_table, quant_param,
+                  quant_bin),
+            kwargs=dict(),
+            ret_value=ret_value)
+        backend_files += [quant_param, quant_bin]
+    return backend_files
+
+
+def main():
+    args = parse_args()
+    set_start_method('spawn', force=True)
+    logger = get_root_logger()
+    log_level = logging.getLevelName(args.log_level)
+    logger.setLevel(log_level)
+
+    pipeline_funcs = [
+        torch2onnx, torch2torchscript, extract_model, create_calib_input_data
+    ]
+    PIPELINE_MANAGER.enable_multiprocess(True, pipeline_funcs)
+    PIPELINE_MANAGER.set_log_level(log_level, pipeline_funcs)
+    PIPELINE_MANAGER.set_log_level(log_level, [to_backend])
+    # the partitions, calibrations and backends are converted in parallel
+    # subprocesses and waited for with `get_result`
+    for func in [extract_model, create_calib_input_data, to_backend]:
+        PIPELINE_MANAGER.set_mp_async(True, func)
+
+    deploy_cfg_paths = args.deploy_cfg
+    model_cfg_path = args.model_cfg
+    checkpoint_path = args.checkpoint
+
+    # load deploy_cfg
+    deploy_cfgs = [
+        load_config(deploy_cfg_path, model_cfg_path)[0]
+        for deploy_cfg_path in deploy_cfg_paths
+    ]
+    model_cfg = load_config(model_cfg_path)[0]
+    backends = [get_backend(deploy_cfg) for deploy_cfg in deploy_cfgs]
+
+    if len(deploy_cfg_paths) == 1:
+        work_dirs = [args.work_dir]
+    else:
+        work_dirs = [
+            osp.join(args.work_dir,
+                     osp.splitext(osp.basename(deploy_cfg_path))[0])
+            for deploy_cfg_path in deploy_cfg_paths
+        ]
+        assert len(set(work_dirs)) == len(work_dirs), \
+            'The file names of the deploy configs should be unique.'
+
+    for deploy_cfg, work_dir in zip(deploy_cfgs, work_dirs):
+        # create work_dir if not
+        mmengine.mkdir_or_exist(osp.abspath(work_dir))
+
+        if args.dump_info:
+            export2SDK(
+                deploy_cfg,
+                model_cfg,
+                work_dir,
+                pth=checkpoint_path,
+                device=args.device)
+
+    ret_value = mp.Value('d', 0, lock=False)
+
+    # restore the cached backend models
+    num_cfgs = len(deploy_cfgs)
+    cache = None
+    cache_keys = [(None, None)] * num_cfgs
+    backend_files_list = [None] * num_cfgs
+    ir_files_list = [[] for _ in range(num_cfgs)]
+    if args.cache_dir is not None:
+        cache = ConversionCache(args.cache_dir,
+                                int(args.cache_max_size * 1024**3))
+        for i in range(num_cfgs):
+            cache_keys[i] = get_cache_keys(args, deploy_cfgs[i], model_cfg)
+            ir_cache_key, backend_cache_key = cache_keys[i]
+            backend_files_list[i] = cache.get(backend_cache_key, work_dirs[i])
+            if backend_files_list[i] is not None:
+                ir_files_list[i] = cache.get(ir_cache_key, work_dirs[i]) or []
+    pending = [i for i in range(num_cfgs) if backend_files_list[i] is None]
+
+    # calib data, which does not depend on the IR
+    calib_results = []
+    for i in pending:
+        deploy_cfg_path, deploy_cfg = deploy_cfg_paths[i], deploy_cfgs[i]
+        work_dir = work_dirs[i]
+        calib_filename = get_calib_filename(deploy_cfg)
+        if calib_filename is not None:
+            calib_path = osp.join(work_dir, calib_filename)
+            calib_results.append(
+                create_calib_input_data(
+                    calib_path,
+                    deploy_cfg_path,
+                    model_cfg_path,
+                    checkpoint_path,
+                    dataset_cfg=args.calib_dataset_cfg,
+                    dataset_type='val',
+                    device=args.device))
+
+    # convert to IR, the deploy configs with the same IR share the export
+    exported_ir_files: Dict[str, List[str]] = OrderedDict()
+    for i in pending:
+        deploy_cfg_path, deploy_cfg = deploy_cfg_paths[i], deploy_cfgs[i]
+        work_dir = work_dirs[i]
+        ir_key = get_ir_key(deploy_cfg)
+        if ir_key in exported_ir_files:
+            logger.info(f'Share the exported IR with {deploy_cfg_path}.')
+            ir_files = link_files(exported_ir_files[ir_key], work_dir)
+        else:
+            ir_cache_key = cache_keys[i][0]
+            ir_files = None
+            if cache is not None:
+                ir_files = cache.get(ir_cache_key, work_dir)
+            if ir_files is None:
+                ir_files = export_ir(args, deploy_cfg_path, work_dir)
+                if cache is not None:
+                    cache.put(ir_cache_key, ir_files)
+            exported_ir_files[ir_key] = ir_files
+        ir_files_list[i] = ir_files
+
+    for result in calib_results:
+        get_result(result)
+
+    # convert to backend
+    if len(deploy_cfgs) > 1 or backends[0] == Backend.TENSORRT:
+        PIPELINE_MANAGER.enable_multiprocess(True, [to_backend])
+    backend_results = dict(
+        (i,
+         convert_backend(args, deploy_cfg_paths[i], ir_files_list[i],
+                         work_dirs[i], ret_value)) for i in pending)
+    for i in pending:
+        backend_files_list[i] = get_result(backend_results[i])
+
+        # ncnn quantization
+        if args.quant and backends[i] == Backend.NCNN:
+            backend_files_list[i] = quantize_ncnn(args, deploy_cfg_paths[i],
+                                                  ir_files_list[i],
+                                                  backend_files_list[i],
+                                                  work_dirs[i], ret_value)
+        if cache is not None:
+            cache.put(cache_keys[i][1], backend_files_list[i])
 
     if args.test_img is None:
         args.test_img = args.img
 
-    extra = dict(
-        backend=backend,
-        output_file=osp.join(args.work_dir, f'output_{backend.value}.jpg'),
-        show_result=args.show)
-    if backend == Backend.SNPE:
-        extra['uri'] = args.uri
-
-    # get backend inference result, try render
-    create_process(
-        f'visualize {backend.value} model',
-        target=visualize_model,
-        args=(model_cfg_path, deploy_cfg_path, backend_files, args.test_img,
-              args.device),
-        kwargs=extra,
-        ret_value=ret_value)
-
-    # get pytorch model inference result, try visualize if possible
-    create_process(
-        'visualize pytorch model',
+    # get backend inference results and pytorch model inference result,
+    # try render in parallel
+    processes = []
+    for deploy_cfg_path, backend, backend_files, work_dir in zip(
+            deploy_cfg_paths, backends, backend_files_list, work_dirs):
+        extra = dict(
+            backend=backend,
+            output_file=osp.join(work_dir, f'output_{backend.value}.jpg'),
+            show_result=args.show)
+        if backend == Backend.SNPE:
+            extra['uri'] = args.uri
+
+        name = f'visualize {backend.value} model'
+        visualize_ret_value = mp.Value('d', 0, lock=False)
+        process = create_process(
+            name,
+            target=visualize_model,
+            args=(model_cfg_path, deploy_cfg_path, backend_files,
+                  args.test_img, args.device),
+            kwargs=extra,
+            ret_value=visualize_ret_value,
+            join=False)
+        processes.append((name, process, visualize_ret_value))
+
+    name = 'visualize pytorch model'
+    visualize_ret_value = mp.Value('d', 0, lock=False)
+    process = create_process(
+        name,
         target=visualize_model,
-        args=(model_cfg_path, deploy_cfg_path, [checkpoint_path],
+        args=(model_cfg_path, deploy_cfg_paths[0], [checkpoint_path],
               args.test_img, args.device),
         kwargs=dict(
             backend=Backend.PYTORCH,
             output_file=osp.join(args.work_dir, 'output_pytorch.jpg'),
             show_result=args.show),
-        ret_value=ret_value)
+        ret_value=visualize_ret_value,
+        join=False)
+    processes.append((name, process, visualize_ret_value))
+
+    for name, process, visualize_ret_value in processes:
+        join_process(name, process, visualize_ret_value)
     logger.info('All process success.')
 
 
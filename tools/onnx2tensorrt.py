@@ -64,7 +64,8 @@ def main():
         int8_mode=final_params.get('int8_mode', False),
         int8_param=int8_param,
         max_workspace_size=final_params.get('max_workspace_size', 0),
-        device_id=device_id)
+        device_id=device_id,
+        timing_cache=final_params.get('timing_cache', None))
 
     logger.info('onnx2tensorrt success.')
 
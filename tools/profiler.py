@@ -1,7 +1,13 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import argparse
 import glob
+import json
 import os.path as osp
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence
 
 import numpy as np
 import torch
@@ -12,7 +18,7 @@ from mmdeploy.apis import build_task_processor
 from mmdeploy.utils import get_root_logger
 from mmdeploy.utils.config_utils import (Backend, get_backend, get_input_shape,
                                          load_config)
-from mmdeploy.utils.timer import TimeCounter
+from mmdeploy.utils.timer import LatencyHistogram, TimeCounter
 
 
 def parse_args():
@@ -58,7 +64,74 @@ def parse_args():
         nargs='+',
         help='the file extensions for input images from `image_dir`.',
         default=['.jpg', '.jpeg', '.png', '.ppm', '.bmp', '.pgm', '.tif'])
+    parser.add_argument(
+        '--num-prefetch',
+        type=int,
+        default=0,
+        help='the number of batches decoded and preprocessed ahead of '
+        'inference in background threads. Defaults to 0, which creates the '
+        'inputs synchronously in the inference loop.')
+    parser.add_argument(
+        '--num-workers',
+        type=int,
+        default=2,
+        help='the number of threads to create inputs with when '
+        '`--num-prefetch` > 0.')
+    parser.add_argument(
+        '--export-stats',
+        type=str,
+        default=None,
+        help='the file to export the latency statistics of each stage, '
+        'in json format if it ends with `.json`, otherwise in csv format.')
+    parser.add_argument(
+        '--export-trace',
+        type=str,
+        default=None,
+        help='the json file to export the timeline in Chrome trace format.')
+    parser.add_argument(
+        '--load-mode',
+        type=str,
+        choices=['closed', 'open'],
+        default=None,
+        help='run a load test instead of the latency test. `closed` keeps '
+        '`--concurrency` requests in flight, `open` issues requests with '
+        'Poisson arrivals at `--arrival-rate`.')
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        nargs='+',
+        default=[1],
+        help='the concurrency levels to sweep in the load test, i.e. the '
+        'number of callers in closed loop or the max number of requests in '
+        'flight in open loop.')
+    parser.add_argument(
+        '--load-batch-size',
+        type=int,
+        nargs='+',
+        default=None,
+        help='the batch sizes to sweep in the load test. Defaults to '
+        '`--batch-size`.')
+    parser.add_argument(
+        '--arrival-rate',
+        type=float,
+        nargs='+',
+        default=None,
+        help='the mean arrival rates in requests per second to sweep in the '
+        'open loop load test.')
+    parser.add_argument(
+        '--duration',
+        type=float,
+        default=10.,
+        help='the seconds to issue requests for each point of the load test.')
+    parser.add_argument(
+        '--export-load',
+        type=str,
+        default=None,
+        help='the json file to export the results of the load test.')
     args = parser.parse_args()
+    if args.load_mode == 'open':
+        assert args.arrival_rate, \
+            '`--arrival-rate` is required by the open loop load test.'
     return args
 
 
@@ -72,6 +145,211 @@ def get_images(image_dir, extensions):
     return images
 
 
+def prefetch(func: Callable, items: Iterable, num_workers: int,
+             num_prefetch: int) -> Iterator:
+    """Apply a function to items in a thread pool ahead of consumption.
+
+    Args:
+        func (Callable): The function to apply.
+        items (Iterable): The items to apply the function to.
+        num_workers (int): The number of threads.
+        num_prefetch (int): Max number of results computed ahead.
+
+    Yields:
+        Any: The results in the order of items.
+    """
+    with ThreadPoolExecutor(num_workers) as executor:
+        futures = deque()
+        for item in items:
+            futures.append(executor.submit(func, item))
+            if len(futures) > num_prefetch:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+
+
+def run_closed_loop(func: Callable, inputs: Sequence, concurrency: int,
+                    duration: float) -> Dict[str, Any]:
+    """Call a function in a closed loop from concurrent callers.
+
+    Each caller issues the next request as soon as the previous one returns,
+    so there are always `concurrency` requests in flight.
+
+    Args:
+        func (Callable): The function to call with an input.
+        inputs (Sequence): The inputs to cycle through.
+        concurrency (int): The number of callers.
+        duration (float): The seconds to issue requests for.
+
+    Returns:
+        Dict[str, Any]: The number of requests, the elapsed seconds and the
+            latency histogram.
+    """
+    histogram = LatencyHistogram()
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def caller(index):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            func(inputs[index % len(inputs)])
+            latency = time.perf_counter() - start
+            with lock:
+                histogram.add(latency)
+            index += concurrency
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(caller, range(concurrency)))
+    elapsed = time.perf_counter() - start_time
+    return dict(requests=histogram.count, elapsed=elapsed, histogram=histogram)
+
+
+def run_open_loop(func: Callable,
+                  inputs: Sequence,
+                  arrival_rate: float,
+                  concurrency: int,
+                  duration: float,
+                  seed: int = 1234) -> Dict[str, Any]:
+    """Call a function with Poisson arrivals.
+
+    The requests arrive with exponentially distributed intervals no matter
+    how fast they are served and wait in a queue when `concurrency` requests
+    are in flight. The latency is counted from the scheduled arrival time,
+    so the queueing delay of an overloaded model is included.
+
+    Args:
+        func (Callable): The function to call with an input.
+        inputs (Sequence): The inputs to cycle through.
+        arrival_rate (float): The mean number of requests per second.
+        concurrency (int): The max number of requests in flight.
+        duration (float): The seconds to issue requests for.
+        seed (int): The seed of the arrival intervals. Defaults to 1234.
+
+    Returns:
+        Dict[str, Any]: The number of requests, the elapsed seconds until the
+            last request is served and the latency histogram.
+    """
+    histogram = LatencyHistogram()
+    lock = threading.Lock()
+    rng = np.random.default_rng(seed)
+
+    def request(arrival, data):
+        func(data)
+        latency = time.perf_counter() - arrival
+        with lock:
+            histogram.add(latency)
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        futures = []
+        arrival = start_time
+        while True:
+            arrival += rng.exponential(1. / arrival_rate)
+            if arrival - start_time >= duration:
+                break
+            delay = arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(
+                executor.submit(request, arrival,
+                                inputs[len(futures) % len(inputs)]))
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - start_time
+    return dict(requests=histogram.count, elapsed=elapsed, histogram=histogram)
+
+
+def run_load_test(args, model: torch.nn.Module, create_input: Callable,
+                  image_files: List[str], with_sync: bool) -> List[Dict]:
+    """Sweep the concurrency levels, batch sizes and arrival rates.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+        model (torch.nn.Module): The model to test.
+        create_input (Callable): The function to create the input of a batch
+            of image files.
+        image_files (List[str]): The image files.
+        with_sync (bool): Whether to synchronize the device after requests.
+
+    Returns:
+        List[Dict]: The throughput and latency of each point.
+    """
+
+    # the backend model is called from several threads. The calls are
+    # serialized unless the wrapper is thread-safe, e.g. onnxruntime,
+    # tensorrt (concurrent with `num_contexts` > 1) and openvino (concurrent
+    # with `num_requests` > 1).
+    wrapper = getattr(model, 'wrapper', None)
+    lock = None if getattr(wrapper, 'thread_safe', False) else \
+        threading.Lock()
+
+    def infer(data):
+        if lock is None:
+            model.test_step(data)
+        else:
+            with lock:
+                model.test_step(data)
+        if with_sync:
+            torch.cuda.current_stream().synchronize()
+
+    batch_sizes = args.load_batch_size or [args.batch_size]
+    arrival_rates = args.arrival_rate if args.load_mode == 'open' else [None]
+    results = []
+    for batch_size in batch_sizes:
+        num_inputs = max(max(args.concurrency), 8)
+        inputs = [
+            create_input([
+                image_files[j % len(image_files)]
+                for j in range(i * batch_size, (i + 1) * batch_size)
+            ]) for i in range(num_inputs)
+        ]
+        for i in range(args.warmup):
+            infer(inputs[i % num_inputs])
+        for concurrency in args.concurrency:
+            for arrival_rate in arrival_rates:
+                if arrival_rate is None:
+                    point = run_closed_loop(infer, inputs, concurrency,
+                                            args.duration)
+                else:
+                    point = run_open_loop(infer, inputs, arrival_rate,
+                                          concurrency, args.duration)
+                result = dict(
+                    mode=args.load_mode,
+                    batch_size=batch_size,
+                    concurrency=concurrency,
+                    arrival_rate=arrival_rate,
+                    requests=point['requests'],
+                    throughput=point['requests'] * batch_size /
+                    point['elapsed'])
+                result.update(point['histogram'].summary())
+                results.append(result)
+    return results
+
+
+def print_load_results(results: List[Dict]):
+    """Print the results of the load test as a table.
+
+    Args:
+        results (List[Dict]): The results of `run_load_test`.
+    """
+    table = PrettyTable()
+    table.field_names = [
+        'Batch', 'Concurrency', 'Rate/rps', 'Requests', 'FPS', 'Mean/ms',
+        'P50/ms', 'P99/ms', 'P99.9/ms'
+    ]
+    for result in results:
+        arrival_rate = result['arrival_rate']
+        table.add_row([
+            result['batch_size'], result['concurrency'],
+            '-' if arrival_rate is None else arrival_rate, result['requests'],
+            result['throughput'], result['mean'], result['p50'], result['p99'],
+            result['p99.9']
+        ])
+    table.float_format = '.3'
+    print(table)
+
+
 class TorchWrapper(torch.nn.Module):
 
     def __init__(self, model):
@@ -139,18 +417,52 @@ def main():
                                       nrof_image)
         ]
     image_files = image_files[:total_nrof_image]
+    batches = [
+        image_files[i:(i + args.batch_size)]
+        for i in range(0, total_nrof_image, args.batch_size)
+    ]
+    data_preprocessor = getattr(model, 'data_preprocessor', None)
+
+    def create_input(batch_files):
+        # synchronizing in background threads would stall the inference
+        with TimeCounter.span(
+                'preprocess', with_sync=with_sync and args.num_prefetch == 0):
+            data, _ = task_processor.create_input(
+                batch_files, input_shape, data_preprocessor=data_preprocessor)
+        return data
+
+    if args.load_mode is not None:
+        results = run_load_test(args, model, create_input, image_files,
+                                with_sync)
+        print(f'----- Load test ({args.load_mode} loop, '
+              f'{args.duration}s per point):')
+        print_load_results(results)
+        if args.export_load is not None:
+            with open(args.export_load, 'w') as f:
+                json.dump(results, f, indent=4)
+            logger.info(f'Load test results saved to {args.export_load}')
+        return
+
     with TimeCounter.activate(
             warmup=args.warmup,
             log_interval=20,
             with_sync=with_sync,
-            batch_size=args.batch_size):
-        for i in range(0, total_nrof_image, args.batch_size):
-            batch_files = image_files[i:(i + args.batch_size)]
-            data, _ = task_processor.create_input(
-                batch_files,
-                input_shape,
-                data_preprocessor=getattr(model, 'data_preprocessor', None))
-            model.test_step(data)
+            batch_size=args.batch_size,
+            trace=args.export_trace is not None):
+        if args.num_prefetch > 0:
+            inputs = prefetch(create_input, batches, args.num_workers,
+                              args.num_prefetch)
+        else:
+            inputs = map(create_input, batches)
+        start_time = time.perf_counter()
+        for i, data in enumerate(inputs):
+            if i == args.warmup:
+                start_time = time.perf_counter()
+            with TimeCounter.span('inference', with_sync=with_sync):
+                model.test_step(data)
+        if with_sync:
+            torch.cuda.synchronize()
+        elapsed = time.perf_counter() - start_time
 
     print('----- Settings:')
     settings = PrettyTable()
@@ -159,9 +471,44 @@ def main():
     settings.add_row(['shape', f'{input_shape[1]}x{input_shape[0]}'])
     settings.add_row(['iterations', args.num_iter])
     settings.add_row(['warmup', args.warmup])
+    settings.add_row(['prefetch', args.num_prefetch])
+    if args.num_prefetch > 0:
+        settings.add_row(['workers', args.num_workers])
     print(settings)
     print('----- Results:')
     TimeCounter.print_stats(backend)
+    print('----- Stages:')
+    stages = PrettyTable()
+    stages.field_names = ['Stage', 'Mean/ms', 'P50/ms', 'P99/ms', 'P99.9/ms']
+    for name in ['preprocess', 'inference']:
+        stats = TimeCounter.get_stats(name)
+        stages.add_row(
+            [name, stats['mean'], stats['p50'], stats['p99'], stats['p99.9']])
+    stages.float_format = '.3'
+    print(stages)
+    print('----- Throughput:')
+    num_workers = args.num_workers if args.num_prefetch > 0 else 1
+    throughput = PrettyTable()
+    throughput.field_names = ['Throughput', 'FPS']
+    throughput.add_rows([
+        ['backend only', TimeCounter.get_stats(backend)['fps']],
+        [
+            'end to end (pipelined)' if args.num_prefetch > 0 else
+            'end to end', args.num_iter * args.batch_size / elapsed
+        ],
+        [
+            'preprocessing ceiling',
+            num_workers * TimeCounter.get_stats('preprocess')['fps']
+        ],
+    ])
+    throughput.float_format = '.3'
+    print(throughput)
+    if args.export_stats is not None:
+        TimeCounter.export_stats(args.export_stats)
+        logger.info(f'Latency statistics saved to {args.export_stats}')
+    if args.export_trace is not None:
+        TimeCounter.export_trace(args.export_trace)
+        logger.info(f'Chrome trace saved to {args.export_trace}')
 
 
 if __name__ == '__main__':